@@ -0,0 +1,257 @@
+"""
+Minimal Solidity ABI encoding for the contract reads the agent makes.
+
+web3 is not used by MonadClient (see its demo-mode note), so this covers
+just what eth_call needs: function selectors (keccak-256), static
+argument/return types (uintN, intN, address, bool, bytesN) and the
+Multicall3 aggregate3 call that bundles many of those reads.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# Pool contract reads (Uniswap V2 style pair; the pair is also the LP token)
+POOL_ABI = [
+    {
+        "inputs": [],
+        "name": "getReserves",
+        "outputs": [
+            {"type": "uint112", "name": "reserve0"},
+            {"type": "uint112", "name": "reserve1"},
+            {"type": "uint32", "name": "blockTimestampLast"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "totalSupply",
+        "outputs": [{"type": "uint256", "name": ""}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"type": "address", "name": "account"}],
+        "name": "balanceOf",
+        "outputs": [{"type": "uint256", "name": ""}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# Multicall3 is deployed at the same address on most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SIGNATURE = "aggregate3((address,bool,bytes)[])"
+
+_MASK = (1 << 64) - 1
+_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008
+]
+_ROTATIONS = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14]
+]
+
+def keccak256(data: bytes) -> bytes:
+    """
+    Ethereum's keccak-256 (original padding, not hashlib's sha3_256)
+    """
+    rate = 136
+    if len(data) % rate == rate - 1:
+        # One byte left in the block: the 0x01 and 0x80 pad bytes share it
+        padded = bytearray(data) + b"\x81"
+    else:
+        padded = bytearray(data) + b"\x01" + b"\x00" * ((-len(data) - 2) % rate) + b"\x80"
+    
+    state = [[0] * 5 for _ in range(5)]
+    for offset in range(0, len(padded), rate):
+        block = padded[offset:offset + rate]
+        for i in range(rate // 8):
+            state[i % 5][i // 5] ^= int.from_bytes(block[i * 8:i * 8 + 8], "little")
+        _keccak_f(state)
+    
+    return b"".join(state[i % 5][i // 5].to_bytes(8, "little") for i in range(4))
+
+def _keccak_f(state: List[List[int]]) -> None:
+    for constant in _ROUND_CONSTANTS:
+        parity = [state[x][0] ^ state[x][1] ^ state[x][2] ^ state[x][3] ^ state[x][4] for x in range(5)]
+        for x in range(5):
+            d = parity[(x - 1) % 5] ^ _rotate(parity[(x + 1) % 5], 1)
+            for y in range(5):
+                state[x][y] ^= d
+        
+        moved = [[0] * 5 for _ in range(5)]
+        for x in range(5):
+            for y in range(5):
+                moved[y][(2 * x + 3 * y) % 5] = _rotate(state[x][y], _ROTATIONS[x][y])
+        
+        for x in range(5):
+            for y in range(5):
+                state[x][y] = moved[x][y] ^ (~moved[(x + 1) % 5][y] & moved[(x + 2) % 5][y])
+        state[0][0] ^= constant
+
+def _rotate(value: int, shift: int) -> int:
+    return ((value << shift) | (value >> (64 - shift))) & _MASK if shift else value
+
+@lru_cache(maxsize=None)
+def selector(signature: str) -> bytes:
+    """
+    First 4 bytes of keccak256("name(type,...)")
+    """
+    return keccak256(signature.encode())[:4]
+
+def find_function(abi: List[Dict], name: str) -> Dict:
+    for entry in abi:
+        if entry.get("type") == "function" and entry["name"] == name:
+            return entry
+    raise ValueError(f"Function {name} not in ABI")
+
+def function_signature(entry: Dict) -> str:
+    return f"{entry['name']}({','.join(arg['type'] for arg in entry['inputs'])})"
+
+def encode_call(abi: List[Dict], name: str, *args) -> str:
+    """
+    Calldata (0x-hex) for a call to a function of the ABI
+    """
+    entry = find_function(abi, name)
+    types = [arg["type"] for arg in entry["inputs"]]
+    if len(args) != len(types):
+        raise ValueError(f"{name} takes {len(types)} arguments, got {len(args)}")
+    return "0x" + (selector(function_signature(entry)) + encode_values(types, args)).hex()
+
+def decode_output(abi: List[Dict], name: str, data: Union[str, bytes]) -> List[Any]:
+    """
+    Return values of a call, from the 0x-hex eth_call result or raw return data
+    """
+    entry = find_function(abi, name)
+    raw = data if isinstance(data, bytes) else bytes.fromhex(_strip_0x(data))
+    return decode_values([arg["type"] for arg in entry["outputs"]], raw)
+
+def encode_output(abi: List[Dict], name: str, *values) -> str:
+    """
+    eth_call result for the given return values (used by the stand-in RPC server)
+    """
+    entry = find_function(abi, name)
+    return "0x" + encode_values([arg["type"] for arg in entry["outputs"]], values).hex()
+
+def encode_values(types: Sequence[str], values: Sequence[Any]) -> bytes:
+    return b"".join(_encode_word(abi_type, value) for abi_type, value in zip(types, values))
+
+def decode_values(types: Sequence[str], data: bytes) -> List[Any]:
+    if len(data) < 32 * len(types):
+        raise ValueError(f"Expected {32 * len(types)} bytes of return data, got {len(data)}")
+    return [_decode_word(abi_type, data[32 * i:32 * i + 32]) for i, abi_type in enumerate(types)]
+
+def encode_aggregate3(calls: Sequence[Tuple[str, bool, str]]) -> str:
+    """
+    Calldata for Multicall3.aggregate3 from (target, allowFailure, calldata hex) calls
+    """
+    return "0x" + (selector(AGGREGATE3_SIGNATURE) + _encode_tuple_array(
+        [(_encode_word("address", target) + _encode_word("bool", allow_failure), bytes.fromhex(_strip_0x(data)))
+         for target, allow_failure, data in calls]
+    )).hex()
+
+def decode_aggregate3(data: str) -> List[Tuple[bool, bytes]]:
+    """
+    (success, returnData) per call from the aggregate3 eth_call result
+    """
+    return [
+        (head[31] != 0, tail)
+        for head, tail in _decode_tuple_array(bytes.fromhex(_strip_0x(data)), static_words=1)
+    ]
+
+def decode_aggregate3_calls(calldata: str) -> List[Tuple[str, bool, str]]:
+    """
+    (target, allowFailure, calldata hex) per call (used by the stand-in RPC server)
+    """
+    raw = bytes.fromhex(_strip_0x(calldata))
+    if raw[:4] != selector(AGGREGATE3_SIGNATURE):
+        raise ValueError("Not an aggregate3 call")
+    return [
+        (_decode_word("address", head[:32]), head[63] != 0, "0x" + tail.hex())
+        for head, tail in _decode_tuple_array(raw[4:], static_words=2)
+    ]
+
+def encode_aggregate3_result(results: Sequence[Tuple[bool, bytes]]) -> str:
+    """
+    aggregate3 return data for (success, returnData) pairs (used by the stand-in RPC server)
+    """
+    return "0x" + _encode_tuple_array(
+        [(_encode_word("bool", success), return_data) for success, return_data in results]
+    ).hex()
+
+def _encode_tuple_array(items: Sequence[Tuple[bytes, bytes]]) -> bytes:
+    """
+    A single argument of type (static..., bytes)[]: each item is its static
+    head words plus one trailing bytes field
+    """
+    encoded = []
+    for head, tail in items:
+        padded = tail + b"\x00" * (-len(tail) % 32)
+        offset = len(head) + 32  # bytes field starts after the head and its own offset word
+        encoded.append(head + offset.to_bytes(32, "big") + len(tail).to_bytes(32, "big") + padded)
+    
+    offsets, position = [], 32 * len(encoded)
+    for item in encoded:
+        offsets.append(position.to_bytes(32, "big"))
+        position += len(item)
+    
+    return (
+        (32).to_bytes(32, "big")               # offset of the array argument
+        + len(encoded).to_bytes(32, "big")
+        + b"".join(offsets)
+        + b"".join(encoded)
+    )
+
+def _decode_tuple_array(data: bytes, static_words: int) -> List[Tuple[bytes, bytes]]:
+    array_start = int.from_bytes(data[:32], "big")
+    count = int.from_bytes(data[array_start:array_start + 32], "big")
+    items_start = array_start + 32
+    
+    items = []
+    for i in range(count):
+        item_start = items_start + int.from_bytes(data[items_start + 32 * i:items_start + 32 * i + 32], "big")
+        head_end = item_start + 32 * static_words
+        head = data[item_start:head_end]
+        tail_start = item_start + int.from_bytes(data[head_end:head_end + 32], "big")
+        length = int.from_bytes(data[tail_start:tail_start + 32], "big")
+        items.append((head, data[tail_start + 32:tail_start + 32 + length]))
+    return items
+
+def _encode_word(abi_type: str, value: Any) -> bytes:
+    if abi_type == "address":
+        return bytes.fromhex(_strip_0x(value)).rjust(32, b"\x00")
+    if abi_type == "bool":
+        return int(bool(value)).to_bytes(32, "big")
+    if abi_type.startswith("uint"):
+        return int(value).to_bytes(32, "big")
+    if abi_type.startswith("int"):
+        return int(value).to_bytes(32, "big", signed=True)
+    if abi_type.startswith("bytes") and abi_type != "bytes":
+        raw = value if isinstance(value, bytes) else bytes.fromhex(_strip_0x(value))
+        return raw.ljust(32, b"\x00")
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+def _decode_word(abi_type: str, word: bytes) -> Any:
+    if abi_type == "address":
+        return "0x" + word[12:].hex()
+    if abi_type == "bool":
+        return word[-1] != 0
+    if abi_type.startswith("uint"):
+        return int.from_bytes(word, "big")
+    if abi_type.startswith("int"):
+        return int.from_bytes(word, "big", signed=True)
+    if abi_type.startswith("bytes") and abi_type != "bytes":
+        return word[:int(abi_type[5:])]
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+def _strip_0x(value: str) -> str:
+    return value[2:] if value.startswith(("0x", "0X")) else value
@@ -1,35 +1,248 @@
 #!/usr/bin/env python3
 
 import numpy as np
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from scipy.optimize import brentq
+
+from market_stats import MarketStatistics, market_statistics
+from pool_snapshot import PoolSnapshot, as_pool_snapshot
+
+# Delegation risk tolerance -> (risk aversion, max pool risk score)
+RISK_PROFILES = {
+    "low": (8.0, 0.4),
+    "medium": (4.0, 0.7),
+    "high": (1.5, 1.0)
+}
+
+@dataclass
+class AllocationResult:
+    weights: np.ndarray
+    evaluations: int  # Fixed-point evaluations (each one sort over the pools)
+    warm_started: bool
+
+class AllocationSolver:
+    """
+    Mean-variance allocation over a pool set:
+    
+        maximize  mu.w - risk_aversion * w'Sigma w
+        s.t.      sum(w) = 1,  0 <= w_i <= cap_i
+    
+    mu is pool APY. Sigma is a one-factor model built from each pool's
+    volatility (or risk score when no volatility is known) and a common
+    correlation rho: Sigma = rho * sigma sigma' + (1 - rho) * diag(sigma^2).
+    
+    For a fixed factor exposure s = sigma.w the problem separates per pool,
+    and the budget multiplier has an exact piecewise-linear solution. The
+    remaining condition sigma.w(s) = s is monotone in s and solved with
+    Brent's method, bracketed around the previous solution when warm-started.
+    """
+    def __init__(self, correlation: float = 0.3, tolerance: float = 1e-12, min_sigma: float = 1e-4):
+        self.correlation = correlation
+        self.tolerance = tolerance
+        self.min_sigma = min_sigma
+    
+    def pool_sigma(self, pools: PoolSnapshot) -> np.ndarray:
+        """
+        Per-pool APY standard deviation (fraction), falling back to risk score
+        """
+        sigma = np.where(pools.volatility > 0, pools.volatility, pools.risk_score * 0.5)
+        return np.maximum(sigma, self.min_sigma)
+    
+    def covariance_matvec(self, sigma: np.ndarray, w: np.ndarray) -> np.ndarray:
+        weighted = sigma * w
+        return sigma * (self.correlation * weighted.sum() + (1 - self.correlation) * weighted)
+    
+    def solve(
+        self,
+        mu: np.ndarray,
+        sigma: np.ndarray,
+        caps: np.ndarray,
+        risk_aversion: float,
+        initial: Optional[np.ndarray] = None
+    ) -> AllocationResult:
+        n = len(mu)
+        budget = min(1.0, float(caps.sum()))
+        if n == 0 or budget <= 0:
+            return AllocationResult(np.zeros(n), 0, False)
+        
+        factor = 2 * risk_aversion * self.correlation
+        curvature = 2 * risk_aversion * (1 - self.correlation) * sigma ** 2
+        evaluations = 0
+        
+        def weights_for(exposure: float) -> np.ndarray:
+            linear = mu - factor * sigma * exposure
+            shift = solve_budget_shift(linear, curvature, caps, budget)
+            return np.clip((linear - shift) / curvature, 0, caps)
+        
+        def excess(exposure: float) -> float:
+            nonlocal evaluations
+            evaluations += 1
+            return float(sigma @ weights_for(exposure)) - exposure
+        
+        low, high = 0.0, float(sigma @ caps)
+        warm_started = initial is not None
+        if warm_started:
+            # Expand a small bracket around the previous exposure
+            guess = min(max(float(sigma @ initial), low), high)
+            width = max(1e-9, guess * 1e-3)
+            while True:
+                lo, hi = max(low, guess - width), min(high, guess + width)
+                if (lo == low or excess(lo) >= 0) and (hi == high or excess(hi) <= 0):
+                    low, high = lo, hi
+                    break
+                width *= 8
+        
+        if excess(low) <= 0:
+            exposure = low
+        elif excess(high) >= 0:
+            exposure = high
+        else:
+            exposure = brentq(excess, low, high, xtol=self.tolerance, rtol=4 * np.finfo(float).eps)
+        
+        return AllocationResult(weights_for(exposure), evaluations, warm_started)
+
+def solve_budget_shift(linear: np.ndarray, curvature: np.ndarray, caps: np.ndarray, budget: float) -> float:
+    """
+    Find nu with sum(clip((linear - nu) / curvature, 0, caps)) = budget.
+    The sum is piecewise linear and non-increasing in nu with breakpoints at
+    linear - curvature * caps and linear, so one sort locates the segment.
+    """
+    breakpoints = np.concatenate((linear - curvature * caps, linear))
+    # Slope change of the sum when nu crosses each breakpoint
+    inverse = 1.0 / curvature
+    slope_changes = np.concatenate((-inverse, inverse))
+    order = np.argsort(breakpoints, kind='stable')
+    breakpoints = breakpoints[order]
+    slopes = np.cumsum(slope_changes[order])  # Slope right after each breakpoint
+    
+    # Sum at each breakpoint, walking up from nu = -inf where it equals sum(caps)
+    totals = float(caps.sum()) + np.concatenate(([0.0], np.cumsum(slopes[:-1] * np.diff(breakpoints))))
+    
+    k = int(np.searchsorted(-totals, -budget, side='right')) - 1
+    if k < 0:
+        return float(breakpoints[0])
+    if k >= len(breakpoints) - 1 or slopes[k] == 0:
+        return float(breakpoints[k])
+    return float(breakpoints[k] + (budget - totals[k]) / slopes[k])
 
 @dataclass
 class AIEngine:
     """Advanced AI engine for yield optimization"""
     
-    def __init__(self):
+    def __init__(self, market_stats: Optional[MarketStatistics] = None):
         self.confidence_threshold = 0.8
         self.risk_tolerance = 0.5
+        self.max_pool_weight = 0.4      # Per-pool cap unless overridden
+        self.solver = AllocationSolver()
+        self.market_stats = market_stats or market_statistics
+        
+        # Last solution per risk profile, by pool address (warm starts)
+        self._last_weights: Dict[Tuple, Dict[str, float]] = {}
+        # (snapshot version, profile, caps) -> result
+        self._allocation_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._allocation_cache_size = 64
     
-    def analyze_market_conditions(self, pools_data: List[Dict]) -> Dict:
-        """Analyze current market conditions"""
-        return {
-            "volatility": 0.3,
-            "trend": "bullish",
-            "risk_level": "medium"
-        }
+    def analyze_market_conditions(self, pools_data: Optional[List[Dict]] = None) -> Dict:
+        """Analyze current market conditions from the streaming pool statistics"""
+        conditions = self.market_stats.market_conditions()
+        if pools_data is not None:
+            conditions["pools"] = {
+                pool["address"]: self.market_stats.pools[pool["address"]].to_dict()
+                for pool in pools_data
+                if pool["address"] in self.market_stats.pools
+            }
+        return conditions
+    
+    def _risk_profile(self, risk_tolerance: Union[str, float, None]) -> Tuple[float, float]:
+        """
+        Map a delegation risk tolerance ('low'/'medium'/'high' or 0..1) to
+        (risk aversion, max pool risk score)
+        """
+        if risk_tolerance is None:
+            risk_tolerance = self.risk_tolerance
+        
+        if isinstance(risk_tolerance, str):
+            return RISK_PROFILES.get(risk_tolerance, RISK_PROFILES["medium"])
+        
+        tolerance = min(max(float(risk_tolerance), 0.05), 1.0)
+        return 2.0 / tolerance, min(0.3 + tolerance * 0.7, 1.0)
     
-    def calculate_optimal_allocation(self, pools_data: List[Dict]) -> Dict:
+    def calculate_optimal_allocation(
+        self,
+        pools_data: Union[PoolSnapshot, List[Dict]],
+        risk_tolerance: Union[str, float, None] = None,
+        pool_caps: Optional[Dict[str, float]] = None
+    ) -> Dict:
         """Calculate optimal portfolio allocation"""
-        return {
-            "allocation": {
-                "pool_1": 0.4,
-                "pool_2": 0.3,
-                "pool_3": 0.3
-            },
-            "confidence": 0.85
+        pools = as_pool_snapshot(pools_data)
+        risk_aversion, max_pool_risk = self._risk_profile(risk_tolerance)
+        profile = (risk_aversion, max_pool_risk, self.max_pool_weight)
+        
+        caps_key = tuple(sorted(pool_caps.items())) if pool_caps else ()
+        cache_key = (pools.version, profile, caps_key)
+        cached = self._allocation_cache.get(cache_key)
+        if cached is not None:
+            self._allocation_cache.move_to_end(cache_key)
+            return self._copy_result(cached)
+        
+        # Per-pool caps: global max weight, explicit overrides, zero above the risk limit
+        caps = np.full(len(pools), self.max_pool_weight)
+        if pool_caps:
+            for address, cap in pool_caps.items():
+                row = pools.index.get(address)
+                if row is not None:
+                    caps[row] = min(caps[row], cap)
+        caps[pools.risk_score > max_pool_risk] = 0.0
+        caps[np.isnan(pools.apy)] = 0.0
+        
+        mu = np.nan_to_num(pools.apy) / 100
+        sigma = self.solver.pool_sigma(pools)
+        
+        previous = self._last_weights.get(profile)
+        initial = None
+        if previous:
+            initial = np.array([previous.get(address, 0.0) for address in pools.addresses])
+        
+        solution = self.solver.solve(mu, sigma, caps, risk_aversion, initial)
+        weights = solution.weights
+        
+        allocation = {
+            address: float(weight)
+            for address, weight in zip(pools.addresses, weights.tolist())
+            if weight > 1e-6
         }
+        self._last_weights[profile] = allocation
+        
+        expected_apy = float(weights @ np.nan_to_num(pools.apy))
+        portfolio_risk = float(weights @ pools.risk_score)
+        volatility = float(np.sqrt(max(weights @ self.solver.covariance_matvec(sigma, weights), 0.0)))
+        
+        result = {
+            "allocation": allocation,
+            "confidence": round(min(0.95, 0.5 + 0.5 * (1 - portfolio_risk)), 3),
+            "expected_apy": expected_apy,
+            "portfolio_risk": portfolio_risk,
+            "expected_volatility": volatility,
+            "unallocated": max(0.0, 1.0 - float(weights.sum())),
+            "evaluations": solution.evaluations,
+            "warm_start": solution.warm_started,
+            "snapshot_version": pools.version
+        }
+        
+        self._allocation_cache[cache_key] = result
+        if len(self._allocation_cache) > self._allocation_cache_size:
+            self._allocation_cache.popitem(last=False)
+        
+        return self._copy_result(result)
+    
+    @staticmethod
+    def _copy_result(result: Dict) -> Dict:
+        """
+        Caller's own copy, so changes to it cannot reach the cache or the warm start
+        """
+        return {**result, "allocation": dict(result["allocation"])}
 
 # Create singleton instance
-ai_engine = AIEngine()
\ No newline at end of file
+ai_engine = AIEngine()
@@ -1,10 +1,19 @@
+import bisect
+import heapq
+import math
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import logging
 
+from pool_snapshot import PoolSnapshot, as_pool_snapshot
+from portfolio_metrics import PortfolioMetricsBatch
+from position_table import PositionTable
+from ttl_cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -24,15 +33,586 @@ class UserPosition:
     balance: float
     value_usd: float
 
+@dataclass
+class RationaleInputs:
+    """
+    Numbers behind a rebalance rationale, rendered to text only on demand
+    """
+    from_name: str
+    from_apy: float
+    from_tvl: float
+    to_name: str
+    to_apy: float
+    to_tvl: float
+    apy_improvement: float
+    risk_increase: float
+    amount: float
+    
+    def render(self) -> str:
+        rationale_parts = []
+        
+        # APY improvement
+        rationale_parts.append(f"Moving from {self.from_name} ({self.from_apy:.1f}% APY) to {self.to_name} ({self.to_apy:.1f}% APY)")
+        rationale_parts.append(f"Expected APY improvement: +{self.apy_improvement:.1f}%")
+        
+        # Risk assessment
+        if self.risk_increase > 0:
+            rationale_parts.append(f"Risk increase: +{self.risk_increase:.2f} (acceptable)")
+        else:
+            rationale_parts.append(f"Risk decrease: {abs(self.risk_increase):.2f} (favorable)")
+        
+        # TVL comparison
+        if self.to_tvl > self.from_tvl:
+            rationale_parts.append(f"Moving to higher TVL pool (${self.to_tvl/1000000:.1f}M vs ${self.from_tvl/1000000:.1f}M)")
+        
+        # Amount
+        rationale_parts.append(f"Optimal rebalance amount: {self.amount:.3f} ETH")
+        
+        return " | ".join(rationale_parts)
+
 @dataclass
 class RebalanceAction:
     from_pool: str
     to_pool: str
     amount: float
     confidence: float
-    rationale: str
     expected_apy_improvement: float
     risk_adjustment: float
+    _rationale_inputs: RationaleInputs = field(repr=False)
+    
+    @property
+    def rationale(self) -> str:
+        """
+        Human-readable rationale, rendered from the inputs when read
+        """
+        return self._rationale_inputs.render()
+    
+    def to_dict(self) -> Dict:
+        return {
+            "from_pool": self.from_pool,
+            "to_pool": self.to_pool,
+            "amount": self.amount,
+            "confidence": self.confidence,
+            "rationale": self.rationale,
+            "expected_apy_improvement": self.expected_apy_improvement,
+            "risk_adjustment": self.risk_adjustment
+        }
+
+class PoolArrays(PoolSnapshot):
+    """
+    Private copy of a pool snapshot plus the derived structures the
+    vectorized scorer needs (address codes, eligibility index)
+    """
+    def __init__(self, pools: Union[PoolSnapshot, List[PoolData]]):
+        if not isinstance(pools, PoolSnapshot):
+            pools = PoolSnapshot.from_pools(pools)
+        
+        # Copied so in-place updates never leak into the caller's snapshot
+        super().__init__(
+            list(pools.addresses),
+            list(pools.names),
+            {field: getattr(pools, field).copy() for field in self.NUMERIC_FIELDS}
+        )
+        
+        # Integer code per address so "same pool" checks work on duplicates too
+        self._codes = {}
+        self.address_codes = np.array(
+            [self._codes.setdefault(address, len(self._codes)) for address in self.addresses],
+            dtype=np.int64
+        )
+        
+        self._eligibility = None  # Built on first use
+    
+    def eligibility_index(self) -> "PoolEligibilityIndex":
+        if self._eligibility is None:
+            self._eligibility = PoolEligibilityIndex(self.apy, self.risk_score)
+        return self._eligibility
+    
+    def update_row(self, row: int, pool: PoolData) -> None:
+        """
+        Overwrite one pool's metrics in place
+        """
+        super().update_row(row, pool)
+        if self._eligibility is not None:
+            self._eligibility.update(row, pool.apy, pool.risk_score)
+    
+    def append(self, pool: PoolData) -> int:
+        """
+        Add a previously unseen pool and return its row
+        """
+        row = super().append(pool)
+        self.address_codes = np.append(
+            self.address_codes, self._codes.setdefault(pool.address, len(self._codes))
+        )
+        if self._eligibility is not None:
+            self._eligibility.update(row, pool.apy, pool.risk_score)
+        return row
+
+class PoolEligibilityIndex:
+    """
+    Pool rows sorted by APY inside fixed-width risk buckets. Listing the
+    rebalance targets of a source pool is one bisect per bucket, so the scan
+    grows with the number of eligible pools rather than the pool universe.
+    
+    Results are a superset (bounds carry a small slack and the top risk bucket
+    is not filtered); callers apply the exact thresholds afterwards.
+    """
+    SLACK = 1e-9
+    
+    def __init__(self, apy: np.ndarray, risk_score: np.ndarray, bucket_width: float = 0.1):
+        self.bucket_width = bucket_width
+        self.buckets: Dict[int, Tuple[List[float], List[int]]] = {}  # bucket -> (apys, rows)
+        self.bucket_keys: List[int] = []  # Sorted bucket ids
+        self._entries: Dict[int, Tuple[int, float]] = {}  # row -> (bucket, apy)
+        
+        rows = np.flatnonzero(~(np.isnan(apy) | np.isnan(risk_score)))
+        buckets = np.floor(risk_score[rows] / bucket_width).astype(np.int64)
+        order = np.lexsort((rows, apy[rows], buckets))
+        rows, buckets = rows[order], buckets[order]
+        
+        for bucket in np.unique(buckets).tolist():
+            members = rows[buckets == bucket]
+            self.buckets[bucket] = (apy[members].tolist(), members.tolist())
+            self.bucket_keys.append(bucket)
+            for row, row_apy in zip(members.tolist(), apy[members].tolist()):
+                self._entries[row] = (bucket, row_apy)
+    
+    def update(self, row: int, apy: float, risk_score: float) -> None:
+        """
+        Move one pool to its new position in place
+        """
+        self._remove(row)
+        if math.isnan(apy) or math.isnan(risk_score):
+            return
+        
+        bucket = math.floor(risk_score / self.bucket_width)
+        if bucket not in self.buckets:
+            self.buckets[bucket] = ([], [])
+            bisect.insort(self.bucket_keys, bucket)
+        
+        apys, rows = self.buckets[bucket]
+        pos = bisect.bisect_right(apys, apy)
+        apys.insert(pos, apy)
+        rows.insert(pos, row)
+        self._entries[row] = (bucket, apy)
+    
+    def _remove(self, row: int) -> None:
+        entry = self._entries.pop(row, None)
+        if entry is None:
+            return
+        
+        bucket, apy = entry
+        apys, rows = self.buckets[bucket]
+        pos = bisect.bisect_left(apys, apy)
+        while rows[pos] != row:
+            pos += 1
+        del apys[pos]
+        del rows[pos]
+    
+    def targets(
+        self, 
+        apy: float, 
+        risk_score: float, 
+        min_apy_improvement: float, 
+        max_risk_increase: float
+    ) -> np.ndarray:
+        """
+        Sorted rows with APY >= apy + min_apy_improvement and
+        risk <= risk_score + max_risk_increase (plus slack)
+        """
+        min_apy = apy + min_apy_improvement - self.SLACK
+        max_bucket = math.floor((risk_score + max_risk_increase + self.SLACK) / self.bucket_width)
+        
+        found = []
+        for bucket in self.bucket_keys[:bisect.bisect_right(self.bucket_keys, max_bucket)]:
+            apys, rows = self.buckets[bucket]
+            found.extend(rows[bisect.bisect_left(apys, min_apy):])
+        
+        return np.sort(np.array(found, dtype=np.int64))
+
+@dataclass
+class UserCandidates:
+    positions: List[UserPosition]
+    # Min-heap of (confidence, -position_idx, -to_row, from_row); None = needs a full rescore
+    heap: Optional[List[Tuple[float, int, int, int]]] = None
+    # True when the heap holds every eligible pair, not just the top k
+    complete: bool = False
+
+class RebalanceCandidateCache:
+    """
+    Per-user heaps of the best rebalance candidates. Each heap holds a prefix
+    of that user's candidate ranking, so when one pool changes only the pairs
+    involving that pool need re-scoring.
+    
+    Users without an active position are not tracked, and past max_users the
+    least recently analyzed users are dropped (a dropped user is simply
+    re-scored in full if analyzed again).
+    """
+    def __init__(self, optimizer: "YieldOptimizer", top_k: int = 8, max_users: int = 10000):
+        self.optimizer = optimizer
+        self.top_k = top_k
+        self.max_users = max_users
+        self.pool_arrays: Optional[PoolArrays] = None
+        self.users: "OrderedDict[str, UserCandidates]" = OrderedDict()
+        self._sources = None  # Flat (user, position) arrays, rebuilt when positions change
+        self._floors = None   # Per-user heap floor entry (users x 4), aligned with _sources users
+        self._user_slots: Dict[str, int] = {}
+        self._dirty_users = set()  # Users whose slice of _sources is out of date
+    
+    def load_pools(self, pools: Union[PoolSnapshot, List[PoolData]]) -> None:
+        """
+        Replace the pool set; every user is re-scored on next use
+        """
+        self._reset(PoolArrays(pools))
+    
+    def _reset(self, pool_arrays: PoolArrays) -> None:
+        self.pool_arrays = pool_arrays
+        self._sources = None
+        for state in self.users.values():
+            state.heap = None
+    
+    def sync_pools(self, pools: Union[PoolSnapshot, List[PoolData]]) -> None:
+        """
+        Bring the cache in line with a full pool list, re-scoring only changed pools
+        """
+        incoming = PoolArrays(pools)
+        if self.pool_arrays is None or self.pool_arrays.addresses != incoming.addresses:
+            self._reset(incoming)
+            return
+        
+        current = self.pool_arrays
+        changed = np.flatnonzero(
+            (current.apy != incoming.apy)
+            | (current.tvl != incoming.tvl)
+            | (current.volume24h != incoming.volume24h)
+            | (current.risk_score != incoming.risk_score)
+            | (current.volatility != incoming.volatility)
+        )
+        
+        # Names and other non-scored fields are picked up without re-scoring
+        current.names = incoming.names
+        current.liquidity_depth = incoming.liquidity_depth
+        for row in changed.tolist():
+            self._apply_pool_update(row, incoming[row])
+    
+    def set_positions(self, user_address: str, positions: List[UserPosition]) -> None:
+        """
+        Track a user's positions; unchanged positions keep their cached candidates
+        """
+        if not any(position.balance != 0 for position in positions):
+            # Nothing to move: no candidates, so nothing worth keeping
+            self.remove_user(user_address)
+            return
+        
+        state = self.users.get(user_address)
+        if state is not None and state.positions == positions:
+            self.users.move_to_end(user_address)
+            return
+        
+        self.users[user_address] = UserCandidates(positions=list(positions))
+        self.users.move_to_end(user_address)
+        if state is not None and self._sources is not None:
+            self._dirty_users.add(user_address)
+        else:
+            self._sources = None
+            self._evict()
+    
+    def remove_user(self, user_address: str) -> None:
+        if self.users.pop(user_address, None) is not None:
+            self._dirty_users.discard(user_address)
+            self._sources = None
+    
+    def _evict(self) -> None:
+        """
+        Drop least recently analyzed users past max_users, a tenth at a time so
+        the flat source arrays are not rebuilt for every new user
+        """
+        if len(self.users) <= self.max_users:
+            return
+        target = self.max_users - self.max_users // 10
+        while len(self.users) > target:
+            user_address, _ = self.users.popitem(last=False)
+            self._dirty_users.discard(user_address)
+        self._sources = None
+    
+    def update_pool(self, pool: PoolData) -> List[str]:
+        """
+        Apply one pool's new metrics and return the users whose candidates were touched
+        """
+        row = self.pool_arrays.index.get(pool.address)
+        if row is None:
+            row = self.pool_arrays.append(pool)
+            self._sources = None
+            return self._apply_pool_update(row, pool, is_new=True)
+        
+        return self._apply_pool_update(row, pool)
+    
+    def best_candidate(self, user_address: str) -> Optional[Tuple[float, int, int, int]]:
+        """
+        Top (confidence, -position_idx, -to_row, from_row) entry for a tracked user
+        """
+        state = self.users.get(user_address)
+        if state is None or self.pool_arrays is None:
+            return None
+        self.users.move_to_end(user_address)
+        
+        if state.heap is None:
+            self._rescore_user(state)
+            self._store_floor(user_address, state)
+        
+        return max(state.heap) if state.heap else None
+    
+    def best_action(self, user_address: str) -> Optional[RebalanceAction]:
+        """
+        Best action for a tracked user, or None below the confidence threshold
+        """
+        candidate = self.best_candidate(user_address)
+        if candidate is None:
+            return None
+        
+        confidence, neg_position_idx, neg_to_row, from_row = candidate
+        if not confidence > self.optimizer.confidence_threshold:
+            return None
+        
+        state = self.users[user_address]
+        return self.optimizer._evaluate_rebalance(
+            self.pool_arrays[from_row],
+            self.pool_arrays[-neg_to_row],
+            state.positions[-neg_position_idx]
+        )
+    
+    def _get_sources(self):
+        """
+        Flat arrays of every tracked user's active positions, grouped by user
+        """
+        if self._sources is not None:
+            if self._dirty_users:
+                self._splice_sources()
+            return self._sources
+        
+        user_keys = list(self.users.keys())
+        src_user, src_position, src_rows, src_values = [], [], [], []
+        for user_idx, user_address in enumerate(user_keys):
+            for position_idx, pool_row, value in self._user_sources(user_address):
+                src_user.append(user_idx)
+                src_position.append(position_idx)
+                src_rows.append(pool_row)
+                src_values.append(value)
+        
+        self._sources = (
+            user_keys,
+            np.array(src_user, dtype=np.int64),
+            np.array(src_position, dtype=np.int64),
+            np.array(src_rows, dtype=np.int64),
+            np.array(src_values, dtype=np.float64)
+        )
+        self._user_slots = {user_address: idx for idx, user_address in enumerate(user_keys)}
+        self._floors = np.array(
+            [self._heap_floor(self.users[user]) for user in user_keys], dtype=np.float64
+        ).reshape(-1, 4)
+        self._dirty_users.clear()
+        return self._sources
+    
+    def _user_sources(self, user_address: str) -> List[Tuple[int, int, float]]:
+        """
+        (position_idx, pool row, value) for a user's active positions
+        """
+        index = self.pool_arrays.index
+        return [
+            (position_idx, index[position.pool_address], position.value_usd)
+            for position_idx, position in enumerate(self.users[user_address].positions)
+            if position.balance != 0 and position.pool_address in index
+        ]
+    
+    def _splice_sources(self) -> None:
+        """
+        Replace only the dirty users' slices of the flat source arrays
+        """
+        user_keys, src_user, src_position, src_rows, src_values = self._sources
+        columns = (src_user, src_position, src_rows, src_values)
+        pieces = ([], [], [], [])
+        start = 0
+        for user_idx in sorted(self._user_slots[user] for user in self._dirty_users):
+            low = int(np.searchsorted(src_user, user_idx, side='left'))
+            high = int(np.searchsorted(src_user, user_idx, side='right'))
+            fresh = self._user_sources(user_keys[user_idx])
+            replacement = (
+                [user_idx] * len(fresh),
+                [position_idx for position_idx, _, _ in fresh],
+                [pool_row for _, pool_row, _ in fresh],
+                [value for _, _, value in fresh]
+            )
+            for piece, column, values in zip(pieces, columns, replacement):
+                piece.append(column[start:low])
+                piece.append(np.array(values, dtype=column.dtype))
+            start = high
+            self._floors[user_idx] = self._heap_floor(self.users[user_keys[user_idx]])
+        
+        for piece, column in zip(pieces, columns):
+            piece.append(column[start:])
+        self._sources = (user_keys,) + tuple(np.concatenate(piece) for piece in pieces)
+        self._dirty_users.clear()
+    
+    @staticmethod
+    def _heap_floor(state: UserCandidates) -> Tuple[float, int, int, int]:
+        """
+        Lowest heap entry a pair has to reach to matter for this user
+        """
+        if state.heap is None:
+            return (np.inf, 0, 0, 0)    # Re-scored in full on next use anyway
+        if state.complete or not state.heap:
+            return (-np.inf, 0, 0, 0)   # Every eligible pair is listed
+        return state.heap[0]
+    
+    def _store_floor(self, user_address: str, state: UserCandidates) -> None:
+        if self._sources is not None:
+            self._floors[self._user_slots[user_address]] = self._heap_floor(state)
+    
+    def _rescore_user(self, state: UserCandidates) -> None:
+        """
+        Full rescore of one user, keeping the top k candidates
+        """
+        index = self.pool_arrays.index
+        active = [
+            (position_idx, index[position.pool_address], position.value_usd)
+            for position_idx, position in enumerate(state.positions)
+            if position.balance != 0 and position.pool_address in index
+        ]
+        
+        state.heap = []
+        state.complete = True
+        if not active:
+            return
+        
+        candidates = []
+        eligible_count = 0
+        for position_idx, from_row, value in active:
+            targets = self.optimizer._eligible_targets(self.pool_arrays, from_row)
+            if not len(targets):
+                continue
+            scores = self.optimizer._score_pairs(
+                self.pool_arrays, np.array([from_row]), np.array([value]), targets
+            )[0]
+            finite = np.flatnonzero(np.isfinite(scores))
+            eligible_count += len(finite)
+            # Only this source's own top k can make the user's top k
+            if len(finite) > self.top_k:
+                finite = finite[np.lexsort((targets[finite], -scores[finite]))[:self.top_k]]
+            candidates.extend(
+                (score, -position_idx, -to_row, from_row)
+                for score, to_row in zip(scores[finite].tolist(), targets[finite].tolist())
+            )
+        
+        # Highest confidence first, then the loop's position/pool order
+        state.complete = eligible_count <= self.top_k
+        state.heap = heapq.nlargest(self.top_k, candidates)
+        heapq.heapify(state.heap)
+    
+    def _apply_pool_update(self, row: int, pool: PoolData, is_new: bool = False) -> List[str]:
+        """
+        Re-score only the pairs that start or end at ``row``
+        """
+        optimizer = self.optimizer
+        pool_arrays = self.pool_arrays
+        user_keys, src_user, src_position, src_rows, src_values = self._get_sources()
+        to_row = np.array([row], dtype=np.int64)
+        
+        # Users whose (source -> row) pair was eligible before the change
+        touched = src_rows == row
+        old_column = np.full(len(src_rows), -np.inf)
+        if not is_new:
+            old_column = optimizer._score_pairs(pool_arrays, src_rows, src_values, to_row)[:, 0]
+            touched |= np.isfinite(old_column)
+            pool_arrays.update_row(row, pool)
+        
+        new_column = optimizer._score_pairs(pool_arrays, src_rows, src_values, to_row)[:, 0]
+        touched |= np.isfinite(new_column)
+        
+        # A pair below the user's heap floor was not listed and cannot enter.
+        # Entries compare as (confidence, -position_idx, -to_row, from_row) tuples.
+        floors = self._floors[src_user]
+        tie_break = np.sign(-src_position - floors[:, 1])
+        tie_break = np.where(tie_break == 0, np.sign(-row - floors[:, 2]), tie_break)
+        tie_break = np.where(tie_break == 0, np.sign(src_rows - floors[:, 3]), tie_break)
+        
+        def reaches_floor(column):
+            return (column > floors[:, 0]) | ((column == floors[:, 0]) & (tie_break >= 0))
+        
+        touched &= (src_rows == row) | reaches_floor(old_column) | reaches_floor(new_column)
+        
+        # Full rows for positions held in the changed pool
+        holders = np.flatnonzero(src_rows == row)
+        holder_targets = optimizer._eligible_targets(pool_arrays, row) if len(holders) else None
+        holder_scores = (
+            optimizer._score_pairs(pool_arrays, src_rows[holders], src_values[holders], holder_targets)
+            if len(holders) and len(holder_targets) else None
+        )
+        holder_slot = {int(src): slot for slot, src in enumerate(holders)}
+        
+        # Sources are grouped by user, so each user's touched sources are one slice
+        touched_sources = np.flatnonzero(touched)
+        touched_users, starts = np.unique(src_user[touched_sources], return_index=True)
+        bounds = np.append(starts, len(touched_sources)).tolist()
+        touched_list = touched_sources.tolist()
+        affected = []
+        for slot_idx, user_idx in enumerate(touched_users.tolist()):
+            user_address = user_keys[user_idx]
+            state = self.users[user_address]
+            if state.heap is None:
+                continue  # Re-scored in full on next use
+            
+            cutoff = None if state.complete or not state.heap else state.heap[0]
+            
+            # Drop stale pairs that start or end at the changed pool
+            heap = [c for c in state.heap if c[3] != row and -c[2] != row]
+            
+            complete = state.complete
+            for src in touched_list[bounds[slot_idx]:bounds[slot_idx + 1]]:
+                position_idx = int(src_position[src])
+                if np.isfinite(new_column[src]):
+                    heap.append((float(new_column[src]), -position_idx, -row, int(src_rows[src])))
+                
+                slot = holder_slot.get(src)
+                if slot is not None and holder_scores is not None:
+                    scores = holder_scores[slot]
+                    finite = np.flatnonzero(np.isfinite(scores))
+                    truncated = len(finite) > self.top_k
+                    if truncated:
+                        # Highest confidence first, then lowest target row
+                        finite = finite[np.lexsort((holder_targets[finite], -scores[finite]))[:self.top_k]]
+                    row_candidates = [
+                        (score, -position_idx, -to_row, row)
+                        for score, to_row in zip(scores[finite].tolist(), holder_targets[finite].tolist())
+                    ]
+                    if truncated:
+                        # Unlisted targets of this row rank below its k-th entry
+                        floor = min(row_candidates)
+                        cutoff = floor if cutoff is None else max(cutoff, floor)
+                        complete = False
+                    heap.extend(row_candidates)
+            
+            # Keep the heap a prefix of the new ranking: nothing below the cutoff
+            if cutoff is not None:
+                heap = [c for c in heap if c >= cutoff]
+                if not heap:
+                    state.heap = None
+                    self._rescore_user(state)
+                    self._floors[user_idx] = self._heap_floor(state)
+                    affected.append(user_address)
+                    continue
+            
+            heapq.heapify(heap)
+            while len(heap) > self.top_k:
+                heapq.heappop(heap)
+                complete = False
+            
+            state.complete = complete
+            
+            state.heap = heap
+            self._floors[user_idx] = self._heap_floor(state)
+            affected.append(user_address)
+        
+        return affected
 
 class YieldOptimizer:
     def __init__(self):
@@ -40,23 +620,38 @@ class YieldOptimizer:
         self.min_apy_improvement = 0.5  # Minimum 0.5% APY improvement
         self.max_risk_increase = 0.2    # Maximum 0.2 risk score increase
         self.gas_cost_threshold = 50    # USD
+        self.use_vectorized = True      # NumPy pair scoring instead of the nested loop
+        self.batch_max_cells = 1000000  # Upper bound on pair-matrix cells scored at once
+        self.candidate_cache = RebalanceCandidateCache(self)
+        # (snapshot version, positions, parameters) -> recommendations
+        self.recommendation_cache = TTLCache(max_entries=4096, ttl_seconds=300)
         
     def analyze_rebalance_opportunity(
         self, 
-        pools_data: List[Dict], 
+        pools_data: Union[PoolSnapshot, List[Dict]], 
         user_positions: List[Dict],
-        trigger_pool: str = None
+        trigger_pool: str = None,
+        user_address: str = None
     ) -> Optional[RebalanceAction]:
         """
         Advanced AI-driven yield optimization analysis
+        
+        With a user_address the user's candidates are cached, and later calls
+        only re-score the pairs involving pools that changed (normally just
+        trigger_pool).
         """
         try:
             # Convert to structured data
-            pools = [PoolData(**pool) for pool in pools_data]
+            pools = as_pool_snapshot(pools_data)
             positions = [UserPosition(**pos) for pos in user_positions]
             
             # Find optimal rebalance
-            best_action = self._find_optimal_rebalance(pools, positions, trigger_pool)
+            if user_address is not None:
+                self.candidate_cache.sync_pools(pools)
+                self.candidate_cache.set_positions(user_address, positions)
+                best_action = self.candidate_cache.best_action(user_address)
+            else:
+                best_action = self._find_optimal_rebalance(pools, positions, trigger_pool)
             
             if best_action:
                 logger.info(f"🎯 Optimal rebalance found: {best_action.rationale}")
@@ -68,15 +663,57 @@ class YieldOptimizer:
             logger.error(f"Error in yield analysis: {str(e)}")
             return None
     
+    def analyze_rebalance_batch(
+        self, 
+        pools_data: Union[PoolSnapshot, List[Dict]], 
+        positions_by_user: Dict[str, List[Dict]]
+    ) -> Dict[str, Optional[RebalanceAction]]:
+        """
+        Best rebalance action for many users against a single pool snapshot
+        """
+        try:
+            pool_arrays = PoolArrays(as_pool_snapshot(pools_data))
+            users = list(positions_by_user.keys())
+            positions = [
+                [UserPosition(**pos) for pos in positions_by_user[user]]
+                for user in users
+            ]
+            
+            actions = self._best_actions_vectorized(pool_arrays, positions)
+            
+            found = sum(1 for action in actions if action)
+            logger.info(f"🎯 Batch analysis: {found}/{len(users)} users have a rebalance")
+            return dict(zip(users, actions))
+            
+        except Exception as e:
+            logger.error(f"Error in batch yield analysis: {str(e)}")
+            return {user: None for user in positions_by_user}
+    
     def _find_optimal_rebalance(
         self, 
-        pools: List[PoolData], 
+        pools: Union[PoolSnapshot, List[PoolData]], 
         positions: List[UserPosition],
         trigger_pool: str = None
     ) -> Optional[RebalanceAction]:
         """
         Find the optimal rebalance using advanced algorithms
         """
+        if self.use_vectorized:
+            return self._find_optimal_rebalance_vectorized(
+                PoolArrays(pools), positions, trigger_pool
+            )
+        
+        return self._find_optimal_rebalance_scalar(pools, positions, trigger_pool)
+    
+    def _find_optimal_rebalance_scalar(
+        self, 
+        pools: Union[PoolSnapshot, List[PoolData]], 
+        positions: List[UserPosition],
+        trigger_pool: str = None
+    ) -> Optional[RebalanceAction]:
+        """
+        Reference implementation: evaluate every position x pool pair in Python
+        """
         best_action = None
         best_score = 0
         
@@ -107,6 +744,134 @@ class YieldOptimizer:
         
         return best_action if best_score > self.confidence_threshold else None
     
+    def _find_optimal_rebalance_vectorized(
+        self, 
+        pool_arrays: PoolArrays, 
+        positions: List[UserPosition],
+        trigger_pool: str = None
+    ) -> Optional[RebalanceAction]:
+        """
+        Score every position x pool pair as a matrix and build the winning action
+        """
+        actions = self._best_actions_vectorized(pool_arrays, [positions])
+        return actions[0]
+    
+    def _best_actions_vectorized(
+        self, 
+        pool_arrays: PoolArrays, 
+        positions_by_user: List[List[UserPosition]]
+    ) -> List[Optional[RebalanceAction]]:
+        """
+        Best action per user, scoring all users' positions against one pool set
+        """
+        n_users = len(positions_by_user)
+        results: List[Optional[RebalanceAction]] = [None] * n_users
+        
+        # Same eligibility rules as the scalar loop, flattened across users
+        active = []
+        user_ids = []
+        for user_idx, positions in enumerate(positions_by_user):
+            for position in positions:
+                if position.balance != 0 and position.pool_address in pool_arrays.index:
+                    active.append((position, pool_arrays.index[position.pool_address]))
+                    user_ids.append(user_idx)
+        
+        n_pools = len(pool_arrays)
+        if not active or n_pools == 0:
+            return results
+        
+        rows = np.array([row for _, row in active], dtype=np.int64)
+        values = np.array([position.value_usd for position, _ in active], dtype=np.float64)
+        user_ids = np.array(user_ids, dtype=np.int64)
+        
+        # Best target per source row. Sources in the same pool share one
+        # eligible target list; chunks bound the matrix size.
+        row_best = np.full(len(active), -np.inf)
+        row_target = np.zeros(len(active), dtype=np.int64)
+        source_pools, group = np.unique(rows, return_inverse=True)
+        members_by_pool = np.split(
+            np.argsort(group, kind='stable'), np.cumsum(np.bincount(group))[:-1]
+        )
+        for from_row, members in zip(source_pools.tolist(), members_by_pool):
+            targets = self._eligible_targets(pool_arrays, from_row)
+            if not len(targets):
+                continue
+            
+            chunk = max(1, self.batch_max_cells // len(targets))
+            for start in range(0, len(members), chunk):
+                part = members[start:start + chunk]
+                confidence = self._score_pairs(pool_arrays, rows[part], values[part], targets)
+                # First maximum per row matches the loop's strict ">" tie-breaking
+                best = np.argmax(confidence, axis=1)
+                row_best[part] = confidence[np.arange(len(part)), best]
+                row_target[part] = targets[best]
+        
+        # Best row per user; user_ids is sorted so the first match is the loop's winner
+        user_best = np.full(n_users, -np.inf)
+        np.maximum.at(user_best, user_ids, row_best)
+        winners = (row_best == user_best[user_ids]) & (row_best > self.confidence_threshold)
+        winner_rows = np.flatnonzero(winners)
+        winner_users, first = np.unique(user_ids[winner_rows], return_index=True)
+        
+        for user_idx, active_idx in zip(winner_users.tolist(), winner_rows[first].tolist()):
+            position, from_row = active[active_idx]
+            results[user_idx] = self._evaluate_rebalance(
+                pool_arrays[from_row],
+                pool_arrays[int(row_target[active_idx])],
+                position
+            )
+        
+        return results
+    
+    def _eligible_targets(self, pool_arrays: PoolArrays, from_row: int) -> np.ndarray:
+        """
+        Candidate target rows for a source pool, from the APY/risk index
+        """
+        return pool_arrays.eligibility_index().targets(
+            pool_arrays.apy[from_row],
+            pool_arrays.risk_score[from_row],
+            self.min_apy_improvement,
+            self.max_risk_increase
+        )
+    
+    def _score_pairs(
+        self, 
+        pool_arrays: PoolArrays, 
+        from_rows: np.ndarray, 
+        position_values: np.ndarray,
+        to_rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Confidence matrix (sources x targets), -inf where a pair is not eligible.
+        Targets default to every pool.
+        """
+        targets = slice(None) if to_rows is None else to_rows
+        to_tvl = pool_arrays.tvl[targets]
+        
+        apy_improvement = pool_arrays.apy[targets][None, :] - pool_arrays.apy[from_rows][:, None]
+        risk_increase = pool_arrays.risk_score[targets][None, :] - pool_arrays.risk_score[from_rows][:, None]
+        
+        eligible = (
+            (apy_improvement >= self.min_apy_improvement)
+            & (risk_increase <= self.max_risk_increase)
+            & (pool_arrays.address_codes[targets][None, :] != pool_arrays.address_codes[from_rows][:, None])
+        )
+        
+        # Factors mirror _calculate_confidence, summed in the same order
+        apy_factor = np.minimum(apy_improvement / 10.0, 0.3)
+        tvl_factor = np.minimum(to_tvl / 10000000, 0.25)[None, :]
+        risk_factor = np.maximum(0, 0.2 - risk_increase)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volume_factor = np.minimum(pool_arrays.volume24h[targets] / to_tvl, 0.15)[None, :]
+        position_factor = np.minimum(position_values / 100000, 0.1)[:, None]
+        volatility_penalty = np.minimum(pool_arrays.volatility[targets] * 5, 0.15)[None, :]
+        
+        confidence = 0.5 + ((((apy_factor + tvl_factor) + risk_factor) + volume_factor) + position_factor)
+        confidence = confidence - volatility_penalty
+        confidence = np.minimum(confidence, 1.0)
+        
+        return np.where(eligible & ~np.isnan(confidence), confidence, -np.inf)
+    
     def _evaluate_rebalance(
         self, 
         from_pool: PoolData, 
@@ -138,8 +903,8 @@ class YieldOptimizer:
             from_pool, to_pool, position
         )
         
-        # Generate rationale
-        rationale = self._generate_rationale(
+        # Rationale text is only rendered if this action is read out
+        rationale = self._defer_rationale(
             from_pool, to_pool, apy_improvement, risk_increase, optimal_amount
         )
         
@@ -148,9 +913,9 @@ class YieldOptimizer:
             to_pool=to_pool.address,
             amount=optimal_amount,
             confidence=confidence,
-            rationale=rationale,
             expected_apy_improvement=apy_improvement,
-            risk_adjustment=risk_increase
+            risk_adjustment=risk_increase,
+            _rationale_inputs=rationale
         )
     
     def _calculate_confidence(
@@ -186,10 +951,13 @@ class YieldOptimizer:
         position_factor = min(position.value_usd / 100000, 0.1)
         confidence_factors.append(position_factor)
         
+        # Volatility penalty (0-0.15), from streaming APY statistics
+        volatility_penalty = min(to_pool.volatility * 5, 0.15)
+        
         # Base confidence
         base_confidence = 0.5
         
-        total_confidence = base_confidence + sum(confidence_factors)
+        total_confidence = base_confidence + sum(confidence_factors) - volatility_penalty
         
         return min(total_confidence, 1.0)
     
@@ -231,30 +999,34 @@ class YieldOptimizer:
         """
         Generate human-readable rationale for the rebalance
         """
-        rationale_parts = []
-        
-        # APY improvement
-        rationale_parts.append(f"Moving from {from_pool.name} ({from_pool.apy:.1f}% APY) to {to_pool.name} ({to_pool.apy:.1f}% APY)")
-        rationale_parts.append(f"Expected APY improvement: +{apy_improvement:.1f}%")
-        
-        # Risk assessment
-        if risk_increase > 0:
-            rationale_parts.append(f"Risk increase: +{risk_increase:.2f} (acceptable)")
-        else:
-            rationale_parts.append(f"Risk decrease: {abs(risk_increase):.2f} (favorable)")
-        
-        # TVL comparison
-        if to_pool.tvl > from_pool.tvl:
-            rationale_parts.append(f"Moving to higher TVL pool (${to_pool.tvl/1000000:.1f}M vs ${from_pool.tvl/1000000:.1f}M)")
-        
-        # Amount
-        rationale_parts.append(f"Optimal rebalance amount: {amount:.3f} ETH")
-        
-        return " | ".join(rationale_parts)
+        return self._defer_rationale(from_pool, to_pool, apy_improvement, risk_increase, amount).render()
+    
+    def _defer_rationale(
+        self, 
+        from_pool: PoolData, 
+        to_pool: PoolData, 
+        apy_improvement: float,
+        risk_increase: float,
+        amount: float
+    ) -> RationaleInputs:
+        """
+        Capture the rationale inputs without building any strings
+        """
+        return RationaleInputs(
+            from_name=from_pool.name,
+            from_apy=from_pool.apy,
+            from_tvl=from_pool.tvl,
+            to_name=to_pool.name,
+            to_apy=to_pool.apy,
+            to_tvl=to_pool.tvl,
+            apy_improvement=apy_improvement,
+            risk_increase=risk_increase,
+            amount=amount
+        )
     
     def calculate_portfolio_metrics(
         self, 
-        pools_data: List[Dict], 
+        pools_data: Union[PoolSnapshot, List[Dict]], 
         user_positions: List[Dict]
     ) -> Dict:
         """
@@ -269,69 +1041,67 @@ class YieldOptimizer:
                 "daily_earnings": 0
             }
         
-        pools = [PoolData(**pool) for pool in pools_data]
-        positions = [UserPosition(**pos) for pos in user_positions]
-        pool_map = {pool.address: pool for pool in pools}
-        
-        total_value = sum(pos.value_usd for pos in positions)
-        
-        if total_value == 0:
-            return {
-                "total_value": 0,
-                "weighted_apy": 0,
-                "portfolio_risk": 0,
-                "diversification_score": 0,
-                "daily_earnings": 0
-            }
-        
-        # Weighted APY
-        weighted_apy = sum(
-            (pos.value_usd / total_value) * pool_map[pos.pool_address].apy
-            for pos in positions if pos.pool_address in pool_map
-        )
-        
-        # Portfolio risk (weighted average)
-        portfolio_risk = sum(
-            (pos.value_usd / total_value) * pool_map[pos.pool_address].risk_score
-            for pos in positions if pos.pool_address in pool_map
-        )
-        
-        # Diversification score (simple: 1 - Herfindahl index)
-        weights = [pos.value_usd / total_value for pos in positions]
-        herfindahl = sum(w**2 for w in weights)
-        diversification_score = 1 - herfindahl
+        pools = as_pool_snapshot(pools_data)
+        table = PositionTable.from_positions(pools, {"user": user_positions})
         
-        # Daily earnings
-        daily_earnings = total_value * (weighted_apy / 100) / 365
+        return PortfolioMetricsBatch(pools, table).to_dicts()["user"]
+    
+    def calculate_portfolio_metrics_batch(
+        self, 
+        pools_data: Union[PoolSnapshot, List[Dict]], 
+        positions: Union[PositionTable, Dict[str, List[Dict]]],
+        include_distribution: bool = True
+    ) -> Dict[str, Dict]:
+        """
+        Portfolio metrics for many users in one grouped pass
+        """
+        pools = as_pool_snapshot(pools_data)
+        if not isinstance(positions, PositionTable):
+            positions = PositionTable.from_positions(pools, positions)
         
-        return {
-            "total_value": total_value,
-            "weighted_apy": weighted_apy,
-            "portfolio_risk": portfolio_risk,
-            "diversification_score": diversification_score,
-            "daily_earnings": daily_earnings,
-            "position_count": len(positions),
-            "pool_distribution": {
-                pos.pool_address: pos.value_usd / total_value 
-                for pos in positions
-            }
-        }
+        return PortfolioMetricsBatch(pools, positions).to_dicts(include_distribution)
     
     def generate_recommendations(
         self, 
-        pools_data: List[Dict], 
+        pools_data: Union[PoolSnapshot, List[Dict]], 
         user_positions: List[Dict]
     ) -> List[Dict]:
         """
         Generate AI recommendations for portfolio optimization
+        
+        Results are memoized per (snapshot version, positions, parameters).
+        Pass a long-lived PoolSnapshot to benefit: a list of dicts becomes a
+        new snapshot, and so a new version, on every call.
         """
-        recommendations = []
+        pools = as_pool_snapshot(pools_data)
+        cache_key = (
+            pools.version,
+            # The positions themselves: a bare hash could collide and serve another user's results
+            tuple((pos["pool_address"], pos["balance"], pos["value_usd"]) for pos in user_positions),
+            (self.min_apy_improvement, self.max_risk_increase, self.gas_cost_threshold)
+        )
+        
+        recommendations = self.recommendation_cache.get(cache_key)
+        if recommendations is None:
+            recommendations = self._build_recommendations(pools, user_positions)
+            self.recommendation_cache.put(cache_key, recommendations)
         
-        pools = [PoolData(**pool) for pool in pools_data]
+        # Copies, so callers cannot mutate the cached entries
+        return [dict(rec) for rec in recommendations]
+    
+    def invalidate_recommendations(self) -> int:
+        """
+        Drop memoized recommendations after a pool update. Every entry depends
+        on the whole pool set (the best-pool pick), so all of them go.
+        """
+        return self.recommendation_cache.invalidate()
+    
+    def _build_recommendations(self, pools: PoolSnapshot, user_positions: List[Dict]) -> List[Dict]:
+        recommendations = []
         positions = [UserPosition(**pos) for pos in user_positions]
         
         # Portfolio metrics
-        metrics = self.calculate_portfolio_metrics(pools_data, user_positions)
+        metrics = self.calculate_portfolio_metrics(pools, user_positions)
         
         # Risk-based recommendations
         if metrics["portfolio_risk"] > 0.6:
@@ -356,16 +1126,22 @@ class YieldOptimizer:
         # APY optimization
         if len(positions) > 0:
             avg_apy = metrics["weighted_apy"]
-            high_apy_pools = [p for p in pools if p.apy > avg_apy + 2 and p.risk_score < 0.5]
+            high_apy_rows = np.flatnonzero((pools.apy > avg_apy + 2) & (pools.risk_score < 0.5))
             
-            if high_apy_pools:
-                best_pool = max(high_apy_pools, key=lambda p: p.apy - p.risk_score * 10)
+            if len(high_apy_rows):
+                # First maximum, as max() over the pool list would pick
+                scores = pools.apy[high_apy_rows] - pools.risk_score[high_apy_rows] * 10
+                best_pool = pools[int(high_apy_rows[np.argmax(scores)])]
                 recommendations.append({
                     "type": "yield_opportunity",
                     "priority": "medium",
                     "title": "Higher Yield Opportunity",
                     "description": f"Consider {best_pool.name} with {best_pool.apy:.1f}% APY (current avg: {avg_apy:.1f}%)",
-                    "confidence": 0.75
+                    "confidence": 0.75,
+                    "pool_address": best_pool.address,
+                    "pool_name": best_pool.name,
+                    "expected_gain": best_pool.apy - avg_apy,
+                    "risk_score": best_pool.risk_score
                 })
         
         return sorted(recommendations, key=lambda x: x["confidence"], reverse=True)
\ No newline at end of file
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Replay exported pool_events through the optimizer and simulate wallets.
+
+Export the events in time order, e.g.
+
+    \\copy (SELECT * FROM pool_events ORDER BY timestamp, id) TO 'events.csv' CSV HEADER
+
+then run
+
+    python backtest.py events.csv --wallets wallets.json --pools pools.json --workers 8
+"""
+
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ai_engine import PoolData, UserPosition, YieldOptimizer
+from market_stats import MarketStatistics, to_epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+@dataclass
+class PoolEvent:
+    """One row of the pool_events table"""
+    pool_address: str
+    event_type: str
+    old_apy: Optional[float]
+    new_apy: Optional[float]
+    tvl: Optional[float]
+    block_number: Optional[int]
+    timestamp: float  # Epoch seconds
+
+@dataclass
+class BacktestConfig:
+    gas_cost_usd: float = 5.0           # Charged per executed rebalance
+    gain_horizon_days: float = 30.0     # Expected gain over this horizon must cover gas
+                                        # and the optimizer's gas_cost_threshold
+    optimizer_params: Dict[str, float] = field(default_factory=dict)
+    use_market_stats: bool = True       # Feed volatility into confidence, like the API
+    reorder_window: int = 10000         # Events buffered to fix small ordering glitches
+    max_rebalances_per_event: int = 1   # Per wallet
+    default_risk_score: float = 0.5     # For pools missing from the pool metadata
+
+@dataclass
+class WalletResult:
+    wallet: str
+    initial_value: float
+    final_value: float
+    earnings_usd: float
+    gas_usd: float
+    rebalances: int
+    skipped_for_gas: int
+    
+    @property
+    def net_usd(self) -> float:
+        return self.earnings_usd - self.gas_usd
+
+def _optional_float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+def read_pool_events(path: str, reorder_window: int = 10000) -> Iterator[PoolEvent]:
+    """
+    Stream events from a CSV or JSON-lines export in time order.
+    Holds at most reorder_window events; anything later than that is an error.
+    """
+    def rows():
+        with open(path, newline="") as f:
+            if path.endswith((".jsonl", ".ndjson")):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
+    
+    buffer = []
+    sequence = itertools.count()
+    last_emitted = float("-inf")
+    
+    def emit():
+        nonlocal last_emitted
+        timestamp, _, event = heapq.heappop(buffer)
+        if timestamp < last_emitted:
+            raise ValueError(
+                f"{path}: event at {timestamp} is out of order by more than {reorder_window} events"
+            )
+        last_emitted = timestamp
+        return event
+    
+    for row in rows():
+        block = row.get("block_number")
+        event = PoolEvent(
+            pool_address=row["pool_address"],
+            event_type=row.get("event_type") or "",
+            old_apy=_optional_float(row.get("old_apy")),
+            new_apy=_optional_float(row.get("new_apy")),
+            tvl=_optional_float(row.get("tvl")),
+            block_number=int(block) if block not in (None, "") else None,
+            timestamp=to_epoch_seconds(row["timestamp"])
+        )
+        heapq.heappush(buffer, (event.timestamp, next(sequence), event))
+        if len(buffer) > reorder_window:
+            yield emit()
+    
+    while buffer:
+        yield emit()
+
+class BacktestEngine:
+    """
+    Replays events for one set of wallets. Each event updates one pool in
+    the optimizer's candidate cache, so only wallets whose candidates that
+    pool touches are re-evaluated (the same incremental path
+    analyze_rebalance_opportunity uses with a user_address).
+    """
+    def __init__(self, pools: List[Dict], wallets: Dict[str, List[Dict]], config: BacktestConfig):
+        self.config = config
+        self.optimizer = YieldOptimizer()
+        for name, value in config.optimizer_params.items():
+            if not hasattr(self.optimizer, name):
+                raise ValueError(f"Unknown optimizer parameter: {name}")
+            setattr(self.optimizer, name, value)
+        
+        self.market_stats = MarketStatistics() if config.use_market_stats else None
+        self.pools: Dict[str, PoolData] = {
+            pool["address"]: PoolData(
+                address=pool["address"],
+                name=pool.get("name", pool["address"]),
+                apy=float(pool.get("apy", 0.0)),
+                tvl=float(pool.get("tvl", 0.0)),
+                volume24h=float(pool.get("volume24h", 0.0)),
+                risk_score=float(pool.get("risk_score", config.default_risk_score))
+            )
+            for pool in pools
+        }
+        
+        # APY integral per pool (APY x seconds), for lazy earnings accrual
+        self._integral: Dict[str, float] = {address: 0.0 for address in self.pools}
+        self._integral_time: Dict[str, Optional[float]] = {address: None for address in self.pools}
+        
+        # wallet -> pool -> [balance, value_usd, integral at last settlement]
+        self.positions: Dict[str, Dict[str, List[float]]] = {}
+        self.results: Dict[str, WalletResult] = {}
+        for wallet, positions in wallets.items():
+            held = {}
+            for pos in positions:
+                entry = held.setdefault(pos["pool_address"], [0.0, 0.0, 0.0])
+                entry[0] += float(pos["balance"])
+                entry[1] += float(pos["value_usd"])
+            self.positions[wallet] = held
+            initial_value = sum(entry[1] for entry in held.values())
+            self.results[wallet] = WalletResult(wallet, initial_value, initial_value, 0.0, 0.0, 0, 0)
+        
+        cache = self.optimizer.candidate_cache
+        cache.load_pools(list(self.pools.values()))
+        for wallet in self.positions:
+            cache.set_positions(wallet, self._user_positions(wallet))
+        
+        self.events_processed = 0
+        self.clock: Optional[float] = None
+        self._pending = set()
+        # Gas-skipped decisions stay valid while the top candidate and its pools are unchanged
+        self._skipped: Dict[str, tuple] = {}       # wallet -> (candidate, event index)
+        self._row_updated_at: Dict[int, int] = {}  # cache row -> last event index touching it
+    
+    def run(self, events: Iterable[PoolEvent]) -> Dict:
+        started = time.perf_counter()
+        for event in events:
+            self.apply_event(event)
+        self.finish()
+        elapsed = time.perf_counter() - started
+        
+        return {
+            "events": self.events_processed,
+            "wallets": len(self.results),
+            "elapsed_seconds": elapsed,
+            "events_per_second": self.events_processed / elapsed if elapsed > 0 else 0.0,
+            "results": [asdict(result) for result in self.results.values()]
+        }
+    
+    def apply_event(self, event: PoolEvent) -> None:
+        now = event.timestamp
+        first_event = self.clock is None
+        if first_event:
+            # Positions start accruing at the first event
+            for address in self._integral_time:
+                self._integral_time[address] = now
+        self.clock = now
+        
+        address = event.pool_address
+        pool = self.pools.get(address)
+        if pool is None:
+            pool = PoolData(
+                address=address,
+                name=address,
+                apy=event.new_apy if event.new_apy is not None else (event.old_apy or 0.0),
+                tvl=event.tvl or 0.0,
+                volume24h=0.0,
+                risk_score=self.config.default_risk_score
+            )
+            self.pools[address] = pool
+            self._integral[address] = 0.0
+            self._integral_time[address] = now
+        
+        # Close the integral at the old APY before changing it
+        self._integral[address] = self._pool_integral(address, now)
+        self._integral_time[address] = now
+        
+        if event.new_apy is not None:
+            pool.apy = event.new_apy
+        if event.tvl is not None:
+            pool.tvl = event.tvl
+        if self.market_stats is not None and event.new_apy is not None:
+            self.market_stats.observe_event(address, event.old_apy, event.new_apy, now)
+            pool.volatility = self.market_stats.volatility(address)
+        
+        # Wallets whose candidates this pool touched, plus wallets that
+        # rebalanced last time and may have a follow-up move
+        cache = self.optimizer.candidate_cache
+        affected = cache.update_pool(pool)
+        self._row_updated_at[cache.pool_arrays.index[address]] = self.events_processed
+        wallets = self.positions if first_event else dict.fromkeys(itertools.chain(self._pending, affected))
+        self._pending = set()
+        for wallet in wallets:
+            self._rebalance_wallet(wallet, now)
+        
+        self.events_processed += 1
+    
+    def finish(self) -> None:
+        """
+        Settle earnings for every open position up to the last event
+        """
+        if self.clock is None:
+            return
+        for wallet, held in self.positions.items():
+            for address in held:
+                self._settle(wallet, address, self.clock)
+            self.results[wallet].final_value = sum(entry[1] for entry in held.values())
+    
+    def _pool_integral(self, address: str, now: float) -> float:
+        since = self._integral_time.get(address)
+        if since is None:
+            return self._integral.get(address, 0.0)
+        return self._integral[address] + self.pools[address].apy * (now - since)
+    
+    def _settle(self, wallet: str, address: str, now: float) -> None:
+        entry = self.positions[wallet][address]
+        integral = self._pool_integral(address, now) if address in self.pools else entry[2]
+        self.results[wallet].earnings_usd += entry[1] * (integral - entry[2]) / 100 / SECONDS_PER_YEAR
+        entry[2] = integral
+    
+    def _rebalance_wallet(self, wallet: str, now: float) -> None:
+        cache = self.optimizer.candidate_cache
+        for _ in range(self.config.max_rebalances_per_event):
+            candidate = cache.best_candidate(wallet)
+            skipped = self._skipped.get(wallet)
+            if skipped is not None and skipped[0] == candidate and all(
+                self._row_updated_at.get(row, -1) <= skipped[1] for row in (candidate[3], -candidate[2])
+            ):
+                break
+            
+            action = cache.best_action(wallet)
+            if action is None or not self._execute(wallet, action, now):
+                break
+        else:
+            # Positions changed; the cache only reports wallets it has scored
+            self._pending.add(wallet)
+    
+    def _execute(self, wallet: str, action, now: float) -> bool:
+        held = self.positions[wallet]
+        source = held.get(action.from_pool)
+        if source is None or source[0] <= 0:
+            return False
+        
+        amount = min(action.amount, source[0])
+        moved_value = source[1] * amount / source[0]
+        
+        expected_gain = moved_value * action.expected_apy_improvement / 100 * self.config.gain_horizon_days / 365
+        result = self.results[wallet]
+        if expected_gain < max(self.config.gas_cost_usd, self.optimizer.gas_cost_threshold):
+            result.skipped_for_gas += 1
+            self._skipped[wallet] = (self.optimizer.candidate_cache.best_candidate(wallet), self.events_processed)
+            return False
+        
+        self._settle(wallet, action.from_pool, now)
+        source[0] -= amount
+        source[1] -= moved_value
+        
+        if action.to_pool in held:
+            self._settle(wallet, action.to_pool, now)
+            target = held[action.to_pool]
+        else:
+            target = held[action.to_pool] = [0.0, 0.0, self._pool_integral(action.to_pool, now)]
+        target[0] += amount
+        target[1] += moved_value
+        
+        if source[0] <= 1e-12:
+            del held[action.from_pool]
+        
+        result.gas_usd += self.config.gas_cost_usd
+        result.rebalances += 1
+        self._skipped.pop(wallet, None)
+        self.optimizer.candidate_cache.set_positions(wallet, self._user_positions(wallet))
+        return True
+    
+    def _user_positions(self, wallet: str) -> List[UserPosition]:
+        return [
+            UserPosition(pool_address=address, balance=entry[0], value_usd=entry[1])
+            for address, entry in self.positions[wallet].items()
+        ]
+
+def _run_shard(events_path: str, pools: List[Dict], wallets: Dict[str, List[Dict]], config: BacktestConfig) -> Dict:
+    # Each worker streams the file itself; only wallets and parameters are pickled
+    engine = BacktestEngine(pools, wallets, config)
+    return engine.run(read_pool_events(events_path, config.reorder_window))
+
+def run_backtest(
+    events_path: str,
+    pools: List[Dict],
+    wallets: Dict[str, List[Dict]],
+    config: Optional[BacktestConfig] = None,
+    workers: int = 1
+) -> Dict:
+    """
+    Shard independent wallets across a process pool and merge the results
+    """
+    config = config or BacktestConfig()
+    workers = max(1, min(workers, len(wallets) or 1))
+    
+    wallet_ids = sorted(wallets)
+    shards = [
+        {wallet: wallets[wallet] for wallet in wallet_ids[i::workers]}
+        for i in range(workers)
+    ]
+    
+    started = time.perf_counter()
+    if workers == 1:
+        shard_reports = [_run_shard(events_path, pools, shards[0], config)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shard_reports = list(executor.map(
+                _run_shard,
+                itertools.repeat(events_path),
+                itertools.repeat(pools),
+                shards,
+                itertools.repeat(config)
+            ))
+    elapsed = time.perf_counter() - started
+    
+    results = [result for report in shard_reports for result in report["results"]]
+    events = shard_reports[0]["events"] if shard_reports else 0
+    
+    return {
+        "events": events,
+        "wallets": len(results),
+        "workers": workers,
+        "elapsed_seconds": elapsed,
+        "events_per_second": events / elapsed if elapsed > 0 else 0.0,
+        # Every shard replays every event
+        "wallet_events_per_second": events * len(results) / elapsed if elapsed > 0 else 0.0,
+        "shard_events_per_second": [report["events_per_second"] for report in shard_reports],
+        "totals": {
+            "earnings_usd": sum(r["earnings_usd"] for r in results),
+            "gas_usd": sum(r["gas_usd"] for r in results),
+            "rebalances": sum(r["rebalances"] for r in results),
+            "skipped_for_gas": sum(r["skipped_for_gas"] for r in results)
+        },
+        "results": results
+    }
+
+def write_results_csv(path: str, results: List[Dict]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()) + ["net_usd"])
+        writer.writeheader()
+        for result in results:
+            writer.writerow({**result, "net_usd": result["earnings_usd"] - result["gas_usd"]})
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay pool_events through the yield optimizer")
+    parser.add_argument("events", help="pool_events export (.csv or .jsonl), in time order")
+    parser.add_argument("--wallets", required=True, help="JSON {wallet: [{pool_address, balance, value_usd}]}")
+    parser.add_argument("--pools", help="JSON list of pool metadata (name, volume24h, risk_score, ...)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--gas-cost", type=float, default=5.0)
+    parser.add_argument("--output", help="Per-wallet results CSV")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    with open(args.wallets) as f:
+        wallets = json.load(f)
+    pools = []
+    if args.pools:
+        with open(args.pools) as f:
+            pools = json.load(f)
+    
+    report = run_backtest(
+        args.events, pools, wallets, BacktestConfig(gas_cost_usd=args.gas_cost), args.workers
+    )
+    
+    logger.info(
+        f"📈 Replayed {report['events']} events for {report['wallets']} wallets "
+        f"on {report['workers']} workers in {report['elapsed_seconds']:.1f}s "
+        f"({report['events_per_second']:.0f} events/sec)"
+    )
+    totals = report["totals"]
+    logger.info(
+        f"💰 Earnings ${totals['earnings_usd']:.2f}, gas ${totals['gas_usd']:.2f}, "
+        f"{totals['rebalances']} rebalances, {totals['skipped_for_gas']} skipped for gas"
+    )
+    
+    if args.output and report["results"]:
+        write_results_csv(args.output, report["results"])
+
+if __name__ == "__main__":
+    main()
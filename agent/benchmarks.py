@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the optimizer hot paths.
+
+    python benchmarks.py rationale --pools 1000 --positions 20
+    python benchmarks.py scaling --output bench.json
+    python benchmarks.py scaling --pools 10,1000 --positions 1,100 --compare bench.json
+
+The scaling suite times the public YieldOptimizer entry points over a grid of
+pool and position counts and writes one JSON file per run (commit, machine,
+per-case latency percentiles, peak memory, allocations, and the pool
+snapshot's footprint per pool count), so two commits can be compared with
+--compare.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_engine import PoolData, UserPosition, YieldOptimizer
+from pool_snapshot import PoolSnapshot
+
+DEFAULT_POOL_COUNTS = (10, 100, 1000, 10000, 100000)
+DEFAULT_POSITION_COUNTS = (1, 10, 100, 1000)
+
+def generate_universe(n_pools: int, n_positions: int, seed: int = 7) -> Tuple[List[PoolData], List[UserPosition]]:
+    """
+    Random pools and positions in the ranges the mock data uses
+    """
+    rng = random.Random(seed)
+    pools = [
+        PoolData(
+            address=f"0x{i:040x}",
+            name=f"POOL{i}/USDC",
+            apy=round(rng.uniform(1, 30), 2),
+            tvl=rng.uniform(1e5, 2e7),
+            volume24h=rng.uniform(1e4, 3e6),
+            risk_score=round(rng.uniform(0, 1), 2)
+        )
+        for i in range(n_pools)
+    ]
+    positions = [
+        UserPosition(
+            pool_address=pools[rng.randrange(n_pools)].address,
+            balance=rng.uniform(0.1, 5),
+            value_usd=rng.uniform(1e3, 2e5)
+        )
+        for _ in range(n_positions)
+    ]
+    return pools, positions
+
+def generate_api_inputs(n_pools: int, n_positions: int, seed: int = 7) -> Tuple[PoolSnapshot, List[Dict]]:
+    """
+    The same universe in the shapes the API passes in: a pool snapshot and position dicts
+    """
+    pools, positions = generate_universe(n_pools, n_positions, seed)
+    return PoolSnapshot.from_pools(pools), [asdict(position) for position in positions]
+
+def time_call(fn: Callable, repeats: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000
+    }
+
+def latency_profile(fn: Callable, repeats: int, budget_seconds: float) -> Dict[str, float]:
+    """
+    Latency percentiles over up to `repeats` timed calls, stopping early once
+    budget_seconds of samples are in (at least one sample is always taken)
+    """
+    samples = []
+    spent = 0.0
+    while len(samples) < repeats and (not samples or spent < budget_seconds):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        spent += elapsed
+    
+    samples_ms = np.array(samples) * 1000
+    p50, p90, p99 = np.percentile(samples_ms, [50, 90, 99]).tolist()
+    return {
+        "samples": len(samples),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "max_ms": float(samples_ms.max())
+    }
+
+def memory_profile(fn: Callable) -> Dict[str, int]:
+    """
+    One traced call: peak traced bytes above the starting point (NumPy
+    buffers included), blocks still held afterwards, and gen-0 garbage
+    collections triggered (a proxy for container-object churn)
+    """
+    gc.collect()
+    collections_before = gc.get_stats()[0]["collections"]
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    retained_blocks = sys.getallocatedblocks() - blocks_before
+    del result
+    return {
+        "peak_bytes": peak - baseline,
+        "retained_bytes": current - baseline,
+        "retained_blocks": retained_blocks,
+        "gc_collections": gc.get_stats()[0]["collections"] - collections_before
+    }
+
+class EagerRationaleOptimizer(YieldOptimizer):
+    """
+    Previous behaviour: every evaluated candidate renders its rationale
+    """
+    def _defer_rationale(self, from_pool, to_pool, apy_improvement, risk_increase, amount):
+        inputs = super()._defer_rationale(from_pool, to_pool, apy_improvement, risk_increase, amount)
+        inputs.render()
+        return inputs
+
+def bench_rationale(n_pools: int = 1000, n_positions: int = 20, repeats: int = 5) -> Dict:
+    """
+    Scalar candidate loop with eager vs deferred rationale rendering
+    """
+    pools, positions = generate_universe(n_pools, n_positions)
+    eager, deferred = EagerRationaleOptimizer(), YieldOptimizer()
+    
+    eager_action = eager._find_optimal_rebalance_scalar(pools, positions)
+    deferred_action = deferred._find_optimal_rebalance_scalar(pools, positions)
+    assert eager_action == deferred_action, "deferred rationale changed the result"
+    
+    candidates = sum(
+        1
+        for position in positions
+        for pool in pools
+        if pool.address != position.pool_address
+    )
+    results = {
+        "pools": n_pools,
+        "positions": n_positions,
+        "candidate_pairs": candidates,
+        "eager": time_call(lambda: eager._find_optimal_rebalance_scalar(pools, positions), repeats),
+        "deferred": time_call(lambda: deferred._find_optimal_rebalance_scalar(pools, positions), repeats)
+    }
+    results["speedup"] = results["eager"]["median_ms"] / results["deferred"]["median_ms"]
+    return results
+
+def scaling_operations(optimizer: YieldOptimizer, pools: PoolSnapshot, positions: List[Dict]) -> Dict[str, Callable]:
+    """
+    Calls under test, keyed by the name used in result files
+    """
+    def recommendations_cold():
+        optimizer.invalidate_recommendations()
+        return optimizer.generate_recommendations(pools, positions)
+    
+    return {
+        "analyze_rebalance_opportunity": lambda: optimizer.analyze_rebalance_opportunity(pools, positions),
+        "calculate_portfolio_metrics": lambda: optimizer.calculate_portfolio_metrics(pools, positions),
+        "generate_recommendations": recommendations_cold,
+        "generate_recommendations_cached": lambda: optimizer.generate_recommendations(pools, positions)
+    }
+
+def bench_scaling(
+    pool_counts: Sequence[int] = DEFAULT_POOL_COUNTS,
+    position_counts: Sequence[int] = DEFAULT_POSITION_COUNTS,
+    repeats: int = 20,
+    case_budget_seconds: float = 5.0,
+    max_call_seconds: float = 20.0,
+    latency_budget_ms: float = 100.0,
+    seed: int = 7
+) -> Dict:
+    """
+    Every operation over the pools x positions grid. Once a single call of an
+    operation takes longer than max_call_seconds, larger cases of it are
+    recorded as skipped instead of run.
+    """
+    cases = []
+    snapshot_memory: Dict[int, Dict] = {}
+    too_slow: Dict[str, Tuple[int, int]] = {}
+    
+    # Optimizer logging would dominate the small cases
+    logging.disable(logging.INFO)
+    try:
+        for n_pools in sorted(pool_counts):
+            for n_positions in sorted(position_counts):
+                pools, positions = generate_api_inputs(n_pools, n_positions, seed)
+                snapshot_memory.setdefault(n_pools, pools.memory_usage())
+                optimizer = YieldOptimizer()
+                
+                for operation, fn in scaling_operations(optimizer, pools, positions).items():
+                    case = {"operation": operation, "pools": n_pools, "positions": n_positions}
+                    limit = too_slow.get(operation)
+                    if limit and n_pools >= limit[0] and n_positions >= limit[1]:
+                        cases.append({**case, "skipped": True})
+                        continue
+                    
+                    start = time.perf_counter()
+                    fn()  # Warm-up (and the cache fill for the cached variant)
+                    if time.perf_counter() - start > max_call_seconds:
+                        too_slow[operation] = (n_pools, n_positions)
+                    
+                    case.update(latency_profile(fn, repeats, case_budget_seconds))
+                    case.update(memory_profile(fn))
+                    cases.append(case)
+                    
+                    print(
+                        f"{operation:34} {n_pools:>7} pools {n_positions:>5} positions  "
+                        f"p50 {case['p50_ms']:10.3f} ms  p99 {case['p99_ms']:10.3f} ms  "
+                        f"peak {case['peak_bytes'] / 1e6:9.2f} MB",
+                        file=sys.stderr
+                    )
+    finally:
+        logging.disable(logging.NOTSET)
+    
+    return {
+        "parameters": {
+            "pool_counts": sorted(pool_counts),
+            "position_counts": sorted(position_counts),
+            "repeats": repeats,
+            "case_budget_seconds": case_budget_seconds,
+            "max_call_seconds": max_call_seconds,
+            "latency_budget_ms": latency_budget_ms,
+            "seed": seed
+        },
+        "cases": cases,
+        "snapshot_memory": [snapshot_memory[n_pools] for n_pools in sorted(snapshot_memory)],
+        "cliffs": find_cliffs(cases, latency_budget_ms)
+    }
+
+def find_cliffs(cases: List[Dict], latency_budget_ms: float, superlinear_exponent: float = 1.2) -> List[Dict]:
+    """
+    Per operation and position count, walk up the pool counts and report
+    where p50 latency first exceeds the budget and where its growth first
+    turns superlinear (p50 ~ pools^k with k above superlinear_exponent)
+    """
+    series: Dict[Tuple[str, int], List[Dict]] = {}
+    for case in cases:
+        if not case.get("skipped"):
+            series.setdefault((case["operation"], case["positions"]), []).append(case)
+    
+    cliffs = []
+    for (operation, n_positions), points in sorted(series.items()):
+        points.sort(key=lambda case: case["pools"])
+        over_budget = next((case["pools"] for case in points if case["p50_ms"] > latency_budget_ms), None)
+        
+        superlinear_from, exponent = None, None
+        for previous, current in zip(points, points[1:]):
+            if previous["p50_ms"] <= 0:
+                continue
+            growth = math.log(current["p50_ms"] / previous["p50_ms"]) / math.log(current["pools"] / previous["pools"])
+            if growth > superlinear_exponent:
+                superlinear_from, exponent = current["pools"], growth
+                break
+        
+        cliffs.append({
+            "operation": operation,
+            "positions": n_positions,
+            "pools_over_latency_budget": over_budget,
+            "superlinear_from_pools": superlinear_from,
+            "growth_exponent": exponent
+        })
+    return cliffs
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 1.25) -> List[Dict]:
+    """
+    p50 latency and peak memory ratios (current / baseline) for the cases
+    both runs measured; ratios above threshold are flagged as regressions
+    """
+    def key(case):
+        return case["operation"], case["pools"], case["positions"]
+    
+    previous = {key(case): case for case in baseline["cases"] if not case.get("skipped")}
+    rows = []
+    for case in current["cases"]:
+        old = previous.get(key(case))
+        if case.get("skipped") or old is None:
+            continue
+        latency_ratio = case["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        memory_ratio = case["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else 1.0
+        rows.append({
+            "operation": case["operation"],
+            "pools": case["pools"],
+            "positions": case["positions"],
+            "baseline_p50_ms": old["p50_ms"],
+            "p50_ms": case["p50_ms"],
+            "latency_ratio": latency_ratio,
+            "memory_ratio": memory_ratio,
+            "regression": latency_ratio > threshold or memory_ratio > threshold
+        })
+    return rows
+
+def environment_info() -> Dict:
+    """
+    Where and on what the results were measured
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=here, capture_output=True, text=True, timeout=10
+        ).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count()
+    }
+
+def parse_counts(value: str) -> List[int]:
+    return [int(float(part)) for part in value.split(",") if part.strip()]
+
+def run_rationale(args) -> int:
+    results = bench_rationale(args.pools, args.positions, args.repeats)
+    
+    print(f"rationale: {results['pools']} pools, {results['positions']} positions, "
+          f"{results['candidate_pairs']} candidate pairs")
+    print(f"  eager     {results['eager']['median_ms']:9.2f} ms (min {results['eager']['min_ms']:.2f})")
+    print(f"  deferred  {results['deferred']['median_ms']:9.2f} ms (min {results['deferred']['min_ms']:.2f})")
+    print(f"  speedup   {results['speedup']:9.2f}x")
+    return 0
+
+def run_scaling(args) -> int:
+    results = bench_scaling(
+        args.pools, args.positions, args.repeats,
+        args.case_budget, args.max_call_seconds, args.latency_budget_ms, args.seed
+    )
+    results = {"environment": environment_info(), **results}
+    
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(results['cases'])} cases to {args.output}")
+    
+    for memory in results["snapshot_memory"]:
+        print(
+            f"  snapshot {memory['pools']:>7} pools: {memory['total_bytes'] / 1e6:9.3f} MB, "
+            f"{memory['bytes_per_pool']:7.1f} bytes/pool"
+        )
+    
+    for cliff in results["cliffs"]:
+        print(
+            f"  {cliff['operation']:34} {cliff['positions']:>5} positions: "
+            f"over {args.latency_budget_ms:g} ms from {cliff['pools_over_latency_budget'] or '-'} pools, "
+            f"superlinear from {cliff['superlinear_from_pools'] or '-'} pools"
+        )
+    
+    if not args.compare:
+        return 0
+    
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows = compare_results(baseline, results, args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    print(f"Compared {len(rows)} cases with {baseline['environment'].get('commit')}: {len(regressions)} regressions")
+    for row in rows:
+        marker = "REGRESSION" if row["regression"] else ""
+        print(
+            f"  {row['operation']:34} {row['pools']:>7} pools {row['positions']:>5} positions  "
+            f"{row['baseline_p50_ms']:10.3f} -> {row['p50_ms']:10.3f} ms  "
+            f"x{row['latency_ratio']:.2f} latency  x{row['memory_ratio']:.2f} memory  {marker}"
+        )
+    return 1 if regressions else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Optimizer micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    rationale = subparsers.add_parser("rationale", help="Eager vs deferred rationale rendering")
+    rationale.add_argument("--pools", type=int, default=1000)
+    rationale.add_argument("--positions", type=int, default=20)
+    rationale.add_argument("--repeats", type=int, default=5)
+    rationale.set_defaults(handler=run_rationale)
+    
+    scaling = subparsers.add_parser("scaling", help="Public optimizer calls over pool and position counts")
+    scaling.add_argument("--pools", type=parse_counts, default=list(DEFAULT_POOL_COUNTS),
+                         help="Comma-separated pool counts")
+    scaling.add_argument("--positions", type=parse_counts, default=list(DEFAULT_POSITION_COUNTS),
+                         help="Comma-separated positions per user")
+    scaling.add_argument("--repeats", type=int, default=20, help="Timed calls per case")
+    scaling.add_argument("--case-budget", type=float, default=5.0, help="Seconds of timed calls per case")
+    scaling.add_argument("--max-call-seconds", type=float, default=20.0,
+                         help="Skip larger cases of an operation once one call exceeds this")
+    scaling.add_argument("--latency-budget-ms", type=float, default=100.0)
+    scaling.add_argument("--seed", type=int, default=7)
+    scaling.add_argument("--output", default="benchmark_results.json")
+    scaling.add_argument("--compare", help="Earlier results file to compare against")
+    scaling.add_argument("--threshold", type=float, default=1.25, help="Ratio flagged as a regression")
+    scaling.set_defaults(handler=run_scaling)
+    
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
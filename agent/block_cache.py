@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from rpc_batch import JsonRpcBatcher
+
+logger = logging.getLogger(__name__)
+
+class BlockHeadTracker:
+    """
+    Latest block number, polled from eth_blockNumber in the background.
+    The agent only speaks HTTP JSON-RPC, so it polls rather than subscribing
+    to newHeads (which needs a websocket). The head only moves forward: a
+    lower number comes from a lagging node behind the RPC load balancer.
+    Listeners are called with each new head.
+    """
+    def __init__(self, rpc: JsonRpcBatcher, poll_seconds: float = 0.5, max_age_seconds: float = 5.0):
+        self.rpc = rpc
+        self.poll_seconds = poll_seconds
+        self.max_age_seconds = max_age_seconds
+        self.listeners: List[Callable[[int], None]] = []
+        
+        self.head: Optional[int] = None
+        self.head_seen_at = 0.0  # time.monotonic() of the last poll that confirmed the head
+        self._task: Optional[asyncio.Task] = None
+        
+        self.polls = 0
+        self.poll_errors = 0
+        self.advances = 0
+        self.skipped_blocks = 0  # Blocks that landed between two polls
+    
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"⛓️ Block head tracker started (polling every {self.poll_seconds * 1000:.0f} ms)")
+    
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    def is_fresh(self) -> bool:
+        """
+        Whether the head was confirmed recently enough to key reads by it
+        """
+        return self.head is not None and time.monotonic() - self.head_seen_at < self.max_age_seconds
+    
+    async def poll(self) -> int:
+        self.polls += 1
+        block = int(await self.rpc.call("eth_blockNumber"), 16)
+        self.head_seen_at = time.monotonic()
+        if self.head is None or block > self.head:
+            if self.head is not None:
+                self.advances += 1
+                self.skipped_blocks += block - self.head - 1
+            self.head = block
+            for listener in self.listeners:
+                listener(block)
+        return self.head
+    
+    def stats(self) -> Dict:
+        return {
+            "head": self.head,
+            "head_age_ms": (time.monotonic() - self.head_seen_at) * 1000 if self.head is not None else None,
+            "fresh": self.is_fresh(),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "advances": self.advances,
+            "skipped_blocks": self.skipped_blocks,
+            "poll_ms": self.poll_seconds * 1000
+        }
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_errors += 1
+                logger.warning(f"Block number poll failed: {str(e) or type(e).__name__}")
+            await asyncio.sleep(self.poll_seconds)
+
+@dataclass
+class BlockReads:
+    block: int
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    
+    def to_dict(self) -> Dict:
+        reads = self.hits + self.coalesced + self.misses
+        return {
+            "block": self.block,
+            "reads": reads,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.coalesced) / reads if reads else 0.0
+        }
+
+class BlockReadCache:
+    """
+    eth_call results keyed by (contract, calldata, block number).
+    
+    Contract state only changes when a block lands, so every read of the
+    current head is answered once: a miss is sent pinned to the head block,
+    repeats within that block come from memory, and concurrent identical
+    misses share one call. When the tracker reports a new head the entries
+    are retired and that block's read counts move to the history.
+    
+    Reads go straight to the RPC (uncached, at "latest") while the head is
+    unknown or has not been confirmed within the tracker's max age, so a
+    stalled tracker never pins the agent to an old block. Failed calls are
+    not cached.
+    """
+    def __init__(
+        self,
+        rpc: JsonRpcBatcher,
+        tracker: BlockHeadTracker,
+        max_entries: int = 50000,
+        history_blocks: int = 64
+    ):
+        self.rpc = rpc
+        self.tracker = tracker
+        self.max_entries = max_entries
+        
+        self._block: Optional[int] = None
+        self._entries: Dict[Tuple[str, str], str] = {}
+        self._inflight: Dict[Tuple[int, str, str], asyncio.Task] = {}
+        self._current: Optional[BlockReads] = None
+        self._history: Deque[BlockReads] = deque(maxlen=history_blocks)
+        tracker.listeners.append(self._advance)
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.uncached = 0
+        self.retired_blocks = 0
+    
+    async def eth_call(self, to: str, data: str, block: Union[str, int] = "latest") -> str:
+        """
+        Same contract as JsonRpcBatcher.eth_call; "latest" and the head block are cached
+        """
+        if block == "latest":
+            if not self.tracker.is_fresh():
+                self.uncached += 1
+                return await self.rpc.eth_call(to, data)
+            number = self.head
+        else:
+            number = block if isinstance(block, int) else int(block, 16)
+        
+        if number != self._block:
+            self._advance(number)
+        if number != self._block:
+            # Historical block (older than the head): not worth keeping
+            self.uncached += 1
+            return await self.rpc.eth_call(to, data, hex(number))
+        
+        key = (to.lower(), data)
+        value = self._entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self._current.hits += 1
+            return value
+        
+        inflight_key = (number,) + key
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            self.coalesced += 1
+            self._current.coalesced += 1
+        else:
+            self.misses += 1
+            self._current.misses += 1
+            task = asyncio.get_running_loop().create_task(self._fetch(inflight_key, to, data))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(_retrieve_exception)
+        # Shielded: one caller giving up must not cancel the shared call
+        return await asyncio.shield(task)
+    
+    @property
+    def head(self) -> Optional[int]:
+        """
+        Newest block seen, by the tracker or through a read pinned to a newer block
+        """
+        if self.tracker.head is None:
+            return self._block
+        return max(self.tracker.head, self._block or 0)
+    
+    def block_stats(self) -> List[Dict]:
+        """
+        Read counts of the current block and the retired ones, newest first
+        """
+        blocks = list(self._history) + ([self._current] if self._current is not None else [])
+        return [reads.to_dict() for reads in reversed(blocks)]
+    
+    def stats(self) -> Dict:
+        reads = self.hits + self.coalesced + self.misses
+        history = list(self._history)
+        return {
+            "head": self._block,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_rate": (self.hits + self.coalesced) / reads if reads else 0.0,
+            "retired_blocks": self.retired_blocks,
+            "avg_reads_per_block": (
+                sum(block.hits + block.coalesced + block.misses for block in history) / len(history)
+                if history else 0.0
+            ),
+            "blocks": self.block_stats()[:10],
+            "tracker": self.tracker.stats()
+        }
+    
+    def _advance(self, block: int) -> None:
+        """
+        Retire the entries of older blocks once a newer head is seen
+        """
+        if self._block is not None and block <= self._block:
+            return
+        if self._current is not None:
+            self._history.append(self._current)
+            self.retired_blocks += 1
+        self._block = block
+        self._current = BlockReads(block)
+        self._entries = {}
+        self._inflight = {key: task for key, task in self._inflight.items() if key[0] >= block}
+    
+    async def _fetch(self, inflight_key: Tuple[int, str, str], to: str, data: str) -> str:
+        block = inflight_key[0]
+        try:
+            value = await self.rpc.eth_call(to, data, hex(block))
+        finally:
+            self._inflight.pop(inflight_key, None)
+        
+        # A newer head may have landed while the call was out
+        if block == self._block and len(self._entries) < self.max_entries:
+            self._entries[inflight_key[1:]] = value
+        return value
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Failures reach the callers; this only stops "exception never retrieved" warnings
+    if not task.cancelled():
+        task.exception()
@@ -1,16 +1,46 @@
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-import aiohttp
 import os
 import hashlib
 import time
 import random
 
+import numpy as np
+
+from abi import MULTICALL3_ADDRESS, POOL_ABI, decode_aggregate3, decode_output, encode_aggregate3, encode_call
+from block_cache import BlockHeadTracker, BlockReadCache
+from http_client import http_client
+from metrics import metrics
+from pool_cache import PoolDataCache
+from pool_snapshot import PoolSnapshot
+from position_table import PositionTable
+from rpc_batch import JsonRpcBatcher
+
 logger = logging.getLogger(__name__)
 
+MOCK_ETH_PRICE = 2000  # USD per token unit until a price feed exists
+
+# Pools users hold LP positions in (until positions are indexed)
+POSITION_POOL_ADDRESSES = [
+    "0x1234567890123456789012345678901234567890",
+    "0x2345678901234567890123456789012345678901",
+    "0x3456789012345678901234567890123456789012"
+]
+
+POOL_FETCH_SECONDS = metrics.histogram(
+    "agent_pool_fetch_seconds", "Per-pool read time in get_pool_data, by where the value came from", ("source",)
+)
+
+@dataclass
+class PoolFetchResult:
+    address: str
+    source: str          # "fetched", "last_known" (fetch failed or too slow) or "missing"
+    latency_ms: float
+    error: Optional[str] = None
+
 @dataclass
 class TransactionResult:
     tx_hash: str
@@ -19,62 +49,137 @@ class TransactionResult:
     gas_price: int
     block_number: int
 
+def _decode_result(result: Tuple[bool, bytes], name: str) -> Optional[List]:
+    """
+    Decoded return values of one aggregate3 call, or None if it failed. A call
+    to an address without code succeeds with empty return data.
+    """
+    success, data = result
+    if not success:
+        return None
+    try:
+        return decode_output(POOL_ABI, name, data)
+    except ValueError:
+        return None
+
 class MonadClient:
     def __init__(self):
         self.rpc_url = os.getenv('MONAD_RPC_URL', 'https://testnet-rpc.monad.xyz')
         self.bundler_url = os.getenv('BUNDLER_URL', 'https://api.pimlico.io/v2/monad-testnet/rpc')
         self.chain_id = 41454  # Monad Testnet
         
+        # "rpc" reads pool contracts through batched eth_calls, "multicall" reads
+        # every pool (and balance) in one Multicall3 eth_call; "mock" is the demo data
+        self.pool_data_source = os.getenv('POOL_DATA_SOURCE', 'mock')
+        self.rpc = JsonRpcBatcher(
+            self.rpc_url,
+            window_seconds=float(os.getenv('RPC_BATCH_WINDOW_MS', 2)) / 1000,
+            max_batch_size=int(os.getenv('RPC_MAX_BATCH_SIZE', 100))
+        )
+        self.multicall_address = os.getenv('MULTICALL3_ADDRESS', MULTICALL3_ADDRESS)
+        self.multicall_max_calls = int(os.getenv('MULTICALL_MAX_CALLS', 2000))
+        
+        # Contract reads are answered once per block (see start())
+        self.head_tracker = BlockHeadTracker(
+            self.rpc,
+            poll_seconds=float(os.getenv('BLOCK_POLL_MS', 500)) / 1000,
+            max_age_seconds=float(os.getenv('BLOCK_HEAD_MAX_AGE_SECONDS', 5))
+        )
+        self.block_cache = BlockReadCache(self.rpc, self.head_tracker)
+        
         # Smart Account configuration
         self.smart_account_factory = os.getenv('SMART_ACCOUNT_FACTORY')
         self.ai_agent_private_key = os.getenv('AI_AGENT_PRIVATE_KEY')
         
+        # Pool reads are served from cache and refreshed in the background
+        self.pool_cache = PoolDataCache(
+            self._get_pool_contract_data,
+            ttl_seconds=float(os.getenv('POOL_CACHE_TTL_SECONDS', 15)),
+            max_stale_seconds=float(os.getenv('POOL_CACHE_MAX_STALE_SECONDS', 120))
+        )
+        self.pool_fetch_concurrency = int(os.getenv('POOL_FETCH_CONCURRENCY', 128))
+        self.pool_fetch_deadline = float(os.getenv('POOL_FETCH_DEADLINE_SECONDS', 2.0))
+        self.last_pool_fetch: List[PoolFetchResult] = []
+        
         logger.info("MonadClient initialized (demo mode - web3 disabled for compatibility)")
         logger.warning("AI Agent private key not configured (demo mode)")
     
-    async def get_pool_data(self, pool_addresses: List[str]) -> List[Dict]:
+    async def start(self) -> None:
         """
-        Fetch real-time pool data from Monad blockchain
+        Track the chain head when reading contracts (mock data needs no node)
         """
-        pool_data = []
+        if self.pool_data_source in ("rpc", "multicall"):
+            await self.head_tracker.start()
+    
+    async def stop(self) -> None:
+        await self.head_tracker.stop()
+    
+    async def get_pool_data(
+        self,
+        pool_addresses: List[str],
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> PoolSnapshot:
+        """
+        Fetch real-time pool data from Monad blockchain as one columnar snapshot.
         
-        for address in pool_addresses:
-            try:
-                # Get pool contract data
-                pool_info = await self._get_pool_contract_data(address)
-                pool_data.append(pool_info)
-            except Exception as e:
-                logger.error(f"Error fetching pool data for {address}: {str(e)}")
-                # Fallback to mock data
-                pool_data.append(self._get_mock_pool_data(address))
+        Pools are read concurrently, at most `concurrency` at a time, each
+        within `deadline` seconds. A pool whose read fails or runs late gets
+        its last known value; one never read before is left out, so the
+        snapshot can be partial. Per-pool outcomes and latencies are kept
+        in self.last_pool_fetch.
+        """
+        deadline = deadline or self.pool_fetch_deadline
+        if self.pool_data_source == "multicall":
+            return await self._get_pool_data_multicall(pool_addresses, deadline)
+        
+        limit = asyncio.Semaphore(concurrency or self.pool_fetch_concurrency)
+        results = await asyncio.gather(*(
+            self._fetch_pool(address, limit, deadline) for address in pool_addresses
+        ))
+        self.last_pool_fetch = [report for _, report in results]
+        
+        late = [report for report in self.last_pool_fetch if report.source != "fetched"]
+        if late:
+            logger.warning(
+                f"{len(late)}/{len(results)} pools not refreshed "
+                f"({sum(report.source == 'missing' for report in late)} without a known value)"
+            )
+        return PoolSnapshot.from_records([record for record, _ in results if record is not None])
+    
+    async def _fetch_pool(
+        self,
+        address: str,
+        limit: asyncio.Semaphore,
+        deadline: float
+    ) -> Tuple[Optional[Dict], PoolFetchResult]:
+        """
+        One pool for get_pool_data: the cached read under the in-flight limit and deadline
+        """
+        started = time.perf_counter()
+        error = None
+        try:
+            async with limit:
+                # Cached, stale-while-revalidate; a late fetch still fills the cache
+                record = await asyncio.wait_for(self.pool_cache.get(address), timeout=deadline)
+            source = "fetched"
+        except Exception as e:
+            error = str(e) or "deadline exceeded"
+            record = self.pool_cache.last_known(address)
+            source = "last_known" if record is not None else "missing"
+            logger.debug(f"Pool {address} not refreshed ({error}), using {source}")
         
-        return pool_data
+        latency = time.perf_counter() - started
+        POOL_FETCH_SECONDS.observe(latency, source=source)
+        return record, PoolFetchResult(address, source, latency * 1000, error)
     
     async def _get_pool_contract_data(self, pool_address: str) -> Dict:
         """
         Get pool data from smart contract
         """
-        # Pool ABI (simplified)
-        pool_abi = [
-            {
-                "inputs": [],
-                "name": "getReserves",
-                "outputs": [
-                    {"type": "uint112", "name": "reserve0"},
-                    {"type": "uint112", "name": "reserve1"},
-                    {"type": "uint32", "name": "blockTimestampLast"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [],
-                "name": "totalSupply",
-                "outputs": [{"type": "uint256", "name": ""}],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
+        if self.pool_data_source in ("rpc", "multicall"):
+            # Errors propagate: the pool cache keeps serving the last known value
+            return await self._read_pool_contract(pool_address)
         
         try:
             # Demo mode: return mock data with realistic values
@@ -85,6 +190,134 @@ class MonadClient:
             logger.error(f"Error generating pool data for {pool_address}: {str(e)}")
             return self._get_mock_pool_data(pool_address)
     
+    async def _read_pool_contract(self, pool_address: str) -> Dict:
+        """
+        getReserves and totalSupply via eth_call; concurrent reads share JSON-RPC
+        batches and repeats within a block are served by the block cache
+        """
+        reserves_data, supply_data = await asyncio.gather(
+            self.block_cache.eth_call(pool_address, encode_call(POOL_ABI, "getReserves")),
+            self.block_cache.eth_call(pool_address, encode_call(POOL_ABI, "totalSupply"))
+        )
+        reserve0, reserve1, _ = decode_output(POOL_ABI, "getReserves", reserves_data)
+        total_supply, = decode_output(POOL_ABI, "totalSupply", supply_data)
+        return self._pool_record(pool_address, reserve0, reserve1, total_supply)
+    
+    async def multicall(self, calls: List[Tuple[str, str]], block: str = "latest") -> List[Tuple[bool, bytes]]:
+        """
+        (success, returnData) for each (target, calldata) through Multicall3
+        aggregate3 with allowFailure, so one reverting pool does not fail the
+        rest. Past multicall_max_calls the calls are split into chunks pinned
+        to one block; the chunks share a JSON-RPC batch.
+        """
+        if not calls:
+            return []
+        if len(calls) > self.multicall_max_calls and block == "latest":
+            # The tracked head saves a round trip and keeps the chunks cacheable
+            if self.head_tracker.is_fresh():
+                block = hex(self.block_cache.head)
+            else:
+                block = await self.rpc.call("eth_blockNumber")
+        
+        chunks = [calls[i:i + self.multicall_max_calls] for i in range(0, len(calls), self.multicall_max_calls)]
+        results = await asyncio.gather(*(
+            self.block_cache.eth_call(
+                self.multicall_address,
+                encode_aggregate3([(target, True, data) for target, data in chunk]),
+                block
+            )
+            for chunk in chunks
+        ))
+        return [item for result in results for item in decode_aggregate3(result)]
+    
+    async def read_pool_universe(
+        self,
+        pool_addresses: List[str],
+        user_addresses: List[str] = (),
+        block: str = "latest"
+    ) -> Tuple[PoolSnapshot, PositionTable]:
+        """
+        Reserves and supply of every pool and every user's LP balance in each,
+        from one aggregate3 eth_call. A pool whose calls revert keeps its last
+        known data (left out if there is none); balances in pools without data,
+        or whose balanceOf reverts, are skipped. A call that "succeeds" with
+        undecodable return data (e.g. the address has no code) counts as failed
+        for that pool or balance only. Fresh pools go into the pool cache.
+        """
+        reserves_call = encode_call(POOL_ABI, "getReserves")
+        supply_call = encode_call(POOL_ABI, "totalSupply")
+        calls = []
+        for pool_address in pool_addresses:
+            calls.append((pool_address, reserves_call))
+            calls.append((pool_address, supply_call))
+        for user_address in user_addresses:
+            balance_call = encode_call(POOL_ABI, "balanceOf", user_address)
+            calls.extend((pool_address, balance_call) for pool_address in pool_addresses)
+        
+        started = time.perf_counter()
+        results = await self.multicall(calls, block)
+        latency = time.perf_counter() - started
+        
+        pools: Dict[str, Dict] = {}
+        reports = []
+        for idx, pool_address in enumerate(pool_addresses):
+            reserves = _decode_result(results[2 * idx], "getReserves")
+            supply = _decode_result(results[2 * idx + 1], "totalSupply")
+            if reserves is not None and supply is not None:
+                record = self._pool_record(pool_address, reserves[0], reserves[1], supply[0])
+                self.pool_cache.put(pool_address, record)
+                source, error = "fetched", None
+            else:
+                reverted = not (results[2 * idx][0] and results[2 * idx + 1][0])
+                record = self.pool_cache.last_known(pool_address)
+                source = "last_known" if record is not None else "missing"
+                error = "call reverted" if reverted else "undecodable return data"
+            
+            if record is not None:
+                pools[pool_address] = record
+            reports.append(PoolFetchResult(pool_address, source, latency * 1000, error))
+            POOL_FETCH_SECONDS.observe(latency, source=source)
+        self.last_pool_fetch = reports
+        
+        snapshot = PoolSnapshot.from_records(list(pools.values()))
+        offset = 2 * len(pool_addresses)
+        balances = []
+        for result in results[offset:]:
+            balance = _decode_result(result, "balanceOf")
+            balances.append(balance[0] / 1e18 if balance is not None else None)
+        return snapshot, self._position_table(snapshot, user_addresses, pool_addresses, balances)
+    
+    async def _get_pool_data_multicall(self, pool_addresses: List[str], deadline: float) -> PoolSnapshot:
+        try:
+            snapshot, _ = await asyncio.wait_for(self.read_pool_universe(pool_addresses), timeout=deadline)
+            return snapshot
+        except Exception as e:
+            logger.warning(f"Multicall pool read failed ({str(e) or 'deadline exceeded'}), using last known data")
+            records = [self.pool_cache.last_known(address) for address in pool_addresses]
+            self.last_pool_fetch = [
+                PoolFetchResult(address, "last_known" if record is not None else "missing", deadline * 1000, str(e))
+                for address, record in zip(pool_addresses, records)
+            ]
+            return PoolSnapshot.from_records([record for record in records if record is not None])
+    
+    def _pool_record(self, pool_address: str, reserve0: int, reserve1: int, total_supply: int) -> Dict:
+        """
+        Pool dict (as the mock data) from raw getReserves/totalSupply values
+        """
+        # Reserves are 18-decimal token amounts
+        reserve0, reserve1 = reserve0 / 1e18, reserve1 / 1e18
+        tvl = (reserve0 + reserve1) * MOCK_ETH_PRICE
+        apy = self._calculate_mock_apy(reserve0, reserve1, total_supply)
+        
+        return {
+            "address": pool_address,
+            "name": self._get_pool_name(pool_address),
+            "apy": apy,
+            "tvl": tvl,
+            "volume24h": tvl * 0.1,
+            "risk_score": self._calculate_risk_score(tvl, apy)
+        }
+    
     def _calculate_mock_apy(self, reserve0: float, reserve1: float, total_supply: int) -> float:
         """
         Calculate mock APY based on pool characteristics
@@ -215,44 +448,42 @@ class MonadClient:
         Submit transaction via ERC-4337 bundler
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                # Prepare user operation
-                user_op = {
-                    "sender": "0x" + "00" * 20,  # Smart account address
-                    "nonce": "0x0",
-                    "initCode": "0x",
-                    "callData": tx_data["data"],
-                    "callGasLimit": tx_data["gas"],
-                    "verificationGasLimit": "100000",
-                    "preVerificationGas": "50000",
-                    "maxFeePerGas": tx_data["gasPrice"],
-                    "maxPriorityFeePerGas": "2000000000",  # 2 gwei in wei
-                    "paymasterAndData": "0x",
-                    "signature": "0x" + "00" * 65
-                }
-                
-                # Submit to bundler
-                payload = {
-                    "jsonrpc": "2.0",
-                    "method": "eth_sendUserOperation",
-                    "params": [user_op, "0x5FF137D4b0FDCD49DcA30c7CF57E578a026d2789"],  # EntryPoint
-                    "id": 1
-                }
-                
-                async with session.post(self.bundler_url, json=payload) as response:
-                    result = await response.json()
-                    
-                    if "result" in result:
-                        return result["result"]
-                    else:
-                        raise Exception(f"Bundler error: {result.get('error', 'Unknown error')}")
+            # Prepare user operation
+            user_op = {
+                "sender": "0x" + "00" * 20,  # Smart account address
+                "nonce": "0x0",
+                "initCode": "0x",
+                "callData": tx_data["data"],
+                "callGasLimit": tx_data["gas"],
+                "verificationGasLimit": "100000",
+                "preVerificationGas": "50000",
+                "maxFeePerGas": tx_data["gasPrice"],
+                "maxPriorityFeePerGas": "2000000000",  # 2 gwei in wei
+                "paymasterAndData": "0x",
+                "signature": "0x" + "00" * 65
+            }
+            
+            # Submit to bundler
+            payload = {
+                "jsonrpc": "2.0",
+                "method": "eth_sendUserOperation",
+                "params": [user_op, "0x5FF137D4b0FDCD49DcA30c7CF57E578a026d2789"],  # EntryPoint
+                "id": 1
+            }
+            
+            # Not idempotent: only retried if the connection was never made
+            response = await http_client.post(self.bundler_url, json=payload)
+            result = response.data or {}
+            
+            if "result" in result:
+                return result["result"]
+            else:
+                raise Exception(f"Bundler error: {result.get('error', 'Unknown error')}")
                         
         except Exception as e:
-            logger.error(f"Bundler submission failed: {str(e)}")
+            logger.error(f"Bundler submission failed for call to {tx_data.get('to')}: {str(e)}")
             # Return mock hash for demo
-            import hashlib
-            import time
-            mock_data = f"{action.from_pool}{action.to_pool}{action.amount}{time.time()}"
+            mock_data = f"{tx_data.get('to')}{tx_data.get('data')}{time.time()}"
             return "0x" + hashlib.sha256(mock_data.encode()).hexdigest()
     
     async def get_user_positions(self, user_address: str) -> List[Dict]:
@@ -260,28 +491,8 @@ class MonadClient:
         Get user's current positions across pools
         """
         try:
-            positions = []
-            pool_addresses = [
-                "0x1234567890123456789012345678901234567890",
-                "0x2345678901234567890123456789012345678901",
-                "0x3456789012345678901234567890123456789012"
-            ]
-            
-            for pool_address in pool_addresses:
-                balance = await self._get_user_pool_balance(user_address, pool_address)
-                if balance > 0:
-                    pool_data = await self._get_pool_contract_data(pool_address)
-                    
-                    positions.append({
-                        "poolAddress": pool_address,
-                        "poolName": pool_data["name"],
-                        "balance": str(balance),
-                        "value": balance * 2000,  # Mock ETH price
-                        "apy": pool_data["apy"],
-                        "dailyEarnings": (balance * 2000 * pool_data["apy"] / 100) / 365
-                    })
-            
-            return positions
+            snapshot, table = await self.get_positions_for_users([user_address])
+            return self._position_records(snapshot, table)[user_address]
             
         except Exception as e:
             logger.error(f"Error fetching user positions: {str(e)}")
@@ -305,10 +516,103 @@ class MonadClient:
                 }
             ]
     
+    async def get_positions_for_users(
+        self,
+        user_addresses: List[str],
+        pool_addresses: Optional[List[str]] = None,
+        concurrency: Optional[int] = None
+    ) -> Tuple[PoolSnapshot, PositionTable]:
+        """
+        LP positions of many users as one PositionTable, priced against the
+        PoolSnapshot it indexes into.
+        
+        Pools are read once for the whole user x pool grid. With the multicall
+        source the balances ride in the same aggregate3 call; otherwise every
+        balance is read concurrently, at most `concurrency` at a time (rpc
+        reads share JSON-RPC batches). Zero balances, failed balance reads and
+        pools without data are left out.
+        """
+        pool_addresses = list(pool_addresses or POSITION_POOL_ADDRESSES)
+        if self.pool_data_source == "multicall":
+            return await self.read_pool_universe(pool_addresses, user_addresses)
+        
+        limit = asyncio.Semaphore(concurrency or self.pool_fetch_concurrency)
+        
+        async def read_balance(user_address: str, pool_address: str) -> Optional[float]:
+            async with limit:
+                try:
+                    return await self._get_user_pool_balance(user_address, pool_address)
+                except Exception as e:
+                    logger.debug(f"Balance of {user_address} in {pool_address} not read: {str(e)}")
+                    return None
+        
+        snapshot, balances = await asyncio.gather(
+            self.get_pool_data(pool_addresses),
+            asyncio.gather(*(
+                read_balance(user_address, pool_address)
+                for user_address in user_addresses
+                for pool_address in pool_addresses
+            ))
+        )
+        return snapshot, self._position_table(snapshot, user_addresses, pool_addresses, balances)
+    
+    def _position_table(
+        self,
+        snapshot: PoolSnapshot,
+        user_addresses: List[str],
+        pool_addresses: List[str],
+        balances: List[Optional[float]]
+    ) -> PositionTable:
+        """
+        Held positions from a row-major user x pool balance grid (None = not read)
+        """
+        grid = np.array(balances, dtype=np.float64).reshape(len(user_addresses), len(pool_addresses))
+        rows = np.array([snapshot.index.get(address, -1) for address in pool_addresses], dtype=np.int64)
+        
+        # NaN (unread) compares False, so only real holdings in known pools remain
+        held = (grid > 0) & (rows >= 0)
+        user_idx, pool_idx = np.nonzero(held)
+        return PositionTable(
+            list(user_addresses),
+            user_idx,
+            [pool_addresses[idx] for idx in pool_idx],
+            rows[pool_idx],
+            grid[held],
+            grid[held] * MOCK_ETH_PRICE
+        )
+    
+    def _position_records(self, snapshot: PoolSnapshot, table: PositionTable) -> Dict[str, List[Dict]]:
+        """
+        Per-user position dicts in the dashboard shape
+        """
+        offsets = table.user_slices().tolist()
+        positions: Dict[str, List[Dict]] = {}
+        for user_idx, user_address in enumerate(table.users):
+            user_positions = []
+            for i in range(offsets[user_idx], offsets[user_idx + 1]):
+                row = int(table.pool_rows[i])
+                value = float(table.values[i])
+                apy = float(snapshot.apy[row])
+                user_positions.append({
+                    "poolAddress": table.pool_addresses[i],
+                    "poolName": snapshot.names[row],
+                    "balance": str(float(table.balances[i])),
+                    "value": value,
+                    "apy": apy,
+                    "dailyEarnings": (value * apy / 100) / 365
+                })
+            positions[user_address] = user_positions
+        return positions
+    
     async def _get_user_pool_balance(self, user_address: str, pool_address: str) -> float:
         """
         Get user's balance in a specific pool
         """
+        if self.pool_data_source in ("rpc", "multicall"):
+            # Errors propagate; concurrent reads share JSON-RPC batches
+            data = await self.block_cache.eth_call(pool_address, encode_call(POOL_ABI, "balanceOf", user_address))
+            return decode_output(POOL_ABI, "balanceOf", data)[0] / 1e18
+        
         try:
             # Demo mode: return mock balance
             logger.info(f"Demo mode: generating mock balance for {user_address} in {pool_address}")
@@ -0,0 +1,34 @@
+import asyncio
+import socket
+
+import pytest
+
+from http_client import http_client
+from rpc_stub import StubRpcServer
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def with_rpc_stub():
+    """
+    run(scenario, **stub_options): start a StubRpcServer and the shared HTTP
+    client in a fresh event loop, await scenario(url, server), clean up
+    """
+    def run(scenario, **stub_options):
+        async def main():
+            server = StubRpcServer(**stub_options)
+            port = free_port()
+            await server.start(port)
+            await http_client.start()
+            try:
+                return await scenario(f"http://127.0.0.1:{port}", server)
+            finally:
+                await http_client.close()
+                await server.stop()
+        
+        return asyncio.run(main())
+    
+    return run
@@ -4,11 +4,20 @@ import logging
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-import aiohttp
 import os
 
+from http_client import http_client
+from outbox import outbox
+
 logger = logging.getLogger(__name__)
 
+# Max risk score increase a delegated action may take, per risk tolerance
+RISK_INCREASE_LIMITS = {
+    'low': 0.1,
+    'medium': 0.2,
+    'high': 0.5
+}
+
 @dataclass
 class DelegationConstraints:
     max_amount: float
@@ -103,38 +112,37 @@ class DelegationValidator:
                 if datetime.now() - cache_time < timedelta(minutes=5):
                     return cached_data
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/delegations/{user_address}") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        if data.get('success') and data.get('data'):
-                            # Get the most recent active delegation
-                            active_delegations = [
-                                d for d in data['data'] 
-                                if d.get('status') == 'active'
-                            ]
-                            
-                            if not active_delegations:
-                                return None
-                            
-                            delegation = active_delegations[0]  # Most recent
-                            
-                            constraints = DelegationConstraints(
-                                max_amount=float(delegation.get('maxAmount', 0)),
-                                allowed_pools=delegation.get('allowedPools', []),
-                                expiry=datetime.fromisoformat(delegation.get('expiry', '').replace('Z', '+00:00')),
-                                risk_tolerance=delegation.get('riskTolerance', 'medium'),
-                                daily_limit=float(delegation.get('dailyLimit', 0)) if delegation.get('dailyLimit') else None,
-                                transaction_limit=int(delegation.get('transactionLimit', 0)) if delegation.get('transactionLimit') else None
-                            )
-                            
-                            # Cache the result
-                            self.delegation_cache[cache_key] = (constraints, datetime.now())
-                            
-                            return constraints
+            response = await http_client.get(f"{self.backend_url}/api/delegations/{user_address}")
+            if response.status == 200:
+                data = response.data or {}
+                
+                if data.get('success') and data.get('data'):
+                    # Get the most recent active delegation
+                    active_delegations = [
+                        d for d in data['data'] 
+                        if d.get('status') == 'active'
+                    ]
+                    
+                    if not active_delegations:
+                        return None
+                    
+                    delegation = active_delegations[0]  # Most recent
+                    
+                    constraints = DelegationConstraints(
+                        max_amount=float(delegation.get('maxAmount', 0)),
+                        allowed_pools=delegation.get('allowedPools', []),
+                        expiry=datetime.fromisoformat(delegation.get('expiry', '').replace('Z', '+00:00')),
+                        risk_tolerance=delegation.get('riskTolerance', 'medium'),
+                        daily_limit=float(delegation.get('dailyLimit', 0)) if delegation.get('dailyLimit') else None,
+                        transaction_limit=int(delegation.get('transactionLimit', 0)) if delegation.get('transactionLimit') else None
+                    )
                     
-                    return None
+                    # Cache the result
+                    self.delegation_cache[cache_key] = (constraints, datetime.now())
+                    
+                    return constraints
+            
+            return None
                     
         except Exception as e:
             logger.error(f"Error fetching delegation constraints: {str(e)}")
@@ -220,13 +228,7 @@ class DelegationValidator:
         """
         risk_increase = getattr(action, 'risk_adjustment', 0)
         
-        risk_limits = {
-            'low': 0.1,      # Max 0.1 risk score increase
-            'medium': 0.2,   # Max 0.2 risk score increase  
-            'high': 0.5      # Max 0.5 risk score increase
-        }
-        
-        max_risk_increase = risk_limits.get(constraints.risk_tolerance, 0.2)
+        max_risk_increase = RISK_INCREASE_LIMITS.get(constraints.risk_tolerance, 0.2)
         
         if risk_increase > max_risk_increase:
             return ValidationResult(
@@ -361,21 +363,18 @@ class DelegationValidator:
     
     async def _log_usage_update(self, user_address: str, action, amount: float) -> None:
         """
-        Log usage update to backend
+        Queue the usage update for the backend audit log (delivered by the outbox)
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                log_data = {
-                    "user_address": user_address,
-                    "action": "usage_update",
-                    "amount": amount,
-                    "action_type": getattr(action, 'action_type', 'rebalance'),
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                async with session.post(f"{self.backend_url}/api/audit", json=log_data) as response:
-                    if response.status != 200:
-                        logger.warning(f"Failed to log usage update: {response.status}")
+            log_data = {
+                "user_address": user_address,
+                "action": "usage_update",
+                "amount": amount,
+                "action_type": getattr(action, 'action_type', 'rebalance'),
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            outbox.enqueue("usage", f"{self.backend_url}/api/audit", log_data)
                         
         except Exception as e:
             logger.error(f"Error logging usage update: {str(e)}")
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+REQUEST_SECONDS = metrics.histogram(
+    "agent_outbound_request_seconds",
+    "Outbound HTTP latency per attempt, by host, method and status (\"error\" when no response)",
+    ("host", "method", "status")
+)
+
+@dataclass
+class HttpResponse:
+    status: int
+    data: Any            # Parsed JSON body, or None when the body is not JSON
+    text: str
+    
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+class HttpClient:
+    """
+    One aiohttp session shared by every outbound call of the agent: pooled
+    keep-alive connections with per-host limits, cached DNS, default
+    timeouts and a retry policy.
+    
+    The API opens it on startup and closes it on shutdown; scripts that
+    never call start() get a session lazily on their first request.
+    
+    Retries use exponential backoff with jitter. Idempotent methods retry on
+    connection errors, timeouts and RETRY_STATUSES; other methods (bundler
+    submissions, audit POSTs) only when the connection was never
+    established, so a request the server may have processed is not sent twice.
+    """
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 30.0,
+        total_timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+    
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, trace_configs=[trace]
+            )
+            logger.info(f"🌐 HTTP client started ({self.limit_per_host} connections per host)")
+    
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("🌐 HTTP client closed")
+        self._session = None
+    
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+    
+    async def request(
+        self,
+        method: str,
+        url: str,
+        retries: Optional[int] = None,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> HttpResponse:
+        """
+        Send a request and read the whole body. Raises the last
+        aiohttp/timeout error once retries are exhausted. idempotent=True
+        lets a read-only POST (JSON-RPC reads) retry like a GET.
+        """
+        method = method.upper()
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        session = await self.session()
+        host = urlsplit(url).netloc
+        
+        for attempt in range(retries + 1):
+            self.requests += 1
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    text = await response.text()
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    result = HttpResponse(response.status, data, text)
+                REQUEST_SECONDS.observe(time.perf_counter() - started, host=host, method=method, status=str(result.status))
+                
+                if not (idempotent and result.status in retry_statuses and attempt < retries):
+                    return result
+                logger.warning(f"{method} {url} returned {result.status}, retrying")
+            
+            except aiohttp.ClientConnectorError as e:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, host=host, method=method, status="error")
+                # Never connected, so safe to repeat for any method
+                if attempt >= retries:
+                    self.failures += 1
+                    raise
+                logger.warning(f"{method} {url} could not connect ({str(e)}), retrying")
+            
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, host=host, method=method, status="error")
+                if not idempotent or attempt >= retries:
+                    self.failures += 1
+                    raise
+                logger.warning(f"{method} {url} failed ({type(e).__name__}), retrying")
+            
+            self.retried += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+    
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+    
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", url, **kwargs)
+    
+    def stats(self) -> Dict:
+        return {
+            "open": self._session is not None and not self._session.closed,
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host
+        }
+    
+    async def _on_connection_created(self, session, context, params) -> None:
+        self.connections_created += 1
+    
+    async def _on_connection_reused(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+# Shared instance, opened and closed by the API's lifespan
+http_client = HttpClient(
+    limit=int(os.getenv('HTTP_POOL_LIMIT', 100)),
+    limit_per_host=int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20)),
+    total_timeout=float(os.getenv('HTTP_TIMEOUT_SECONDS', 10)),
+    retries=int(os.getenv('HTTP_RETRIES', 2))
+)
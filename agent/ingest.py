@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PoolUpdate:
+    """
+    One pool's APY change, possibly merged from several events: old_apy is
+    from the first event of the window, new_apy and timestamp from the last
+    """
+    pool_address: str
+    old_apy: float
+    new_apy: float
+    timestamp: str
+    user_address: Optional[str] = None
+    events: int = 1
+    first_received: float = field(default_factory=time.monotonic)
+    ready_at: float = 0.0  # When the window closed and the update was queued
+
+class QueueFullError(Exception):
+    pass
+
+# Windows are per pool and user: each user's positions need their own analysis
+WindowKey = Tuple[str, Optional[str]]
+
+class CoalescingIngestQueue:
+    """
+    Accepts APY-change events instantly and coalesces them per (pool, user):
+    the first event for a pool and user opens a window of window_seconds,
+    later events in that window only replace new_apy. Events for the same
+    pool from different users get separate windows, so every user is
+    analyzed. When a window closes the merged update goes to a bounded pool
+    of workers running the handler. A (pool, user) pair is never analyzed by
+    two workers at once; events arriving during its analysis open the next
+    window.
+    """
+    def __init__(
+        self,
+        handler: Callable[[PoolUpdate], Awaitable],
+        window_seconds: float = 0.25,
+        workers: int = 4,
+        max_pending_pools: int = 10000,
+        lag_samples: int = 1024
+    ):
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.workers = workers
+        self.max_pending_pools = max_pending_pools
+        
+        self._open: Dict[WindowKey, PoolUpdate] = {}              # Windows still collecting events
+        self._deadlines: List[Tuple[float, int, WindowKey]] = []  # (close time, seq, (pool, user))
+        self._sequence = itertools.count()
+        self._ready: Optional[asyncio.Queue] = None
+        self._in_progress: Set[WindowKey] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        
+        self.received = 0
+        self.dispatched = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue_lag: Deque[float] = deque(maxlen=lag_samples)  # Window close -> analysis start
+        self._total_lag: Deque[float] = deque(maxlen=lag_samples)  # First event -> analysis done
+    
+    def submit(
+        self,
+        pool_address: str,
+        old_apy: float,
+        new_apy: float,
+        timestamp: str,
+        user_address: Optional[str] = None
+    ) -> bool:
+        """
+        Queue one event; returns True if it merged into an open window.
+        Raises QueueFullError when max_pending_pools windows are open.
+        """
+        key = (pool_address, user_address)
+        update = self._open.get(key)
+        if update is not None:
+            update.new_apy = new_apy
+            update.timestamp = timestamp
+            update.events += 1
+            self.received += 1
+            return True
+        
+        if len(self._open) >= self.max_pending_pools:
+            self.rejected += 1
+            raise QueueFullError(f"{len(self._open)} pool updates already pending")
+        
+        self._open[key] = PoolUpdate(pool_address, old_apy, new_apy, timestamp, user_address)
+        heapq.heappush(
+            self._deadlines, (time.monotonic() + self.window_seconds, next(self._sequence), key)
+        )
+        self.received += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return False
+    
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._schedule())] + [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+        logger.info(f"📥 Ingest queue started ({self.workers} workers, {self.window_seconds * 1000:.0f} ms window)")
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        pending = len(self._open) + (self._ready.qsize() if self._ready else 0)
+        if pending:
+            logger.info(f"📥 Ingest queue stopped with {pending} updates pending")
+    
+    def stats(self) -> Dict:
+        queue_lag = np.array(self._queue_lag) * 1000
+        total_lag = np.array(self._total_lag) * 1000
+        return {
+            "received": self.received,
+            "dispatched": self.dispatched,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "coalescing_ratio": self.received / self.dispatched if self.dispatched else 0.0,
+            "open_windows": len(self._open),
+            "queued": self._ready.qsize() if self._ready else 0,
+            "in_progress": len(self._in_progress),
+            "queue_lag_ms": _percentiles(queue_lag),
+            "total_lag_ms": _percentiles(total_lag),
+            "window_ms": self.window_seconds * 1000,
+            "workers": self.workers
+        }
+    
+    async def _schedule(self) -> None:
+        """
+        Close due windows and hand their updates to the workers
+        """
+        while True:
+            now = time.monotonic()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, _, key = heapq.heappop(self._deadlines)
+                if key in self._in_progress:
+                    # Still analyzing the previous update: keep collecting
+                    heapq.heappush(
+                        self._deadlines, (now + self.window_seconds, next(self._sequence), key)
+                    )
+                    continue
+                update = self._open.pop(key)
+                update.ready_at = now
+                self._in_progress.add(key)
+                self.dispatched += 1
+                self._ready.put_nowait(update)
+            
+            timeout = self._deadlines[0][0] - now if self._deadlines else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _work(self) -> None:
+        while True:
+            update = await self._ready.get()
+            started = time.monotonic()
+            self._queue_lag.append(started - update.ready_at)
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ingest analysis failed for {update.pool_address}: {str(e)}")
+            finally:
+                self._in_progress.discard((update.pool_address, update.user_address))
+                self._total_lag.append(time.monotonic() - update.first_received)
+
+def _percentiles(samples: np.ndarray) -> Dict[str, float]:
+    if not len(samples):
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    p50, p95 = np.percentile(samples, [50, 95]).tolist()
+    return {"p50": p50, "p95": p95, "max": float(samples.max())}
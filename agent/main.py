@@ -4,25 +4,49 @@ import asyncio
 import json
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-import aiohttp
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 from ai_engine import YieldOptimizer
 from advanced_ai_engine import ai_engine as advanced_ai_engine
-from blockchain_client import MonadClient
-from delegation_validator import DelegationValidator
+from blockchain_client import POSITION_POOL_ADDRESSES, MonadClient
+from delegation_validator import RISK_INCREASE_LIMITS, DelegationValidator
+from http_client import http_client
+from ingest import CoalescingIngestQueue, PoolUpdate, QueueFullError
+from outbox import outbox
+from market_stats import market_statistics
+from metrics import metrics
+from pool_snapshot import PoolSnapshot
+from push import SubscriberLimitError, push_hub
+from rebalance_planner import RebalancePlanner
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Yield Agent")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP session for every outbound call
+    await http_client.start()
+    await outbox.start()
+    await ingest_queue.start()
+    await monad_client.start()
+    yield
+    await monad_client.stop()
+    await ingest_queue.stop()
+    await outbox.stop()
+    await http_client.close()
+
+app = FastAPI(title="AI Yield Agent", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -38,6 +62,29 @@ class AnalysisRequest(BaseModel):
     oldAPY: float
     newAPY: float
     timestamp: str
+    userAddress: Optional[str] = None
+
+class RecommendationRequest(BaseModel):
+    userAddress: Optional[str] = None
+    riskTolerance: Optional[float] = None
+
+class PlanRequest(BaseModel):
+    userAddress: Optional[str] = None
+    maxAmount: Optional[float] = None  # defaults to the delegation's remaining amount
+
+class AllocationRequest(BaseModel):
+    userAddress: Optional[str] = None
+    riskTolerance: Optional[Union[str, float]] = None  # defaults to the delegation's risk tolerance
+    poolCaps: Optional[Dict[str, float]] = None       # pool address -> max weight
+
+class BatchAnalysisRequest(BaseModel):
+    positions: Dict[str, List[Dict]]  # user address -> positions
+    pools: Optional[List[Dict]] = None  # defaults to current pool data
+
+class PortfolioMetricsRequest(BaseModel):
+    positions: Dict[str, List[Dict]]  # user address -> positions
+    pools: Optional[List[Dict]] = None  # defaults to current pool data
+    includeDistribution: bool = True
 
 class RebalanceAction(BaseModel):
     fromPool: str
@@ -50,140 +97,550 @@ class RebalanceAction(BaseModel):
 yield_optimizer = YieldOptimizer()
 monad_client = MonadClient()
 delegation_validator = DelegationValidator()
+rebalance_planner = RebalancePlanner(yield_optimizer)
+
+DEFAULT_USER_ADDRESS = '0x1234567890123456789012345678901234567890'
+PRIORITY_SCORES = {"high": 8, "medium": 6, "low": 3}
+
+# Analysis pipeline instrumentation, exposed at /metrics
+STAGE_SECONDS = metrics.histogram(
+    "agent_analysis_stage_seconds", "Time spent in each stage of a pool update analysis", ("stage",)
+)
+ANALYSES = metrics.counter("agent_analyses_total", "Pool update analyses by outcome", ("status",))
+
+# Long-lived snapshot so its version (and the recommendation memo) only
+# changes when pool data does
+POOL_REFRESH_SECONDS = float(os.getenv('POOL_REFRESH_SECONDS', 15))
+pool_snapshot: Optional[PoolSnapshot] = None
+pool_snapshot_time = 0.0
 
 @app.get("/recommendations")
 @app.post("/recommendations")
-async def get_recommendations():
-    """Get AI recommendations for yield optimization"""
+async def get_recommendations(request: Optional[RecommendationRequest] = None):
+    """Get AI recommendations for yield optimization (memoized per snapshot and positions)"""
+    
+    try:
+        user_address = request.userAddress if request and request.userAddress else DEFAULT_USER_ADDRESS
+        return await build_recommendations(user_address)
+    
+    except Exception as e:
+        logger.error(f"Recommendations failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def build_recommendations(user_address: str, user_positions: Optional[List[Dict]] = None) -> Dict:
+    """Recommendations payload shared by /recommendations and the push stream"""
+    
+    pools = await get_pool_snapshot()
+    if user_positions is None:
+        user_positions = await get_user_positions(user_address)
+    
+    recommendations = yield_optimizer.generate_recommendations(pools, user_positions)
+    
     return {
-        "recommendations": [
-            {
-                "from_pool": "USDC/ETH",
-                "to_pool": "WETH/USDT", 
-                "amount": 1.5,
-                "confidence": 0.87,
-                "expected_gain": 2.7,
-                "risk_assessment": 0.3,
-                "rationale": "WETH/USDT pool showing 15.2% APY vs current 12.5%",
-                "execution_priority": 8
-            },
-            {
-                "from_pool": "DAI/USDC",
-                "to_pool": "WETH/USDT",
-                "amount": 0.8,
-                "confidence": 0.73,
-                "expected_gain": 1.2,
-                "risk_assessment": 0.2,
-                "rationale": "Low risk stable pair with consistent 8.3% returns",
-                "execution_priority": 6
-            }
-        ],
-        "marketConditions": {
-            "volatility": "Medium",
-            "trend": "Bullish",
-            "riskLevel": "Low-Medium"
-        }
+        "recommendations": [to_dashboard_recommendation(rec) for rec in recommendations],
+        "marketConditions": advanced_ai_engine.analyze_market_conditions(),
+        "snapshotVersion": pools.version
+    }
+
+# The event loop only holds tasks weakly; these keep first-push tasks alive
+stream_tasks: set = set()
+
+def stream_task_done(task: asyncio.Task):
+    stream_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Initial recommendation push failed: {str(task.exception())}")
+
+@app.get("/stream")
+async def stream_updates(userAddress: Optional[str] = None):
+    """
+    Server-Sent Events for one user: "recommendations" whenever they change
+    and "approval" for actions waiting on the user. The current state is
+    sent on connect, so dashboards need no polling.
+    """
+    
+    user_address = userAddress or DEFAULT_USER_ADDRESS
+    try:
+        subscription = push_hub.subscribe(user_address)
+    except SubscriberLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if not push_hub.has_retained(user_address, "recommendations"):
+        task = asyncio.get_running_loop().create_task(push_recommendations([user_address]))
+        stream_tasks.add(task)
+        task.add_done_callback(stream_task_done)
+    
+    return StreamingResponse(
+        push_hub.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stream/stats")
+async def stream_stats():
+    """Subscribers, fan-out and backpressure counters of the push stream"""
+    return push_hub.stats()
+
+@app.get("/recommendations/cache")
+async def recommendation_cache_stats():
+    """Hit/miss/eviction counters of the recommendation memo"""
+    return yield_optimizer.recommendation_cache.stats()
+
+@app.get("/outbox")
+async def outbox_stats():
+    """Queue depth and delivery counters of the audit/notification outbox"""
+    return outbox.stats()
+
+@app.get("/pools/cache")
+async def pool_cache_stats():
+    """Hit/stale/miss counters of the pool data cache"""
+    return monad_client.pool_cache.stats()
+
+@app.get("/rpc/stats")
+async def rpc_stats():
+    """Calls, batches and average batch size of the JSON-RPC batcher"""
+    return monad_client.rpc.stats()
+
+@app.get("/rpc/blocks")
+async def block_cache_stats():
+    """Chain head and per-block hit rates of the block-keyed contract read cache"""
+    return monad_client.block_cache.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latencies, outbound call latencies and component counters (Prometheus text format)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def component_metrics():
+    """Component stats() as Prometheus samples; only runs on a scrape"""
+    
+    for cache, stats in (
+        ("recommendations", yield_optimizer.recommendation_cache.stats()),
+        ("pool_data", monad_client.pool_cache.stats()),
+        ("block_reads", monad_client.block_cache.stats())
+    ):
+        yield ("agent_cache_hits_total", "counter", "Cache reads served from cache (including stale)",
+               {"cache": cache}, stats["hits"] + stats.get("stale", 0))
+        yield ("agent_cache_misses_total", "counter", "Cache reads that had to compute or fetch",
+               {"cache": cache}, stats["misses"])
+        yield ("agent_cache_hit_ratio", "gauge", "Share of cache reads served from cache",
+               {"cache": cache}, stats["hit_rate"])
+    
+    pool_cache = monad_client.pool_cache.stats()
+    yield ("agent_pool_cache_stale_reads_total", "counter", "Pool reads served stale while refreshing", {}, pool_cache["stale"])
+    
+    block_reads = monad_client.block_cache.stats()
+    if block_reads["head"] is not None:
+        yield ("agent_chain_head_block", "gauge", "Latest block number seen by the head tracker", {}, block_reads["head"])
+    yield ("agent_block_cache_reads_per_block", "gauge", "Contract reads per retired block, recent average",
+           {}, block_reads["avg_reads_per_block"])
+    
+    http = http_client.stats()
+    yield ("agent_http_requests_total", "counter", "Outbound HTTP attempts", {}, http["requests"])
+    yield ("agent_http_retries_total", "counter", "Outbound HTTP retries", {}, http["retried"])
+    yield ("agent_http_connections_total", "counter", "Pooled connections by event",
+           {"event": "created"}, http["connections_created"])
+    yield ("agent_http_connections_total", "counter", "Pooled connections by event",
+           {"event": "reused"}, http["connections_reused"])
+    
+    queued = outbox.stats()
+    yield ("agent_outbox_depth", "gauge", "Audit/notification deliveries not yet confirmed", {}, queued["depth"])
+    yield ("agent_outbox_delivered_total", "counter", "Outbox deliveries confirmed", {}, queued["delivered"])
+    yield ("agent_outbox_dead_total", "counter", "Outbox entries given up on", {}, queued["dead"])
+    
+    ingest = ingest_queue.stats()
+    yield ("agent_ingest_events_total", "counter", "Events received by /analyze", {}, ingest["received"])
+    yield ("agent_ingest_dispatched_total", "counter", "Coalesced updates handed to workers", {}, ingest["dispatched"])
+    yield ("agent_ingest_backlog", "gauge", "Updates waiting in the ingest queue by state",
+           {"state": "open_window"}, ingest["open_windows"])
+    yield ("agent_ingest_backlog", "gauge", "Updates waiting in the ingest queue by state",
+           {"state": "queued"}, ingest["queued"])
+    yield ("agent_ingest_queue_lag_p95_seconds", "gauge", "Window close to analysis start, p95 of recent updates",
+           {}, ingest["queue_lag_ms"]["p95"] / 1000)
+    
+    stream = push_hub.stats()
+    yield ("agent_stream_subscribers", "gauge", "Open push streams", {}, stream["subscribers"])
+    yield ("agent_stream_slow_disconnects_total", "counter", "Streams closed for falling behind", {}, stream["slow_disconnects"])
+
+metrics.register_collector(component_metrics)
+
+@app.get("/http/stats")
+async def http_client_stats():
+    """Request, retry and connection reuse counters of the shared HTTP client"""
+    return http_client.stats()
+
+def to_dashboard_recommendation(rec: Dict) -> Dict:
+    """Add the fields the dashboard cards render, keeping the original ones"""
+    return {
+        **rec,
+        "from_pool": "Portfolio",
+        "to_pool": rec.get("pool_name", "Portfolio"),
+        "amount": 0.0,
+        "expected_gain": rec.get("expected_gain", 0.0),
+        "risk_assessment": rec.get("risk_score", 0.0),
+        "rationale": rec["description"],
+        "execution_priority": PRIORITY_SCORES.get(rec["priority"], 5)
     }
 
 @app.post("/analyze")
 async def analyze_yield_opportunity(request: AnalysisRequest):
-    """Analyze yield opportunity and execute if confidence is high enough"""
+    """Accept a yield change event; analysis runs from the coalescing ingest queue"""
+    
+    try:
+        coalesced = ingest_queue.submit(
+            request.poolAddress, request.oldAPY, request.newAPY, request.timestamp, request.userAddress
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     
-    logger.info(f"🔍 Analyzing yield change: {request.poolAddress}")
+    return {"status": "queued", "poolAddress": request.poolAddress, "coalesced": coalesced}
+
+@app.get("/ingest")
+async def ingest_stats():
+    """Coalescing ratio, queue lag and backlog of the /analyze ingest queue"""
+    return ingest_queue.stats()
+
+async def process_pool_update(update: PoolUpdate) -> Dict:
+    """Analyze one (coalesced) yield change and record how long each stage took"""
     
+    status = "failed"
     try:
-        # Get current pool data
-        pools_data = await get_pools_data()
+        with STAGE_SECONDS.time(stage="total"):
+            result = await analyze_pool_update(update)
+        status = result["status"]
+        return result
+    finally:
+        ANALYSES.inc(status=status)
+
+async def analyze_pool_update(update: PoolUpdate) -> Dict:
+    """Analyze one (coalesced) yield change and execute if confidence is high enough"""
+    
+    logger.info(f"🔍 Analyzing yield change: {update.pool_address} ({update.events} events)")
+    
+    # Get current pool data with the reported APY change applied
+    # (not observed: the read predates the event and would feed the old APY back in)
+    with STAGE_SECONDS.time(stage="get_pools_data"):
+        pools_data = await get_pools_data(observe=False)
+    for pool in pools_data:
+        if pool["address"] == update.pool_address:
+            pool["apy"] = update.new_apy
+    
+    # Fold the event into the streaming market statistics
+    with STAGE_SECONDS.time(stage="market_statistics"):
+        market_statistics.observe_event(
+            update.pool_address, update.old_apy, update.new_apy, update.timestamp
+        )
+        market_statistics.annotate(pools_data)
         
-        # AI decision making
+        # A pool update invalidates memoized recommendations
+        set_pool_snapshot(PoolSnapshot.from_records(pools_data))
+    
+    # Get user address from the event or delegation context
+    user_address = update.user_address or DEFAULT_USER_ADDRESS
+    with STAGE_SECONDS.time(stage="get_user_positions"):
+        user_positions = await get_user_positions(user_address)
+    
+    # AI decision making (only pairs involving the trigger pool are re-scored)
+    with STAGE_SECONDS.time(stage="optimizer"):
         action = yield_optimizer.analyze_rebalance_opportunity(
-            pools_data, request.poolAddress, request.newAPY
+            pools_data, user_positions,
+            trigger_pool=update.pool_address,
+            user_address=user_address
+        )
+    
+    if not action:
+        return {"status": "no_action", "reason": "No profitable rebalance found"}
+    
+    # Check confidence threshold
+    if action.confidence < float(os.getenv('CONFIDENCE_THRESHOLD', 0.8)):
+        with STAGE_SECONDS.time(stage="notify_approval"):
+            await notify_user_for_approval(action, user_address)
+        return {"status": "pending_approval", "action": action}
+    
+    # Execute delegated transaction
+    result = await execute_delegated_rebalance(action, user_address)
+    
+    return {
+        "status": "executed", 
+        "action": action, 
+        "txHash": result.get('txHash'),
+        "validation": result.get('validation')
+    }
+
+# Storms of events for one pool collapse into one analysis per window
+ingest_queue = CoalescingIngestQueue(
+    process_pool_update,
+    window_seconds=float(os.getenv('INGEST_WINDOW_MS', 250)) / 1000,
+    workers=int(os.getenv('INGEST_WORKERS', 4))
+)
+
+@app.post("/plan")
+async def plan_rebalance(request: PlanRequest):
+    """Plan moves for every position at once within the user's delegation limits"""
+    
+    try:
+        user_address = request.userAddress or DEFAULT_USER_ADDRESS
+        pools = await get_pool_snapshot()
+        user_positions = await get_user_positions(user_address)
+        
+        delegation = await delegation_validator.get_delegation_status(user_address)
+        max_amount = request.maxAmount
+        allowed_pools = None
+        max_risk_increase = None
+        if delegation.get("active"):
+            if max_amount is None:
+                max_amount = max(0.0, delegation["remaining_amount"])
+            allowed_pools = delegation["allowed_pools"] or None
+            max_risk_increase = RISK_INCREASE_LIMITS.get(delegation["risk_tolerance"], 0.2)
+        
+        # CPU-bound solve runs off the event loop
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(
+            None,
+            lambda: rebalance_planner.plan(
+                pools, user_positions,
+                max_amount=max_amount,
+                allowed_pools=allowed_pools,
+                max_risk_increase=max_risk_increase
+            )
         )
         
-        if not action:
-            return {"status": "no_action", "reason": "No profitable rebalance found"}
+        return {
+            **plan.to_dict(),
+            "maxAmount": max_amount,
+            "delegationActive": bool(delegation.get("active")),
+            "snapshotVersion": pools.version
+        }
+    
+    except Exception as e:
+        logger.error(f"Rebalance planning failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/allocation")
+async def optimal_allocation(request: AllocationRequest):
+    """Target weights across all pools for the user's risk tolerance and allowed pools"""
+    
+    try:
+        user_address = request.userAddress or DEFAULT_USER_ADDRESS
+        pools = await get_pool_snapshot()
+        
+        delegation = await delegation_validator.get_delegation_status(user_address)
+        risk_tolerance = request.riskTolerance
+        pool_caps = dict(request.poolCaps or {})
+        if delegation.get("active"):
+            if risk_tolerance is None:
+                risk_tolerance = delegation["risk_tolerance"]
+            if delegation["allowed_pools"]:
+                allowed = set(delegation["allowed_pools"])
+                pool_caps.update({address: 0.0 for address in pools.addresses if address not in allowed})
         
-        # Check confidence threshold
-        if action.confidence < float(os.getenv('CONFIDENCE_THRESHOLD', 0.8)):
-            await notify_user_for_approval(action)
-            return {"status": "pending_approval", "action": action}
+        # CPU-bound solve runs off the event loop
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None,
+            advanced_ai_engine.calculate_optimal_allocation,
+            pools, risk_tolerance, pool_caps or None
+        )
         
-        # Get user address from request or delegation context
-        user_address = request.dict().get('userAddress', '0x1234567890123456789012345678901234567890')
+        return {
+            **result,
+            "riskTolerance": risk_tolerance,
+            "delegationActive": bool(delegation.get("active"))
+        }
+    
+    except Exception as e:
+        logger.error(f"Allocation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Find the best rebalance for many users against one pool snapshot"""
+    
+    logger.info(f"🔍 Batch analysis for {len(request.positions)} users")
+    
+    try:
+        pools_data = request.pools if request.pools is not None else await get_pools_data()
         
-        # Execute delegated transaction
-        result = await execute_delegated_rebalance(action, user_address)
+        # CPU-bound scoring runs off the event loop
+        loop = asyncio.get_running_loop()
+        actions = await loop.run_in_executor(
+            None, yield_optimizer.analyze_rebalance_batch, pools_data, request.positions
+        )
         
         return {
-            "status": "executed", 
-            "action": action, 
-            "txHash": result.get('txHash'),
-            "validation": result.get('validation')
+            "status": "ok",
+            "users": len(actions),
+            "actionable": sum(1 for action in actions.values() if action),
+            "actions": {user: action.to_dict() if action else None for user, action in actions.items()}
         }
+    
+    except Exception as e:
+        logger.error(f"Batch analysis failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/portfolio/metrics")
+async def portfolio_metrics_batch(request: PortfolioMetricsRequest):
+    """Portfolio metrics for many users in one grouped pass"""
+    
+    try:
+        pools_data = request.pools if request.pools is not None else await get_pools_data()
+        
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(
+            None,
+            yield_optimizer.calculate_portfolio_metrics_batch,
+            pools_data, request.positions, request.includeDistribution
+        )
         
+        return {"users": len(metrics), "metrics": metrics}
+    
     except Exception as e:
-        logger.error(f"Analysis failed: {str(e)}")
+        logger.error(f"Portfolio metrics failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_pools_data() -> List[Dict]:
+async def get_pools_data(observe: bool = True) -> List[Dict]:
     """Fetch current pool data from Monad testnet"""
     
-    # Mock pool data for demo
-    return [
+    # Mock pool data for demo, at the addresses MonadClient reports positions in
+    pools = [
         {
-            "address": "0x1234...",
+            "address": POSITION_POOL_ADDRESSES[0],
             "name": "USDC/ETH",
             "apy": 12.5,
             "tvl": 1000000,
+            "volume24h": 100000,
             "risk_score": 0.3
         },
         {
-            "address": "0x5678...",
+            "address": POSITION_POOL_ADDRESSES[1],
             "name": "DAI/USDC", 
             "apy": 8.3,
             "tvl": 2000000,
+            "volume24h": 200000,
             "risk_score": 0.1
         },
         {
-            "address": "0x9abc...",
+            "address": POSITION_POOL_ADDRESSES[2],
             "name": "WETH/USDT",
             "apy": 15.2,
             "tvl": 800000,
+            "volume24h": 80000,
             "risk_score": 0.5
         }
     ]
+    
+    # A refresh is an observation for each pool whose APY changed
+    if observe:
+        market_statistics.observe_pools(pools)
+    market_statistics.annotate(pools)
+    return pools
+
+async def get_pool_snapshot() -> PoolSnapshot:
+    """Shared pool snapshot, refreshed at most every POOL_REFRESH_SECONDS"""
+    
+    if pool_snapshot is None or time.monotonic() - pool_snapshot_time > POOL_REFRESH_SECONDS:
+        set_pool_snapshot(PoolSnapshot.from_records(await get_pools_data()))
+    return pool_snapshot
+
+def set_pool_snapshot(snapshot: PoolSnapshot):
+    """Replace the shared snapshot; memoized recommendations are dropped if it changed"""
+    global pool_snapshot, pool_snapshot_time
+    
+    if pool_snapshot is None or not pool_snapshot.same_contents(snapshot):
+        pool_snapshot = snapshot
+        yield_optimizer.invalidate_recommendations()
+        schedule_recommendation_push()
+    pool_snapshot_time = time.monotonic()
+
+# At most one push run at a time; changes during a run trigger one more
+recommendation_push_task: Optional[asyncio.Task] = None
+recommendation_push_pending = False
+
+def schedule_recommendation_push():
+    """Recompute recommendations for streaming users after the snapshot changed"""
+    global recommendation_push_task, recommendation_push_pending
+    
+    if not push_hub.addresses():
+        return
+    if recommendation_push_task is not None and not recommendation_push_task.done():
+        recommendation_push_pending = True
+        return
+    
+    async def run():
+        global recommendation_push_pending
+        while True:
+            recommendation_push_pending = False
+            await push_recommendations(push_hub.addresses())
+            if not recommendation_push_pending:
+                break
+    
+    recommendation_push_task = asyncio.get_running_loop().create_task(run())
+
+async def push_recommendations(addresses: List[str]):
+    """Publish fresh recommendations; the hub skips users whose set is unchanged"""
+    
+    # Positions of every subscriber in one user x pool read instead of one per user
+    positions_by_user: Dict[str, List[Dict]] = {}
+    if addresses:
+        try:
+            _, table = await monad_client.get_positions_for_users(addresses)
+            positions_by_user = table.positions_by_user()
+        except Exception as e:
+            logger.warning(f"Bulk position read failed, reading per user: {str(e)}")
+    
+    for address in addresses:
+        try:
+            payload = jsonable_encoder(await build_recommendations(address, positions_by_user.get(address)))
+            push_hub.publish(address, "recommendations", payload, key="recommendations")
+        except Exception as e:
+            logger.error(f"Recommendation push failed for {address}: {str(e)}")
+
+async def get_user_positions(user_address: str) -> List[Dict]:
+    """Fetch a user's positions in the shape the optimizer expects"""
+    
+    positions = await monad_client.get_user_positions(user_address)
+    return [
+        {
+            "pool_address": pos["poolAddress"],
+            "balance": float(pos["balance"]),
+            "value_usd": float(pos["value"])
+        }
+        for pos in positions
+    ]
 
 async def execute_delegated_rebalance(action: RebalanceAction, user_address: str) -> Dict:
     """Execute rebalance using delegated authority"""
     
     # Validate delegation
-    validation_result = await delegation_validator.validate_action(action, user_address)
+    with STAGE_SECONDS.time(stage="validate_action"):
+        validation_result = await delegation_validator.validate_action(action, user_address)
     if not validation_result.is_valid:
         raise Exception(f"Delegation validation failed: {validation_result.reason}")
     
     # Execute via Monad bundler
-    tx_hash = await monad_client.execute_rebalance(action)
+    with STAGE_SECONDS.time(stage="execute_rebalance"):
+        tx_hash = await monad_client.execute_rebalance(action)
     
     # Update usage tracking
-    await delegation_validator.update_usage_tracking(user_address, action)
+    with STAGE_SECONDS.time(stage="update_usage"):
+        await delegation_validator.update_usage_tracking(user_address, action)
     
-    # Log to audit trail
-    await log_execution(action, tx_hash, user_address)
-    
-    # Send notifications
-    await send_notifications(action, tx_hash, user_address)
+    # Audit trail and notifications are queued; the outbox delivers them
+    # (delivery latency shows up per host in agent_outbound_request_seconds)
+    with STAGE_SECONDS.time(stage="audit_and_notify"):
+        await log_execution(action, tx_hash, user_address)
+        await send_notifications(action, tx_hash, user_address)
     
     return {"txHash": tx_hash, "validation": validation_result}
 
 async def log_execution(action: RebalanceAction, tx_hash: str, user_address: str):
-    """Log execution to audit trail"""
+    """Queue the execution for the audit trail"""
     
     audit_data = {
         "action": "rebalance",
         "details": {
             "rationale": action.rationale,
-            "fromPool": action.fromPool,
-            "toPool": action.toPool,
+            "fromPool": action.from_pool,
+            "toPool": action.to_pool,
             "amount": str(action.amount)
         },
         "txHash": tx_hash,
@@ -192,36 +649,44 @@ async def log_execution(action: RebalanceAction, tx_hash: str, user_address: str
         "userAddress": user_address
     }
     
-    async with aiohttp.ClientSession() as session:
-        await session.post(
-            "http://localhost:3002/api/audit",
-            json=audit_data
-        )
+    outbox.enqueue("audit", "http://localhost:3002/api/audit", audit_data)
 
 async def send_notifications(action: RebalanceAction, tx_hash: str, user_address: str):
-    """Send notifications via backend webhooks"""
+    """Queue notifications for the backend webhooks"""
     
     notification_data = {
         "action": f"Rebalanced {action.amount} ETH",
         "txHash": tx_hash,
         "user": user_address,
-        "fromPool": action.fromPool,
-        "toPool": action.toPool
+        "fromPool": action.from_pool,
+        "toPool": action.to_pool
     }
     
-    async with aiohttp.ClientSession() as session:
-        await session.post(
-            "http://localhost:3002/webhooks/farcaster",
-            json=notification_data
-        )
+    outbox.enqueue("notification", "http://localhost:3002/webhooks/farcaster", notification_data)
 
-async def notify_user_for_approval(action: RebalanceAction):
-    """Notify user when manual approval is needed"""
+async def notify_user_for_approval(action: RebalanceAction, user_address: str):
+    """Push the action to the user's open dashboards for manual approval"""
     
     logger.info(f"⚠️ Low confidence ({action.confidence}), requesting user approval")
     
-    # Send notification to frontend
-    # Implementation would depend on WebSocket or polling mechanism
+    approval = {
+        "from_pool": action.from_pool,
+        "to_pool": action.to_pool,
+        "amount": action.amount,
+        "confidence": action.confidence,
+        "rationale": action.rationale,
+        "expected_apy_improvement": action.expected_apy_improvement,
+        "risk_adjustment": action.risk_adjustment,
+        "requested_at": time.time()
+    }
+    
+    # Keyed by pool pair so a newer request replaces an older one; kept for
+    # dashboards that connect later until it expires
+    push_hub.publish(
+        user_address, "approval", jsonable_encoder(approval),
+        key=f"approval:{action.from_pool}:{action.to_pool}",
+        ttl=float(os.getenv('APPROVAL_TTL_SECONDS', 600))
+    )
 
 if __name__ == "__main__":
     import os
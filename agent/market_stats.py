@@ -0,0 +1,228 @@
+import math
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Union
+
+from pool_snapshot import PoolSnapshot
+
+class PoolStats:
+    """
+    Fixed-size streaming state for one pool's APY series
+    """
+    __slots__ = (
+        "mean", "variance", "trend", "last_time", "last_apy", "anchor_apy", "anchor_time",
+        "peak", "drawdown", "max_drawdown", "count"
+    )
+    
+    def __init__(self, apy: float, timestamp: float):
+        self.mean = apy
+        self.variance = 0.0
+        self.trend = 0.0            # APY points per hour, exponentially weighted
+        self.last_time = timestamp
+        self.last_apy = apy
+        self.anchor_apy = apy       # Reference point the next trend slope is measured from
+        self.anchor_time = timestamp
+        self.peak = apy
+        self.drawdown = 0.0         # Fraction below the running peak
+        self.max_drawdown = 0.0
+        self.count = 1
+    
+    @property
+    def volatility(self) -> float:
+        """
+        Exponentially weighted APY standard deviation, as a fraction (like apy / 100)
+        """
+        return math.sqrt(max(self.variance, 0.0)) / 100
+    
+    @property
+    def relative_volatility(self) -> float:
+        """
+        Standard deviation relative to the mean APY
+        """
+        return math.sqrt(max(self.variance, 0.0)) / abs(self.mean) if self.mean else 0.0
+    
+    def to_dict(self) -> Dict:
+        return {
+            "mean_apy": self.mean,
+            "volatility": self.volatility,
+            "relative_volatility": self.relative_volatility,
+            "trend": self.trend,
+            "drawdown": self.drawdown,
+            "max_drawdown": self.max_drawdown,
+            "observations": self.count
+        }
+
+class MarketStatistics:
+    """
+    Per-pool exponentially weighted APY mean/variance, trend slope and
+    drawdown, updated in O(1) per observation. Market-wide aggregates are
+    kept as running sums so market conditions never scan history.
+    """
+    def __init__(
+        self,
+        half_life_seconds: float = 3600.0,
+        min_alpha: float = 0.05,
+        min_trend_interval: float = 60.0
+    ):
+        self.tau = half_life_seconds / math.log(2)
+        self.min_alpha = min_alpha  # Weight of an observation arriving with no elapsed time
+        self.min_trend_interval = min_trend_interval  # Shorter gaps would make slopes explode
+        self.pools: Dict[str, PoolStats] = {}
+        
+        # Running sums across pools of each pool's current contribution
+        self._sum_relative_volatility = 0.0
+        self._sum_trend = 0.0
+        self._sum_drawdown = 0.0
+    
+    def observe(self, pool_address: str, apy: float, timestamp=None) -> Optional[PoolStats]:
+        """
+        Fold one APY observation into the pool's state
+        """
+        if apy is None or math.isnan(apy):
+            return self.pools.get(pool_address)
+        
+        now = to_epoch_seconds(timestamp)
+        stats = self.pools.get(pool_address)
+        if stats is None:
+            stats = PoolStats(apy, now)
+            self.pools[pool_address] = stats
+            self._add(stats, 1)
+            return stats
+        
+        self._add(stats, -1)
+        
+        elapsed = max(now - stats.last_time, 0.0)
+        alpha = max(1 - math.exp(-elapsed / self.tau), self.min_alpha)
+        
+        # Incremental exponentially weighted mean and variance
+        diff = apy - stats.mean
+        increment = alpha * diff
+        stats.mean += increment
+        stats.variance = (1 - alpha) * (stats.variance + diff * increment)
+        
+        span = now - stats.anchor_time
+        if span >= self.min_trend_interval:
+            slope = (apy - stats.anchor_apy) / (span / 3600)
+            stats.trend += max(1 - math.exp(-span / self.tau), self.min_alpha) * (slope - stats.trend)
+            stats.anchor_apy = apy
+            stats.anchor_time = now
+        
+        stats.peak = max(stats.peak, apy)
+        stats.drawdown = (stats.peak - apy) / stats.peak if stats.peak > 0 else 0.0
+        stats.max_drawdown = max(stats.max_drawdown, stats.drawdown)
+        
+        stats.last_time = max(now, stats.last_time)
+        stats.last_apy = apy
+        stats.count += 1
+        
+        self._add(stats, 1)
+        return stats
+    
+    def observe_event(self, pool_address: str, old_apy: float, new_apy: float, timestamp=None) -> PoolStats:
+        """
+        An APY change event; the old value seeds pools seen for the first time
+        """
+        if pool_address not in self.pools and old_apy is not None:
+            self.observe(pool_address, old_apy, timestamp)
+        return self.observe(pool_address, new_apy, timestamp)
+    
+    def observe_pools(self, pools: Iterable, timestamp=None) -> None:
+        """
+        One observation per pool from a refresh (dicts or PoolData-like objects).
+        Pools whose APY is unchanged since their last observation are skipped:
+        re-reading the same value is not a new sample, and counting it would
+        move the volatility on every refresh.
+        """
+        for pool in pools:
+            if isinstance(pool, dict):
+                address, apy = pool["address"], pool["apy"]
+            else:
+                address, apy = pool.address, pool.apy
+            stats = self.pools.get(address)
+            if stats is None or apy != stats.last_apy:
+                self.observe(address, apy, timestamp)
+    
+    def volatility(self, pool_address: str) -> float:
+        stats = self.pools.get(pool_address)
+        return stats.volatility if stats else 0.0
+    
+    def annotate(self, pools) -> None:
+        """
+        Fill the volatility field of pool dicts or a PoolSnapshot in place
+        """
+        if isinstance(pools, PoolSnapshot):
+            pools.set_column("volatility", [self.volatility(address) for address in pools.addresses])
+            return
+        
+        for pool in pools:
+            pool["volatility"] = self.volatility(pool["address"])
+    
+    def market_conditions(self) -> Dict:
+        """
+        Market-wide view from the running aggregates (O(1))
+        """
+        tracked = len(self.pools)
+        if not tracked:
+            return {
+                "volatility": 0.0,
+                "trend": "neutral",
+                "risk_level": "unknown",
+                "trend_slope": 0.0,
+                "avg_drawdown": 0.0,
+                "pools_tracked": 0
+            }
+        
+        volatility = max(self._sum_relative_volatility / tracked, 0.0)
+        slope = self._sum_trend / tracked
+        drawdown = max(self._sum_drawdown / tracked, 0.0)
+        
+        if slope > 0.01:
+            trend = "bullish"
+        elif slope < -0.01:
+            trend = "bearish"
+        else:
+            trend = "neutral"
+        
+        if volatility > 0.25 or drawdown > 0.3:
+            risk_level = "high"
+        elif volatility > 0.1 or drawdown > 0.1:
+            risk_level = "medium"
+        else:
+            risk_level = "low"
+        
+        return {
+            "volatility": volatility,
+            "trend": trend,
+            "risk_level": risk_level,
+            "trend_slope": slope,
+            "avg_drawdown": drawdown,
+            "pools_tracked": tracked
+        }
+    
+    def _add(self, stats: PoolStats, sign: int) -> None:
+        self._sum_relative_volatility += sign * stats.relative_volatility
+        self._sum_trend += sign * stats.trend
+        self._sum_drawdown += sign * stats.drawdown
+
+def to_epoch_seconds(timestamp: Union[str, float, int, datetime, None]) -> float:
+    """
+    Epoch seconds from epoch seconds/milliseconds, ISO strings or datetimes
+    """
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if isinstance(timestamp, str):
+        try:
+            timestamp = float(timestamp)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                return time.time()
+    
+    timestamp = float(timestamp)
+    return timestamp / 1000 if timestamp > 1e12 else timestamp
+
+# Shared instance fed by the API
+market_statistics = MarketStatistics()
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from http_client import HttpClient, http_client
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class OutboxEntry:
+    kind: str            # "audit", "notification", "usage"
+    url: str
+    payload: Dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+    next_attempt: float = 0.0  # time.time() before which the entry is not retried
+
+class Outbox:
+    """
+    Audit records and notifications delivered off the request path.
+    
+    enqueue() appends the entry to a local append-only log and returns at
+    once; a background task POSTs due entries in concurrent batches through
+    the shared HTTP client. Failed deliveries are retried with exponential
+    backoff; client errors other than 429, or running out of attempts,
+    move an entry to the dead count. Entries still unsent at shutdown
+    are replayed from the log on the next start.
+    
+    The log holds {"op": "put", "entry": ...} and {"op": "done", "id": ...}
+    lines and is compacted to the pending entries on start and stop.
+    """
+    def __init__(
+        self,
+        path: str,
+        client: HttpClient = http_client,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_attempts: int = 20,
+        fsync: bool = False
+    ):
+        self.path = path
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+        
+        self._pending: Deque[OutboxEntry] = deque()
+        self._in_flight: Dict[str, OutboxEntry] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._log = None
+        self._last_error: Optional[str] = None
+        
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.recovered = 0
+    
+    def enqueue(self, kind: str, url: str, payload: Dict) -> str:
+        """
+        Persist and queue one delivery; returns the entry id
+        """
+        entry = OutboxEntry(kind=kind, url=url, payload=payload)
+        self._append({"op": "put", "entry": asdict(entry)})
+        self._pending.append(entry)
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return entry.id
+    
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        
+        # The log also holds entries enqueued before start: queue each id once
+        queued = {entry.id for entry in self._pending}
+        pending = self._replay()
+        self._compact(pending)
+        self._pending = deque(pending)
+        recovered = sum(1 for entry in pending if entry.id not in queued)
+        self.recovered += recovered
+        if recovered:
+            logger.info(f"📮 Outbox recovered {recovered} unsent entries from {self.path}")
+        
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """
+        Try to deliver what is due, then stop; anything left stays in the log
+        """
+        if self._task is None:
+            return
+        
+        deadline = time.monotonic() + drain_timeout
+        while self._due() and time.monotonic() < deadline:
+            await self.flush()
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+        
+        # In-flight entries of a cancelled batch are kept: delivery is at-least-once
+        self._compact(list(self._in_flight.values()) + list(self._pending))
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._pending:
+            logger.info(f"📮 Outbox stopped with {len(self._pending)} entries pending")
+    
+    async def flush(self) -> int:
+        """
+        Deliver one batch of due entries; returns how many were delivered
+        """
+        batch = self._take_due()
+        if not batch:
+            return 0
+        
+        for entry in batch:
+            self._in_flight[entry.id] = entry
+        results = await asyncio.gather(*(self._deliver(entry) for entry in batch))
+        
+        delivered = sum(results)
+        if delivered < len(batch):
+            logger.warning(
+                f"📮 Outbox: {len(batch) - delivered}/{len(batch)} deliveries failed "
+                f"({self._last_error}), {len(self._pending)} queued"
+            )
+        return delivered
+    
+    def stats(self) -> Dict:
+        now = time.time()
+        oldest = min((entry.created_at for entry in self._pending), default=None)
+        return {
+            "depth": len(self._pending) + len(self._in_flight),
+            "in_flight": len(self._in_flight),
+            "retrying": sum(1 for entry in self._pending if entry.attempts),
+            "oldest_age_seconds": now - oldest if oldest is not None else 0.0,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "recovered": self.recovered,
+            "running": self._task is not None
+        }
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                while await self.flush():
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox flush failed: {str(e)}")
+    
+    async def _deliver(self, entry: OutboxEntry) -> bool:
+        outcome = await self._attempt(entry)
+        del self._in_flight[entry.id]
+        return outcome
+    
+    async def _attempt(self, entry: OutboxEntry) -> bool:
+        entry.attempts += 1
+        try:
+            response = await self.client.post(entry.url, json=entry.payload, retries=0)
+            if response.ok:
+                self._append({"op": "done", "id": entry.id})
+                self.delivered += 1
+                return True
+            permanent = 400 <= response.status < 500 and response.status != 429
+            reason = f"HTTP {response.status}"
+        except Exception as e:
+            permanent = False
+            reason = str(e) or type(e).__name__
+        
+        self.failed_attempts += 1
+        self._last_error = reason
+        if permanent or entry.attempts >= self.max_attempts:
+            logger.error(f"Outbox dropping {entry.kind} {entry.id} after {entry.attempts} attempts: {reason}")
+            self._append({"op": "done", "id": entry.id, "dead": True})
+            self.dead += 1
+            return False
+        
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (entry.attempts - 1))
+        entry.next_attempt = time.time() + delay * random.uniform(0.5, 1.0)
+        self._pending.append(entry)
+        logger.debug(f"Outbox {entry.kind} {entry.id} failed ({reason}), retry {entry.attempts} in {delay:.1f}s")
+        return False
+    
+    def _due(self) -> bool:
+        now = time.time()
+        return any(entry.next_attempt <= now for entry in self._pending)
+    
+    def _take_due(self) -> List[OutboxEntry]:
+        now = time.time()
+        batch, waiting = [], deque()
+        while self._pending and len(batch) < self.batch_size:
+            entry = self._pending.popleft()
+            (batch if entry.next_attempt <= now else waiting).append(entry)
+        waiting.extend(self._pending)
+        self._pending = waiting
+        return batch
+    
+    def _append(self, record: Dict) -> None:
+        if self._log is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._log = open(self.path, "a")
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+    
+    def _replay(self) -> List[OutboxEntry]:
+        """
+        Entries put but never marked done, in their original order
+        """
+        if not os.path.exists(self.path):
+            return []
+        
+        entries: Dict[str, OutboxEntry] = {}
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                if record.get("op") == "put":
+                    entry = OutboxEntry(**record["entry"])
+                    entry.next_attempt = 0.0
+                    entries[entry.id] = entry
+                elif record.get("op") == "done":
+                    entries.pop(record.get("id"), None)
+        return list(entries.values())
+    
+    def _compact(self, pending: List[OutboxEntry]) -> None:
+        """
+        Rewrite the log as just the pending entries (atomic replace)
+        """
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if not pending and not os.path.exists(self.path):
+            return
+        
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for entry in pending:
+                f.write(json.dumps({"op": "put", "entry": asdict(entry)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+# Shared instance, started and stopped by the API's lifespan
+outbox = Outbox(os.getenv('OUTBOX_PATH', 'outbox.jsonl'))
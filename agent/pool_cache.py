@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CacheEntry:
+    value: Dict
+    fetched_at: float  # time.monotonic()
+    expires_at: float  # Fresh until, then served stale while refreshing
+
+class PoolDataCache:
+    """
+    Per-pool cache in front of a slow fetch (RPC calls), with
+    stale-while-revalidate reads:
+        
+        fresh                        -> served from cache (hit)
+        expired, within max_stale    -> served from cache, refreshed in the background (stale)
+        missing or older than that   -> fetched, caller waits (miss)
+    
+    Fetches are single-flight: concurrent misses and refreshes of one pool
+    share one call. A failed background refresh keeps the old value, so a
+    flaky RPC only makes data older, never slower; a failed miss raises to
+    the caller as the uncached fetch did.
+    """
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Dict]],
+        ttl_seconds: float = 15.0,
+        max_stale_seconds: float = 120.0,
+        max_entries: int = 10000,
+        ttl_overrides: Optional[Dict[str, float]] = None
+    ):
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_entries = max_entries
+        self.ttl_overrides: Dict[str, float] = dict(ttl_overrides or {})
+        
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.fetch_seconds = 0.0
+    
+    async def get(self, address: str) -> Dict:
+        now = time.monotonic()
+        entry = self._entries.get(address)
+        
+        if entry is not None and now < entry.expires_at:
+            self.hits += 1
+            self._entries.move_to_end(address)
+            return dict(entry.value)
+        
+        if entry is not None and now < entry.expires_at + self.max_stale_seconds:
+            self.stale += 1
+            self._entries.move_to_end(address)
+            self._refresh(address)
+            return dict(entry.value)
+        
+        self.misses += 1
+        if address in self._inflight:
+            self.coalesced += 1
+        # Shielded: one caller giving up must not cancel the shared fetch
+        return dict(await asyncio.shield(self._refresh(address)))
+    
+    async def get_many(self, addresses: List[str]) -> List[Dict]:
+        return await asyncio.gather(*(self.get(address) for address in addresses))
+    
+    def put(self, address: str, value: Dict) -> None:
+        """
+        Store a value read elsewhere (e.g. one multicall for many pools) as fresh
+        """
+        now = time.monotonic()
+        self._entries[address] = CacheEntry(value, now, now + self.ttl_overrides.get(address, self.ttl_seconds))
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def last_known(self, address: str) -> Optional[Dict]:
+        """
+        Cached value at any age, without a read being counted or a refresh started
+        """
+        entry = self._entries.get(address)
+        return dict(entry.value) if entry is not None else None
+    
+    def set_ttl(self, address: str, ttl_seconds: float) -> None:
+        """
+        Per-pool TTL, e.g. shorter for pools whose APY moves often
+        """
+        self.ttl_overrides[address] = ttl_seconds
+        entry = self._entries.get(address)
+        if entry is not None:
+            entry.expires_at = entry.fetched_at + ttl_seconds
+    
+    def invalidate(self, address: Optional[str] = None) -> None:
+        """
+        Drop one pool (or everything); the next read fetches
+        """
+        if address is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(address, None)
+    
+    def stats(self) -> Dict:
+        reads = self.hits + self.stale + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale) / reads if reads else 0.0,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "inflight": len(self._inflight),
+            "avg_fetch_ms": self.fetch_seconds / self.refreshes * 1000 if self.refreshes else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "max_stale_seconds": self.max_stale_seconds
+        }
+    
+    def _refresh(self, address: str) -> asyncio.Task:
+        task = self._inflight.get(address)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(address))
+            self._inflight[address] = task
+            task.add_done_callback(self._log_failure)
+        return task
+    
+    async def _fetch(self, address: str) -> Dict:
+        started = time.monotonic()
+        try:
+            value = await self.fetch(address)
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        finally:
+            del self._inflight[address]
+            self.refreshes += 1
+            self.fetch_seconds += time.monotonic() - started
+        
+        self.put(address, value)
+        return value
+    
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        # Also retrieves the exception, so an unawaited refresh does not warn at exit
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Pool data refresh failed: {str(task.exception())}")
@@ -0,0 +1,214 @@
+import itertools
+import sys
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+# Globally increasing, so a version identifies one snapshot state across instances
+_versions = itertools.count(1)
+
+class PoolRow:
+    """
+    Read-only view of one snapshot row; attribute-compatible with PoolData
+    """
+    __slots__ = ("_snapshot", "_row")
+    
+    def __init__(self, snapshot: "PoolSnapshot", row: int):
+        self._snapshot = snapshot
+        self._row = row
+    
+    @property
+    def address(self) -> str:
+        return self._snapshot.addresses[self._row]
+    
+    @property
+    def name(self) -> str:
+        return self._snapshot.names[self._row]
+    
+    @property
+    def apy(self) -> float:
+        return float(self._snapshot.apy[self._row])
+    
+    @property
+    def tvl(self) -> float:
+        return float(self._snapshot.tvl[self._row])
+    
+    @property
+    def volume24h(self) -> float:
+        return float(self._snapshot.volume24h[self._row])
+    
+    @property
+    def risk_score(self) -> float:
+        return float(self._snapshot.risk_score[self._row])
+    
+    @property
+    def liquidity_depth(self) -> float:
+        return float(self._snapshot.liquidity_depth[self._row])
+    
+    @property
+    def volatility(self) -> float:
+        return float(self._snapshot.volatility[self._row])
+    
+    def to_dict(self) -> Dict:
+        return self._snapshot.record(self._row)
+    
+    def __repr__(self) -> str:
+        return f"PoolRow({self.address!r}, apy={self.apy}, tvl={self.tvl})"
+
+class PoolSnapshot:
+    """
+    Struct-of-arrays pool set: one float64 column per metric, an
+    address -> row index and a version that changes on every update.
+    Rows are exposed as lightweight PoolRow views instead of per-pool objects.
+    """
+    NUMERIC_FIELDS = ("apy", "tvl", "volume24h", "risk_score", "liquidity_depth", "volatility")
+    OPTIONAL_FIELDS = ("liquidity_depth", "volatility")
+    
+    def __init__(self, addresses: List[str], names: List[str], columns: Dict[str, np.ndarray]):
+        self.addresses = addresses
+        self.names = names
+        for field in self.NUMERIC_FIELDS:
+            column = columns.get(field)
+            if column is None:
+                column = np.zeros(len(addresses), dtype=np.float64)
+            setattr(self, field, np.asarray(column, dtype=np.float64))
+        
+        # Address -> row (last occurrence wins, like a dict built from the list)
+        self.index = {address: row for row, address in enumerate(addresses)}
+        self.version = next(_versions)
+    
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "PoolSnapshot":
+        """
+        Build from pool dicts (the shape returned by the API and MonadClient)
+        """
+        columns = {
+            field: np.fromiter(
+                (record.get(field, 0.0) if field in cls.OPTIONAL_FIELDS else record[field]
+                 for record in records),
+                dtype=np.float64, count=len(records)
+            )
+            for field in cls.NUMERIC_FIELDS
+        }
+        return cls(
+            [record["address"] for record in records],
+            [record["name"] for record in records],
+            columns
+        )
+    
+    @classmethod
+    def from_pools(cls, pools) -> "PoolSnapshot":
+        """
+        Build from PoolData-like objects
+        """
+        if isinstance(pools, PoolSnapshot):
+            return pools.copy()
+        
+        pools = list(pools)
+        columns = {
+            field: np.fromiter((getattr(pool, field) for pool in pools), dtype=np.float64, count=len(pools))
+            for field in cls.NUMERIC_FIELDS
+        }
+        return cls([pool.address for pool in pools], [pool.name for pool in pools], columns)
+    
+    def copy(self) -> "PoolSnapshot":
+        return type(self)(
+            list(self.addresses),
+            list(self.names),
+            {field: getattr(self, field).copy() for field in self.NUMERIC_FIELDS}
+        )
+    
+    def __len__(self) -> int:
+        return len(self.addresses)
+    
+    def __getitem__(self, row: int) -> PoolRow:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return PoolRow(self, row)
+    
+    def __iter__(self) -> Iterator[PoolRow]:
+        return (PoolRow(self, row) for row in range(len(self)))
+    
+    def get(self, address: str) -> Optional[PoolRow]:
+        row = self.index.get(address)
+        return None if row is None else PoolRow(self, row)
+    
+    def record(self, row: int) -> Dict:
+        record = {"address": self.addresses[row], "name": self.names[row]}
+        for field in self.NUMERIC_FIELDS:
+            record[field] = float(getattr(self, field)[row])
+        return record
+    
+    def to_records(self) -> List[Dict]:
+        return [self.record(row) for row in range(len(self))]
+    
+    def same_contents(self, other: "PoolSnapshot") -> bool:
+        """
+        True when both snapshots hold the same pools and values (versions aside)
+        """
+        return (
+            self.addresses == other.addresses
+            and self.names == other.names
+            and all(
+                np.array_equal(getattr(self, field), getattr(other, field), equal_nan=True)
+                for field in self.NUMERIC_FIELDS
+            )
+        )
+    
+    def update_row(self, row: int, pool) -> None:
+        """
+        Overwrite one row from a PoolData-like object and bump the version
+        """
+        self.names[row] = pool.name
+        for field in self.NUMERIC_FIELDS:
+            getattr(self, field)[row] = getattr(pool, field)
+        self.version = next(_versions)
+    
+    def set_column(self, field: str, values) -> None:
+        """
+        Overwrite one numeric column in place and bump the version
+        """
+        getattr(self, field)[:] = values
+        self.version = next(_versions)
+    
+    def append(self, pool) -> int:
+        """
+        Add a pool from a PoolData-like object and return its row
+        """
+        row = len(self.addresses)
+        self.addresses.append(pool.address)
+        self.names.append(pool.name)
+        for field in self.NUMERIC_FIELDS:
+            setattr(self, field, np.append(getattr(self, field), getattr(pool, field)))
+        self.index[pool.address] = row
+        self.version = next(_versions)
+        return row
+    
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Approximate bytes held by the snapshot, in total and per pool
+        """
+        column_bytes = sum(getattr(self, field).nbytes for field in self.NUMERIC_FIELDS)
+        string_bytes = sum(sys.getsizeof(s) for s in self.addresses) + sum(sys.getsizeof(s) for s in self.names)
+        container_bytes = (
+            sys.getsizeof(self.addresses) + sys.getsizeof(self.names) + sys.getsizeof(self.index)
+        )
+        total = column_bytes + string_bytes + container_bytes
+        return {
+            "pools": len(self),
+            "column_bytes": column_bytes,
+            "string_bytes": string_bytes,
+            "container_bytes": container_bytes,
+            "total_bytes": total,
+            "bytes_per_pool": total / len(self) if len(self) else 0.0
+        }
+
+def as_pool_snapshot(pools: Union["PoolSnapshot", List[Dict]]) -> PoolSnapshot:
+    """
+    Accept either a snapshot or a list of pool dicts
+    """
+    if isinstance(pools, PoolSnapshot):
+        return pools
+    return PoolSnapshot.from_records(pools)
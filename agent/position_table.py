@@ -0,0 +1,77 @@
+from typing import Dict, List, Union
+
+import numpy as np
+
+from pool_snapshot import PoolSnapshot, as_pool_snapshot
+
+class PositionTable:
+    """
+    Positions for many users as flat columns, grouped by user in input order.
+    pool_rows points into a PoolSnapshot (-1 when the pool is not in it).
+    """
+    def __init__(
+        self,
+        users: List[str],
+        user_idx: np.ndarray,
+        pool_addresses: List[str],
+        pool_rows: np.ndarray,
+        balances: np.ndarray,
+        values: np.ndarray
+    ):
+        self.users = users
+        self.user_idx = np.asarray(user_idx, dtype=np.int64)
+        self.pool_addresses = pool_addresses
+        self.pool_rows = np.asarray(pool_rows, dtype=np.int64)
+        self.balances = np.asarray(balances, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+    
+    @classmethod
+    def from_positions(
+        cls,
+        pools: Union[PoolSnapshot, List[Dict]],
+        positions_by_user: Dict[str, List[Dict]]
+    ) -> "PositionTable":
+        """
+        Flatten {user: [{pool_address, balance, value_usd}, ...]} against a snapshot
+        """
+        index = as_pool_snapshot(pools).index
+        users = list(positions_by_user.keys())
+        user_idx, addresses, rows, balances, values = [], [], [], [], []
+        for idx, user in enumerate(users):
+            for pos in positions_by_user[user]:
+                user_idx.append(idx)
+                addresses.append(pos["pool_address"])
+                rows.append(index.get(pos["pool_address"], -1))
+                balances.append(pos["balance"])
+                values.append(pos["value_usd"])
+        
+        return cls(users, user_idx, addresses, rows, balances, values)
+    
+    def __len__(self) -> int:
+        return len(self.pool_addresses)
+    
+    def user_slices(self) -> np.ndarray:
+        """
+        Start offsets per user (length users + 1) into the flat columns
+        """
+        counts = np.bincount(self.user_idx, minlength=len(self.users))
+        return np.concatenate(([0], np.cumsum(counts)))
+    
+    def positions_by_user(self) -> Dict[str, List[Dict]]:
+        """
+        Back to the per-user dict shape the optimizer methods accept
+        """
+        offsets = self.user_slices().tolist()
+        balances = self.balances.tolist()
+        values = self.values.tolist()
+        return {
+            user: [
+                {
+                    "pool_address": self.pool_addresses[i],
+                    "balance": balances[i],
+                    "value_usd": values[i]
+                }
+                for i in range(offsets[idx], offsets[idx + 1])
+            ]
+            for idx, user in enumerate(self.users)
+        }
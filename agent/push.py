@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PushEvent:
+    id: int
+    event: str
+    key: Optional[str]
+    payload: str                        # JSON, kept to detect unchanged state
+    frame: bytes                        # Encoded once, shared by every subscriber
+    expires_at: Optional[float] = None  # time.monotonic(); only for retained events
+
+class SubscriberLimitError(Exception):
+    pass
+
+class Subscription:
+    """
+    One open stream for one user address: a bounded buffer the hub writes
+    into and the connection drains as fast as the client reads.
+    
+    Keyed events (the latest recommendations, a pending approval for a
+    pool pair) replace an undelivered event with the same key, so a slow
+    client skips stale states instead of queueing them. Unkeyed events are
+    appended; when the buffer is full the oldest is dropped, and a
+    subscriber that drops more than max_dropped events in a row is closed
+    so it reconnects and resyncs from the retained state.
+    """
+    def __init__(self, address: str, max_buffer: int, max_dropped: int):
+        self.address = address
+        self.max_buffer = max_buffer
+        self.max_dropped = max_dropped
+        self.connected_at = time.time()
+        self.closed = False
+        
+        self._buffer: "OrderedDict[object, PushEvent]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        
+        self.delivered = 0
+        self.conflated = 0
+        self.dropped = 0
+        self._dropped_since_drain = 0
+    
+    def offer(self, event: PushEvent) -> None:
+        if self.closed:
+            return
+        
+        slot = event.key if event.key is not None else ("#", event.id)
+        if slot in self._buffer:
+            del self._buffer[slot]
+            self.conflated += 1
+        elif len(self._buffer) >= self.max_buffer:
+            self._buffer.popitem(last=False)
+            self.dropped += 1
+            self._dropped_since_drain += 1
+            if self._dropped_since_drain > self.max_dropped:
+                self.close()
+                return
+        self._buffer[slot] = event
+        self._wakeup.set()
+    
+    async def next_batch(self, timeout: float) -> List[PushEvent]:
+        """
+        Everything buffered, waiting up to timeout; [] means send a heartbeat
+        """
+        if not self._buffer and not self.closed:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        
+        batch = list(self._buffer.values())
+        self._buffer.clear()
+        self._dropped_since_drain = 0
+        self.delivered += len(batch)
+        return batch
+    
+    def close(self) -> None:
+        self.closed = True
+        self._wakeup.set()
+    
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+class PushHub:
+    """
+    Fan-out of per-user events to Server-Sent Events streams.
+    
+    publish() encodes an event once and offers it to every open
+    subscription of the address, never waiting on a connection. Keyed
+    events are also retained per address (the last value per key, with an
+    optional TTL) and replayed to new subscribers, so a dashboard gets the
+    current recommendations and pending approvals on connect without a
+    separate fetch. Publishing a keyed event identical to the retained
+    one is a no-op.
+    """
+    def __init__(
+        self,
+        buffer_size: int = 64,
+        max_dropped: int = 256,
+        max_subscribers: int = 10000,
+        retained_addresses: int = 10000,
+        heartbeat_seconds: float = 15.0
+    ):
+        self.buffer_size = buffer_size
+        self.max_dropped = max_dropped
+        self.max_subscribers = max_subscribers
+        self.retained_addresses = retained_addresses
+        self.heartbeat_seconds = heartbeat_seconds
+        
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._retained: "OrderedDict[str, Dict[str, PushEvent]]" = OrderedDict()
+        self._sequence = itertools.count(1)
+        self._subscriber_count = 0
+        
+        self.published = 0
+        self.unchanged = 0
+        self.offered = 0
+        self.slow_disconnects = 0
+        self.connections = 0
+    
+    def subscribe(self, address: str) -> Subscription:
+        if self.subscriber_count() >= self.max_subscribers:
+            raise SubscriberLimitError(f"{self.max_subscribers} streams already open")
+        
+        address = address.lower()
+        subscription = Subscription(address, self.buffer_size, self.max_dropped)
+        self._subscribers.setdefault(address, set()).add(subscription)
+        self._subscriber_count += 1
+        self.connections += 1
+        for event in self._live_retained(address):
+            subscription.offer(event)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.address)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.remove(subscription)
+            self._subscriber_count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.address]
+            if subscription.closed:
+                self.slow_disconnects += 1  # Closed by offer() for falling behind
+        subscription.close()
+    
+    def publish(
+        self,
+        address: str,
+        event: str,
+        data: Dict,
+        key: Optional[str] = None,
+        ttl: Optional[float] = None
+    ) -> int:
+        """
+        Send one event to the address's streams; returns how many got it
+        """
+        address = address.lower()
+        payload = json.dumps(data, separators=(",", ":"))
+        
+        if key is not None:
+            retained = self._retained.get(address)
+            previous = retained.get(key) if retained else None
+            if previous is not None and previous.payload == payload:
+                self.unchanged += 1
+                return 0
+        
+        event_id = next(self._sequence)
+        push_event = PushEvent(
+            id=event_id,
+            event=event,
+            key=key,
+            payload=payload,
+            frame=f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode(),
+            expires_at=time.monotonic() + ttl if ttl is not None else None
+        )
+        
+        if key is not None:
+            self._retain(address, push_event)
+        
+        subscribers = self._subscribers.get(address, ())
+        for subscription in subscribers:
+            subscription.offer(push_event)
+        self.published += 1
+        self.offered += len(subscribers)
+        return len(subscribers)
+    
+    def has_retained(self, address: str, key: str) -> bool:
+        return key in self._retained.get(address.lower(), {})
+    
+    def addresses(self) -> List[str]:
+        """
+        Addresses with at least one open stream
+        """
+        return list(self._subscribers)
+    
+    def subscriber_count(self) -> int:
+        return self._subscriber_count
+    
+    async def stream(self, subscription: Subscription) -> AsyncIterator[bytes]:
+        """
+        SSE body for one subscription; unsubscribes when the client goes away
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            while not subscription.closed:
+                batch = await subscription.next_batch(self.heartbeat_seconds)
+                if batch:
+                    yield b"".join(event.frame for event in batch)
+                elif not subscription.closed:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+    
+    def stats(self) -> Dict:
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "subscribers": len(subscriptions),
+            "addresses": len(self._subscribers),
+            "connections": self.connections,
+            "published": self.published,
+            "unchanged": self.unchanged,
+            "offered": self.offered,
+            "delivered": sum(s.delivered for s in subscriptions),
+            "conflated": sum(s.conflated for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+            "buffered": sum(s.buffered for s in subscriptions),
+            "slow_disconnects": self.slow_disconnects,
+            "retained_addresses": len(self._retained),
+            "buffer_size": self.buffer_size
+        }
+    
+    def _retain(self, address: str, event: PushEvent) -> None:
+        retained = self._retained.get(address)
+        if retained is None:
+            retained = self._retained[address] = {}
+            if len(self._retained) > self.retained_addresses:
+                self._retained.popitem(last=False)
+        else:
+            self._retained.move_to_end(address)
+        retained[event.key] = event
+    
+    def _live_retained(self, address: str) -> List[PushEvent]:
+        retained = self._retained.get(address)
+        if not retained:
+            return []
+        now = time.monotonic()
+        for key in [key for key, event in retained.items() if event.expires_at is not None and event.expires_at <= now]:
+            del retained[key]
+        return sorted(retained.values(), key=lambda event: event.id)
+
+# Shared instance behind the /stream endpoint
+push_hub = PushHub()
@@ -0,0 +1,326 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import coo_matrix
+
+from ai_engine import PoolArrays, RebalanceAction, UserPosition, YieldOptimizer
+from pool_snapshot import PoolSnapshot, as_pool_snapshot
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PlannedMove:
+    action: RebalanceAction
+    value_usd: float
+    expected_gain: float  # USD over the planner's gain horizon
+
+@dataclass
+class RebalancePlan:
+    moves: List[PlannedMove] = field(default_factory=list)
+    status: str = "no_candidates"
+    candidate_edges: int = 0
+    rounds: int = 0
+    solve_ms: float = 0.0
+    
+    @property
+    def total_amount(self) -> float:
+        return sum(move.action.amount for move in self.moves)
+    
+    @property
+    def total_value_usd(self) -> float:
+        return sum(move.value_usd for move in self.moves)
+    
+    @property
+    def expected_gain(self) -> float:
+        return sum(move.expected_gain for move in self.moves)
+    
+    def actions(self) -> List[RebalanceAction]:
+        return [move.action for move in self.moves]
+    
+    def to_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "moves": [
+                {
+                    "from_pool": move.action.from_pool,
+                    "to_pool": move.action.to_pool,
+                    "amount": move.action.amount,
+                    "value_usd": move.value_usd,
+                    "expected_gain": move.expected_gain,
+                    "confidence": move.action.confidence,
+                    "expected_apy_improvement": move.action.expected_apy_improvement,
+                    "risk_adjustment": move.action.risk_adjustment,
+                    "rationale": move.action.rationale
+                }
+                for move in self.moves
+            ],
+            "total_amount": self.total_amount,
+            "total_value_usd": self.total_value_usd,
+            "expected_gain": self.expected_gain,
+            "candidate_edges": self.candidate_edges,
+            "rounds": self.rounds,
+            "solve_ms": self.solve_ms
+        }
+
+class RebalancePlanner:
+    """
+    Every move for a user's portfolio at once, as a transportation problem:
+        
+        maximize  sum_ij x_ij * gain_ij          (USD moved from position i to pool j)
+        s.t.      sum_j x_ij <= movable_i        (share of each position that may move)
+                  sum_i x_ij <= capacity_j       (concentration and pool-depth caps)
+                  sum_ij x_ij * units_i <= max_amount   (delegation budget, token units)
+    
+    Edges only exist for pairs the optimizer would accept on their own
+    (min APY improvement, max risk increase). Gas is a fixed cost per move,
+    which a linear program cannot express, so edges that cannot reach the
+    optimizer's gas_cost_threshold are dropped up front, and moves the
+    solution leaves below it are removed before re-solving. Basic LP
+    solutions keep the number of moves small.
+    """
+    def __init__(
+        self,
+        optimizer: YieldOptimizer,
+        gain_horizon_days: float = 30.0,
+        max_move_fraction: float = 0.9,  # Same ceiling as _calculate_optimal_amount
+        max_pool_weight: float = 0.4,    # Per-pool share of the portfolio after the moves
+        max_tvl_share: float = 0.01,     # Per-pool share of the target's TVL
+        max_rounds: int = 8
+    ):
+        self.optimizer = optimizer
+        self.gain_horizon_days = gain_horizon_days
+        self.max_move_fraction = max_move_fraction
+        self.max_pool_weight = max_pool_weight
+        self.max_tvl_share = max_tvl_share
+        self.max_rounds = max_rounds
+    
+    def plan(
+        self,
+        pools_data: Union[PoolSnapshot, List[Dict]],
+        user_positions: List[Dict],
+        max_amount: Optional[float] = None,
+        allowed_pools: Optional[Iterable[str]] = None,
+        max_risk_increase: Optional[float] = None,
+        min_confidence: Optional[float] = None
+    ) -> RebalancePlan:
+        """
+        Plan moves for one user. max_amount is the delegation's remaining
+        amount (token units, like RebalanceAction.amount); allowed_pools and
+        max_risk_increase can only tighten the optimizer's own limits.
+        """
+        started = time.perf_counter()
+        pools = PoolArrays(as_pool_snapshot(pools_data))
+        positions = [UserPosition(**pos) for pos in user_positions]
+        optimizer = self.optimizer
+        
+        risk_limit = optimizer.max_risk_increase
+        if max_risk_increase is not None:
+            risk_limit = min(risk_limit, max_risk_increase)
+        
+        allowed = np.ones(len(pools), dtype=bool)
+        if allowed_pools is not None:
+            allowed[:] = False
+            for address in allowed_pools:
+                row = pools.index.get(address)
+                if row is not None:
+                    allowed[row] = True
+        
+        # Room left in each target pool
+        total_value = sum(position.value_usd for position in positions)
+        holdings = np.zeros(len(pools))
+        for position in positions:
+            row = pools.index.get(position.pool_address)
+            if row is not None:
+                holdings[row] += position.value_usd
+        capacity = np.maximum(0.0, self.max_pool_weight * total_value - holdings)
+        capacity = np.minimum(capacity, self.max_tvl_share * np.nan_to_num(pools.tvl))
+        
+        sources = [
+            (idx, pools.index[position.pool_address])
+            for idx, position in enumerate(positions)
+            if position.balance > 0 and position.value_usd > 0
+            and position.pool_address in pools.index and allowed[pools.index[position.pool_address]]
+        ]
+        
+        # Candidate edges: (source, target row, gain per USD, confidence)
+        horizon = self.gain_horizon_days / 365
+        edge_source, edge_target, edge_gain, edge_confidence = [], [], [], []
+        for source, (position_idx, from_row) in enumerate(sources):
+            position = positions[position_idx]
+            targets = optimizer._eligible_targets(pools, from_row)
+            targets = targets[allowed[targets] & (capacity[targets] > 0)]
+            if not len(targets):
+                continue
+            
+            confidence = optimizer._score_pairs(
+                pools, np.array([from_row]), np.array([position.value_usd]), targets
+            )[0]
+            gain = (pools.apy[targets] - pools.apy[from_row]) / 100 * horizon
+            best_case = gain * np.minimum(capacity[targets], position.value_usd * self.max_move_fraction)
+            keep = (
+                np.isfinite(confidence)
+                & (pools.risk_score[targets] - pools.risk_score[from_row] <= risk_limit)
+                & (best_case >= optimizer.gas_cost_threshold)
+            )
+            if min_confidence is not None:
+                keep &= confidence >= min_confidence
+            
+            # Best targets first, for the pruning in _edge_prefix
+            kept = np.flatnonzero(keep)
+            kept = kept[np.argsort(-gain[kept], kind='stable')]
+            edge_source.extend([source] * len(kept))
+            edge_target.extend(targets[kept].tolist())
+            edge_gain.extend(gain[kept].tolist())
+            edge_confidence.extend(confidence[kept].tolist())
+        
+        plan = RebalancePlan(candidate_edges=len(edge_source))
+        if max_amount is not None and max_amount <= 0:
+            plan.status = "no_budget"
+        if not edge_source or plan.status == "no_budget":
+            plan.solve_ms = (time.perf_counter() - started) * 1000
+            return plan
+        
+        edge_source = np.array(edge_source, dtype=np.int64)
+        edge_target = np.array(edge_target, dtype=np.int64)
+        edge_gain = np.array(edge_gain)
+        edge_confidence = np.array(edge_confidence)
+        
+        source_value = np.array([positions[idx].value_usd for idx, _ in sources])
+        source_units = np.array([positions[idx].balance / positions[idx].value_usd for idx, _ in sources])
+        source_limit = source_value * self.max_move_fraction
+        
+        # Most USD that can move at all, which bounds the flow into any target set
+        movable = float(source_limit.sum())
+        if max_amount is not None:
+            movable = min(movable, max_amount / float(source_units.min()))
+        edge_capacity = capacity[edge_target]
+        
+        active = np.ones(len(edge_source), dtype=bool)
+        flows = np.zeros(len(edge_source))
+        plan.status = "optimal"
+        for round_number in range(1, self.max_rounds + 1):
+            plan.rounds = round_number
+            edges = self._edge_prefix(edge_source, edge_capacity, active, movable)
+            result = self._solve(
+                edge_source[edges], edge_target[edges], edge_gain[edges],
+                source_limit, source_units, capacity, max_amount
+            )
+            if result is None:
+                plan.status = "solver_failed"
+                flows[:] = 0
+                break
+            
+            flows[:] = 0
+            flows[edges] = result
+            
+            # Moves too small to cover gas: drop their edges and re-route
+            moved = flows > 1e-6
+            below_gas = moved & (flows * edge_gain < optimizer.gas_cost_threshold)
+            if not below_gas.any():
+                break
+            active &= ~below_gas
+            if not active.any():
+                flows[:] = 0
+                break
+        
+        moved = (flows > 1e-6) & (flows * edge_gain >= optimizer.gas_cost_threshold)
+        for edge in np.flatnonzero(moved)[np.argsort(-(flows * edge_gain)[moved], kind='stable')].tolist():
+            position_idx, from_row = sources[edge_source[edge]]
+            to_row = int(edge_target[edge])
+            position = positions[position_idx]
+            from_pool, to_pool = pools[from_row], pools[to_row]
+            
+            value = float(flows[edge])
+            amount = position.balance * value / position.value_usd
+            apy_improvement = to_pool.apy - from_pool.apy
+            risk_increase = to_pool.risk_score - from_pool.risk_score
+            
+            action = RebalanceAction(
+                from_pool=from_pool.address,
+                to_pool=to_pool.address,
+                amount=amount,
+                confidence=float(edge_confidence[edge]),
+                expected_apy_improvement=apy_improvement,
+                risk_adjustment=risk_increase,
+                _rationale_inputs=optimizer._defer_rationale(from_pool, to_pool, apy_improvement, risk_increase, amount)
+            )
+            plan.moves.append(PlannedMove(action, value, value * float(edge_gain[edge])))
+        
+        plan.solve_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"🧭 Planned {len(plan.moves)} moves from {plan.candidate_edges} candidate edges "
+            f"in {plan.rounds} rounds ({plan.solve_ms:.1f} ms), expected gain ${plan.expected_gain:,.2f}"
+        )
+        return plan
+    
+    @staticmethod
+    def _edge_prefix(
+        edge_source: np.ndarray,
+        edge_capacity: np.ndarray,
+        active: np.ndarray,
+        total_flow: float
+    ) -> np.ndarray:
+        """
+        Active edges of each source, best target first, until their targets
+        could absorb total_flow. Gain is target APY minus source APY, so any
+        flow sent further down a source's list could be moved to a target in
+        this prefix that still has room without losing gain: the LP optimum
+        is unchanged while the problem shrinks to a few targets per source.
+        """
+        edges = np.flatnonzero(active)
+        sources = edge_source[edges]
+        capacity = np.cumsum(edge_capacity[edges])
+        
+        # Capacity of the source's earlier edges (edges are grouped by source)
+        starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+        group_offset = np.repeat(capacity[starts] - edge_capacity[edges][starts], np.diff(np.r_[starts, len(edges)]))
+        before = capacity - edge_capacity[edges] - group_offset
+        
+        return edges[before < total_flow]
+    
+    def _solve(
+        self,
+        edge_source: np.ndarray,
+        edge_target: np.ndarray,
+        edge_gain: np.ndarray,
+        source_limit: np.ndarray,
+        source_units: np.ndarray,
+        capacity: np.ndarray,
+        max_amount: Optional[float]
+    ) -> Optional[np.ndarray]:
+        """
+        Flow per edge (USD) from the LP, or None if the solver fails
+        """
+        n_edges = len(edge_source)
+        n_sources = len(source_limit)
+        target_rows, target_idx = np.unique(edge_target, return_inverse=True)
+        columns = np.arange(n_edges)
+        
+        rows = [edge_source, n_sources + target_idx]
+        values = [np.ones(n_edges), np.ones(n_edges)]
+        bounds = [source_limit, capacity[target_rows]]
+        if max_amount is not None:
+            rows.append(np.full(n_edges, n_sources + len(target_rows)))
+            values.append(source_units[edge_source])
+            bounds.append([max_amount])
+        
+        constraints = coo_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.tile(columns, len(rows)))),
+            shape=(n_sources + len(target_rows) + (max_amount is not None), n_edges)
+        ).tocsr()
+        
+        result = linprog(
+            -edge_gain,
+            A_ub=constraints,
+            b_ub=np.concatenate(bounds),
+            bounds=(0, None),
+            method="highs"
+        )
+        if result.status != 0:
+            logger.error(f"Rebalance planner LP failed: {result.message}")
+            return None
+        return result.x
@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from http_client import HttpClient, http_client
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = metrics.histogram(
+    "agent_rpc_batch_size",
+    "JSON-RPC calls per batched HTTP request",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+RPC_CALLS = metrics.counter("agent_rpc_calls_total", "JSON-RPC calls by method and outcome", ("method", "outcome"))
+
+class RpcError(Exception):
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+class JsonRpcBatcher:
+    """
+    Gathers JSON-RPC calls from concurrent callers and sends them as one
+    array payload: a batch goes out window_seconds after its first call,
+    or as soon as it reaches max_batch_size. Responses are routed back to
+    each caller by id; an error for one call only fails that call.
+    
+    Batches only carry reads (eth_call, eth_blockNumber...), so the whole
+    POST is retried like an idempotent request.
+    """
+    def __init__(
+        self,
+        url: str,
+        client: HttpClient = http_client,
+        window_seconds: float = 0.002,
+        max_batch_size: int = 100
+    ):
+        self.url = url
+        self.client = client
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        
+        self._ids = itertools.count(1)
+        self._pending: List[Tuple[int, str, List, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: set = set()
+        
+        self.calls = 0
+        self.batches = 0
+        self.errors = 0
+        self.failed_batches = 0
+    
+    async def call(self, method: str, params: Optional[List] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((next(self._ids), method, params or [], future))
+        self.calls += 1
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+    
+    async def eth_call(self, to: str, data: str, block: str = "latest") -> str:
+        return await self.call("eth_call", [{"to": to, "data": data}, block])
+    
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "avg_batch_size": self.calls / self.batches if self.batches else 0.0,
+            "errors": self.errors,
+            "failed_batches": self.failed_batches,
+            "pending": len(self._pending),
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size
+        }
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            # Callers that gave up (deadline) are not sent
+            batch = [call for call in batch if not call[3].done()]
+            if batch:
+                task = asyncio.get_running_loop().create_task(self._send(batch))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+    
+    async def _send(self, batch: List[Tuple[int, str, List, asyncio.Future]]) -> None:
+        payload = [
+            {"jsonrpc": "2.0", "id": call_id, "method": method, "params": params}
+            for call_id, method, params, _ in batch
+        ]
+        self.batches += 1
+        BATCH_SIZE.observe(len(batch))
+        
+        try:
+            response = await self.client.post(self.url, json=payload, idempotent=True)
+            if not response.ok:
+                raise RpcError(f"HTTP {response.status}")
+            if not isinstance(response.data, list):
+                # Whole-batch error object, or a server without batch support
+                error = (response.data or {}).get("error", {}) if isinstance(response.data, dict) else {}
+                raise RpcError(error.get("message", "Batch request rejected"), error.get("code"))
+        except Exception as e:
+            self.failed_batches += 1
+            logger.warning(f"JSON-RPC batch of {len(batch)} failed: {str(e) or type(e).__name__}")
+            for _, method, _, future in batch:
+                RPC_CALLS.inc(method=method, outcome="failed")
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        results = {item.get("id"): item for item in response.data if isinstance(item, dict)}
+        for call_id, method, _, future in batch:
+            item = results.get(call_id)
+            if item is None:
+                outcome, error = "error", RpcError(f"No response for {method} (id {call_id})")
+            elif "error" in item:
+                outcome, error = "error", RpcError(item["error"].get("message", "RPC error"), item["error"].get("code"))
+            else:
+                outcome, error = "ok", None
+            
+            RPC_CALLS.inc(method=method, outcome=outcome)
+            if future.done():
+                continue
+            if error is not None:
+                self.errors += 1
+                future.set_exception(error)
+            else:
+                future.set_result(item.get("result"))
@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Monad JSON-RPC endpoint.
+
+Answers eth_chainId, eth_blockNumber and eth_call for the pool ABI
+(getReserves, totalSupply, balanceOf) with deterministic values per pool
+and account, plus Multicall3 aggregate3 over those calls, for single and
+batched requests, with optional added latency. Pools listed with
+--failing revert, to exercise allowFailure; pools listed with --codeless
+answer every call with empty data, like an address without a contract.
+With --shuffle, batch responses come back in random order, as the JSON-RPC
+spec allows. Point the agent at it to exercise the RPC read paths without
+a node:
+
+    python rpc_stub.py --port 8545 --latency-ms 50
+    MONAD_RPC_URL=http://localhost:8545 POOL_DATA_SOURCE=multicall python main.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from aiohttp import web
+
+from abi import (
+    MULTICALL3_ADDRESS, POOL_ABI, decode_aggregate3_calls, decode_values,
+    encode_aggregate3_result, encode_output, function_signature, selector
+)
+
+CHAIN_ID = 41454  # Monad Testnet
+
+class StubRpcServer:
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        block_time: float = 1.0,
+        failing_pools: Iterable[str] = (),
+        codeless_pools: Iterable[str] = (),
+        shuffle_responses: bool = False
+    ):
+        self.latency_seconds = latency_seconds
+        self.block_time = block_time
+        self.failing_pools = {address.lower() for address in failing_pools}
+        self.codeless_pools = {address.lower() for address in codeless_pools}
+        self.shuffle_responses = shuffle_responses
+        self.started = time.time()
+        self.http_requests = 0
+        self.calls = 0
+        self.largest_batch = 0
+        self.multicalls = 0
+        self._runner: Optional[web.AppRunner] = None
+        
+        self._functions = {
+            selector(function_signature(entry)).hex(): entry["name"]
+            for entry in POOL_ABI
+        }
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 ** 2)  # Multicall batches are large
+        app.router.add_post("/", self.handle)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+    
+    async def start(self, port: int = 8545) -> None:
+        """
+        Serve from the current event loop (for scripts and tests)
+        """
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+    
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        body = await request.json()
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        
+        if isinstance(body, list):
+            self.largest_batch = max(self.largest_batch, len(body))
+            answers = [self._answer(call) for call in body]
+            if self.shuffle_responses:
+                random.shuffle(answers)
+            return web.json_response(answers)
+        return web.json_response(self._answer(body))
+    
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "http_requests": self.http_requests,
+            "calls": self.calls,
+            "largest_batch": self.largest_batch,
+            "multicalls": self.multicalls
+        })
+    
+    def block_number(self) -> int:
+        return 1_000_000 + int((time.time() - self.started) / self.block_time)
+    
+    def _answer(self, call: Dict) -> Dict:
+        self.calls += 1
+        try:
+            result = self._dispatch(call.get("method"), call.get("params") or [])
+            return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+        except LookupError as e:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": str(e)}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32000, "message": str(e)}}
+    
+    def _dispatch(self, method: Optional[str], params: list) -> Any:
+        if method == "eth_chainId":
+            return hex(CHAIN_ID)
+        if method == "eth_blockNumber":
+            return hex(self.block_number())
+        if method == "eth_call":
+            return self._eth_call(params[0]["to"], params[0]["data"])
+        raise LookupError(f"Method {method} not supported")
+    
+    def _eth_call(self, to: str, data: str) -> str:
+        if to.lower() == MULTICALL3_ADDRESS.lower():
+            return self._aggregate3(data)
+        return self._call_pool(to, data)
+    
+    def _aggregate3(self, data: str) -> str:
+        self.multicalls += 1
+        results = []
+        for target, allow_failure, calldata in decode_aggregate3_calls(data):
+            try:
+                results.append((True, bytes.fromhex(self._call_pool(target, calldata)[2:])))
+            except ValueError:
+                if not allow_failure:
+                    raise ValueError("Multicall3: call failed")
+                results.append((False, b""))
+        return encode_aggregate3_result(results)
+    
+    def _call_pool(self, to: str, data: str) -> str:
+        if to.lower() in self.codeless_pools:
+            return "0x"
+        name = self._functions.get(data[2:10])
+        if name is None or to.lower() in self.failing_pools:
+            raise ValueError("execution reverted")
+        
+        # Stable per-pool values so repeated reads agree
+        seed = _seed(to)
+        reserve0 = (50 + seed % 5000) * 10 ** 18
+        reserve1 = (50 + (seed >> 16) % 5000) * 10 ** 18
+        if name == "getReserves":
+            return encode_output(POOL_ABI, name, reserve0, reserve1, int(time.time()) % 2 ** 32)
+        if name == "balanceOf":
+            account, = decode_values(["address"], bytes.fromhex(data[10:]))
+            return encode_output(POOL_ABI, name, _seed(to + account) % (2 * 10 ** 18))
+        return encode_output(POOL_ABI, name, (reserve0 + reserve1) // 2)
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.lower().encode()).digest()[:8], "big")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Monad JSON-RPC server")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failing", nargs="*", default=[], help="Pool addresses whose calls revert")
+    parser.add_argument("--codeless", nargs="*", default=[], help="Pool addresses without contract code")
+    parser.add_argument("--shuffle", action="store_true", help="Answer batches in random order")
+    args = parser.parse_args()
+    
+    server = StubRpcServer(
+        args.latency_ms / 1000,
+        failing_pools=args.failing,
+        codeless_pools=args.codeless,
+        shuffle_responses=args.shuffle
+    )
+    web.run_app(server.app(), host="127.0.0.1", port=args.port)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Grid search over YieldOptimizer thresholds on a replay of recorded pool events.
+
+    python sweep.py events.csv --wallets wallets.json --pools pools.json \\
+        --grid '{"min_apy_improvement": [0.25, 0.5, 1.0], "max_risk_increase": [0.1, 0.2]}' \\
+        --output sweep.csv
+
+The event log is decoded once into a shared-memory block that every worker
+maps directly, so tasks only carry their parameter dict.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from backtest import BacktestConfig, BacktestEngine, PoolEvent, read_pool_events
+
+logger = logging.getLogger(__name__)
+
+SWEEP_PARAMETERS = ("confidence_threshold", "min_apy_improvement", "max_risk_increase", "gas_cost_threshold")
+
+DEFAULT_GRID = {
+    "confidence_threshold": [0.7, 0.8, 0.9],
+    "min_apy_improvement": [0.25, 0.5, 1.0],
+    "max_risk_increase": [0.1, 0.2, 0.3],
+    "gas_cost_threshold": [10, 50]
+}
+
+class SharedEventLog:
+    """
+    Pool events as float64 columns in one shared-memory block:
+    pool row, old APY, new APY, TVL, timestamp (NaN for missing values).
+    """
+    COLUMNS = ("pool_rows", "old_apy", "new_apy", "tvl", "timestamps")
+    
+    def __init__(self, shm: shared_memory.SharedMemory, length: int, addresses: List[str], owner: bool):
+        self.shm = shm
+        self.length = length
+        self.addresses = addresses
+        self.owner = owner
+        self.data = np.ndarray((len(self.COLUMNS), length), dtype=np.float64, buffer=shm.buf)
+    
+    @classmethod
+    def create(cls, events: Iterable[PoolEvent]) -> "SharedEventLog":
+        addresses: List[str] = []
+        rows: Dict[str, int] = {}
+        columns = [[] for _ in cls.COLUMNS]
+        for event in events:
+            row = rows.get(event.pool_address)
+            if row is None:
+                row = rows[event.pool_address] = len(addresses)
+                addresses.append(event.pool_address)
+            values = (row, event.old_apy, event.new_apy, event.tvl, event.timestamp)
+            for column, value in zip(columns, values):
+                column.append(np.nan if value is None else value)
+        
+        length = len(columns[0])
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(cls.COLUMNS) * length * 8))
+        log = cls(shm, length, addresses, owner=True)
+        log.data[:] = np.array(columns, dtype=np.float64).reshape(len(cls.COLUMNS), length)
+        return log
+    
+    def descriptor(self) -> Dict:
+        """
+        What a worker needs to attach (the block name, not its contents)
+        """
+        return {"name": self.shm.name, "length": self.length, "addresses": self.addresses}
+    
+    @classmethod
+    def attach(cls, descriptor: Dict) -> "SharedEventLog":
+        shm = shared_memory.SharedMemory(name=descriptor["name"])
+        return cls(shm, descriptor["length"], descriptor["addresses"], owner=False)
+    
+    def events(self) -> Iterator[PoolEvent]:
+        columns = [self.data[i].tolist() for i in range(len(self.COLUMNS))]
+        for row, old_apy, new_apy, tvl, timestamp in zip(*columns):
+            yield PoolEvent(
+                pool_address=self.addresses[int(row)],
+                event_type="",
+                old_apy=None if old_apy != old_apy else old_apy,  # NaN check
+                new_apy=None if new_apy != new_apy else new_apy,
+                tvl=None if tvl != tvl else tvl,
+                block_number=None,
+                timestamp=timestamp
+            )
+    
+    def close(self) -> None:
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# Per-worker state, set once by the pool initializer
+_worker_state: Dict = {}
+
+def _init_worker(descriptor: Dict, pools: List[Dict], wallets: Dict[str, List[Dict]], config: BacktestConfig):
+    _worker_state["log"] = SharedEventLog.attach(descriptor)
+    _worker_state["pools"] = pools
+    _worker_state["wallets"] = wallets
+    _worker_state["config"] = config
+
+def _evaluate(params: Dict[str, float]) -> Dict:
+    config = replace(_worker_state["config"], optimizer_params=params)
+    engine = BacktestEngine(_worker_state["pools"], _worker_state["wallets"], config)
+    report = engine.run(_worker_state["log"].events())
+    
+    results = report["results"]
+    initial_value = sum(r["initial_value"] for r in results)
+    earnings = sum(r["earnings_usd"] for r in results)
+    gas = sum(r["gas_usd"] for r in results)
+    return {
+        **params,
+        "net_usd": earnings - gas,
+        "return_pct": (earnings - gas) / initial_value * 100 if initial_value else 0.0,
+        "earnings_usd": earnings,
+        "gas_usd": gas,
+        "rebalances": sum(r["rebalances"] for r in results),
+        "skipped_for_gas": sum(r["skipped_for_gas"] for r in results),
+        "events_per_second": report["events_per_second"]
+    }
+
+def expand_grid(grid: Dict[str, List[float]]) -> List[Dict[str, float]]:
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def run_sweep(
+    events: Iterable[PoolEvent],
+    pools: List[Dict],
+    wallets: Dict[str, List[Dict]],
+    grid: Dict[str, List[float]],
+    config: Optional[BacktestConfig] = None,
+    workers: int = 1
+) -> List[Dict]:
+    """
+    Evaluate every parameter combination and return rows ranked by net USD
+    """
+    combinations = expand_grid(grid)
+    config = config or BacktestConfig()
+    log = SharedEventLog.create(events)
+    try:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            initializer=_init_worker,
+            initargs=(log.descriptor(), pools, wallets, config)
+        ) as executor:
+            rows = list(executor.map(_evaluate, combinations))
+        elapsed = time.perf_counter() - started
+    finally:
+        log.close()
+    
+    logger.info(
+        f"🧪 Evaluated {len(combinations)} combinations over {log.length} events "
+        f"on {workers} workers in {elapsed:.1f}s"
+    )
+    
+    rows.sort(key=lambda row: row["net_usd"], reverse=True)
+    for rank, row in enumerate(rows, 1):
+        row["rank"] = rank
+    return rows
+
+def write_table(path: str, rows: List[Dict]) -> None:
+    fields = ["rank"] + [name for name in rows[0] if name != "rank"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel threshold sweep over recorded pool events")
+    parser.add_argument("events", help="pool_events export (.csv or .jsonl), in time order")
+    parser.add_argument("--wallets", required=True, help="JSON {wallet: [{pool_address, balance, value_usd}]}")
+    parser.add_argument("--pools", help="JSON list of pool metadata")
+    parser.add_argument("--grid", help="JSON {parameter: [values]}; defaults to a small grid")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--gas-cost", type=float, default=5.0)
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--top", type=int, default=10, help="Rows to print")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    with open(args.wallets) as f:
+        wallets = json.load(f)
+    pools = []
+    if args.pools:
+        with open(args.pools) as f:
+            pools = json.load(f)
+    grid = json.loads(args.grid) if args.grid else DEFAULT_GRID
+    
+    rows = run_sweep(
+        read_pool_events(args.events), pools, wallets, grid,
+        BacktestConfig(gas_cost_usd=args.gas_cost), args.workers
+    )
+    write_table(args.output, rows)
+    
+    for row in rows[:args.top]:
+        params = ", ".join(f"{name}={row[name]}" for name in grid)
+        print(f"#{row['rank']:<3} net ${row['net_usd']:>12,.2f}  {row['rebalances']:>6} rebalances  {params}")
+
+if __name__ == "__main__":
+    main()
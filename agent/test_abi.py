@@ -0,0 +1,31 @@
+import pytest
+
+from abi import AGGREGATE3_SIGNATURE, POOL_ABI, find_function, function_signature, keccak256, selector
+
+# Reference digests of b"a" * length (pycryptodome's keccak, 256-bit)
+KECCAK_VECTORS = {
+    0: "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470",
+    135: "34367dc248bbd832f4e3e69dfaac2f92638bd0bbd18f2912ba4ef454919cf446",
+    136: "a6c4d403279fe3e0af03729caada8374b5ca54d8065329a3ebcaeb4b60aa386e",
+    271: "132f47effd6c8b1b299efa53fe68aece77ec8ae4eb2e294f668eec94f76001e1"
+}
+
+@pytest.mark.parametrize("length", sorted(KECCAK_VECTORS))
+def test_keccak256_known_vectors(length):
+    # 135 and 271 leave one byte in the last block (single 0x81 pad byte)
+    assert keccak256(b"a" * length).hex() == KECCAK_VECTORS[length]
+
+@pytest.mark.parametrize("signature, expected", [
+    ("transfer(address,uint256)", "a9059cbb"),
+    (AGGREGATE3_SIGNATURE, "82ad56cb")
+])
+def test_selector(signature, expected):
+    assert selector(signature).hex() == expected
+
+@pytest.mark.parametrize("name, expected", [
+    ("getReserves", "0902f1ac"),
+    ("totalSupply", "18160ddd"),
+    ("balanceOf", "70a08231")
+])
+def test_pool_abi_selectors(name, expected):
+    assert selector(function_signature(find_function(POOL_ABI, name))).hex() == expected
@@ -0,0 +1,119 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from advanced_ai_engine import AIEngine, AllocationSolver, solve_budget_shift
+from pool_snapshot import PoolSnapshot
+
+def reference_qp(mu, sigma, caps, risk_aversion, correlation):
+    """
+    Exact optimum by enumerating which pools sit at 0, at their cap or in
+    between, and solving each face's equality-constrained KKT system
+    """
+    n = len(mu)
+    covariance = correlation * np.outer(sigma, sigma) + (1 - correlation) * np.diag(sigma ** 2)
+    budget = min(1.0, float(caps.sum()))
+    best_objective, best = -np.inf, None
+    for states in itertools.product((0, 1, 2), repeat=n):
+        states = np.array(states)
+        free, at_cap = np.flatnonzero(states == 2), states == 1
+        w = np.where(at_cap, caps, 0.0)
+        rest = budget - caps[at_cap].sum()
+        if not len(free):
+            if abs(rest) > 1e-12:
+                continue
+        else:
+            system = np.zeros((len(free) + 1, len(free) + 1))
+            system[:-1, :-1] = 2 * risk_aversion * covariance[np.ix_(free, free)]
+            system[:-1, -1] = system[-1, :-1] = 1
+            rhs = np.r_[mu[free] - 2 * risk_aversion * covariance[free][:, at_cap] @ caps[at_cap], rest]
+            w[free] = np.linalg.solve(system, rhs)[:-1]
+            if (w[free] < -1e-12).any() or (w[free] > caps[free] + 1e-12).any():
+                continue
+        objective = mu @ w - risk_aversion * w @ covariance @ w
+        if objective > best_objective:
+            best_objective, best = objective, w
+    return best
+
+def random_case(rng):
+    n = int(rng.integers(1, 6))
+    caps = [
+        np.full(n, 0.4),                                 # Usual max_pool_weight
+        rng.uniform(0, 0.3, n),                          # Often sum(caps) < 1
+        rng.uniform(0, 1, n),
+        np.where(rng.random(n) < 0.3, 0.0, 0.4)          # Pools over the risk limit
+    ][int(rng.integers(4))]
+    return (
+        rng.uniform(0, 0.4, n), rng.uniform(1e-3, 0.5, n), caps,
+        float(rng.choice([0.1, 1.5, 4.0, 8.0, 50.0])), float(rng.choice([0.0, 0.3, 0.9]))
+    )
+
+CASES = [random_case(np.random.default_rng(seed)) for seed in range(300)]
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_solver_matches_reference_qp(warm):
+    rng = np.random.default_rng(1)
+    binding = 0
+    for mu, sigma, caps, risk_aversion, correlation in CASES:
+        expected = reference_qp(mu, sigma, caps, risk_aversion, correlation)
+        initial = rng.uniform(0, 1, len(mu)) * caps if warm else None
+        result = AllocationSolver(correlation).solve(mu, sigma, caps, risk_aversion, initial)
+        
+        assert result.warm_started == (warm and caps.sum() > 0)
+        assert result.weights == pytest.approx(expected, abs=1e-8)
+        binding += bool(caps.sum() > 1 and np.isclose(expected, caps).any())
+    
+    # Caps bind below a full budget in a good share of cases
+    assert binding > 30
+
+def test_warm_start_from_the_solution():
+    solver = AllocationSolver()
+    for mu, sigma, caps, risk_aversion, _ in CASES:
+        cold = solver.solve(mu, sigma, caps, risk_aversion)
+        for initial in (cold.weights, cold.weights * 0.9, np.zeros(len(mu)), caps):
+            warm = solver.solve(mu, sigma, caps, risk_aversion, initial)
+            assert warm.weights == pytest.approx(cold.weights, abs=1e-8)
+
+def test_budget_above_caps_fills_every_cap():
+    caps = np.array([0.1, 0.25, 0.0, 0.3])
+    result = AllocationSolver().solve(
+        np.array([0.05, 0.2, 0.3, 0.01]), np.array([0.1, 0.4, 0.2, 0.05]), caps, 4.0
+    )
+    assert result.weights == pytest.approx(caps, abs=1e-12)
+
+@pytest.mark.parametrize("seed", range(50))
+def test_budget_shift_meets_budget(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 12))
+    linear = rng.choice(rng.uniform(-1, 1, 4), n)  # Repeated values: tied breakpoints
+    curvature = rng.uniform(0.01, 2, n)
+    caps = np.where(rng.random(n) < 0.2, 0.0, rng.uniform(0, 0.5, n))
+    for budget in (caps.sum(), caps.sum() * rng.uniform(0.01, 1), min(1.0, caps.sum())):
+        shift = solve_budget_shift(linear, curvature, caps, budget)
+        assert np.clip((linear - shift) / curvature, 0, caps).sum() == pytest.approx(budget, abs=1e-9)
+
+def test_engine_allocation_matches_reference():
+    records = [
+        {"address": f"0x{i:040x}", "name": f"P{i}", "apy": apy, "tvl": 1e6, "volume24h": 1e5, "risk_score": risk}
+        for i, (apy, risk) in enumerate([(12.5, 0.3), (8.2, 0.2), (15.8, 0.5), (30.0, 0.9), (5.0, 0.1)])
+    ]
+    pools = PoolSnapshot.from_records(records)
+    engine = AIEngine()
+    result = engine.calculate_optimal_allocation(pools, "medium", pool_caps={records[2]["address"]: 0.1})
+    
+    # "medium": risk aversion 4, pools above risk 0.7 excluded
+    caps = np.array([0.4, 0.4, 0.1, 0.0, 0.4])
+    sigma = np.array([pool["risk_score"] * 0.5 for pool in records])
+    mu = np.array([pool["apy"] for pool in records]) / 100
+    expected = reference_qp(mu, sigma, caps, 4.0, engine.solver.correlation)
+    
+    weights = np.array([result["allocation"].get(pool["address"], 0.0) for pool in records])
+    assert weights == pytest.approx(expected, abs=1e-6)
+    assert result["unallocated"] == pytest.approx(0.0, abs=1e-9)
+    
+    # Same snapshot and profile: cached; a caller's edits do not leak back
+    result["allocation"].clear()
+    again = engine.calculate_optimal_allocation(pools, "medium", pool_caps={records[2]["address"]: 0.1})
+    assert again == {**result, "allocation": again["allocation"]}
+    assert np.array([again["allocation"].get(pool["address"], 0.0) for pool in records]) == pytest.approx(expected, abs=1e-6)
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from ai_engine import UserPosition, YieldOptimizer
+from pool_snapshot import PoolSnapshot
+
+def make_universe(seed: int, pool_count: int = 12, position_count: int = 4):
+    rng = random.Random(seed)
+    pools = [
+        {
+            "address": f"0x{seed:04x}{i:036x}",
+            "name": f"POOL{i}",
+            "apy": round(rng.uniform(1, 30), 2),
+            "tvl": rng.uniform(1e5, 5e6),
+            "volume24h": rng.uniform(1e4, 1e6),
+            "risk_score": round(rng.uniform(0.05, 0.9), 2)
+        }
+        for i in range(pool_count)
+    ]
+    positions = [
+        {
+            "pool_address": pool["address"],
+            "balance": rng.choice([0.0, rng.uniform(0.1, 50)]),
+            "value_usd": rng.uniform(100, 100000)
+        }
+        for pool in rng.sample(pools, position_count)
+    ]
+    return pools, positions
+
+def action_fields(action):
+    if action is None:
+        return None
+    return (
+        action.from_pool, action.to_pool, action.amount, action.confidence,
+        action.expected_apy_improvement, action.risk_adjustment, action.rationale
+    )
+
+UNIVERSES = [make_universe(seed) for seed in range(300)]
+
+@pytest.fixture
+def optimizer():
+    return YieldOptimizer()
+
+def scalar_actions(optimizer):
+    return [
+        action_fields(optimizer._find_optimal_rebalance_scalar(
+            PoolSnapshot.from_records(pools), [UserPosition(**pos) for pos in positions]
+        ))
+        for pools, positions in UNIVERSES
+    ]
+
+def test_universe_has_actions(optimizer):
+    # Parity below is only meaningful if the scorer finds something
+    found = sum(action is not None for action in scalar_actions(optimizer))
+    assert 0 < found < len(UNIVERSES)
+
+def test_vectorized_matches_scalar(optimizer):
+    vectorized = [
+        action_fields(optimizer._find_optimal_rebalance(
+            PoolSnapshot.from_records(pools), [UserPosition(**pos) for pos in positions]
+        ))
+        for pools, positions in UNIVERSES
+    ]
+    assert vectorized == scalar_actions(optimizer)
+
+def test_batch_matches_scalar(optimizer):
+    batch = []
+    for pools, positions in UNIVERSES:
+        actions = optimizer.analyze_rebalance_batch(pools, {"user": positions, "empty": []})
+        assert actions["empty"] is None
+        batch.append(action_fields(actions["user"]))
+    assert batch == scalar_actions(optimizer)
+
+def test_candidate_cache_matches_scalar(optimizer):
+    cached = [
+        action_fields(optimizer.analyze_rebalance_opportunity(pools, positions, user_address=f"user{idx}"))
+        for idx, (pools, positions) in enumerate(UNIVERSES)
+    ]
+    assert cached == scalar_actions(optimizer)
+
+def test_candidate_cache_drops_inactive_and_least_recent_users(optimizer):
+    cache = optimizer.candidate_cache
+    cache.max_users = 20
+    pools, positions = UNIVERSES[0]
+    active = [dict(pos, balance=1.0) for pos in positions]
+    for idx in range(50):
+        optimizer.analyze_rebalance_opportunity(pools, active, user_address=f"user{idx}")
+    assert len(cache.users) <= 20
+    assert "user49" in cache.users and "user0" not in cache.users
+    
+    optimizer.analyze_rebalance_opportunity(pools, [dict(pos, balance=0.0) for pos in positions], user_address="user49")
+    assert "user49" not in cache.users
+    
+    # Evicted users are re-scored from scratch with the same result
+    expected = action_fields(optimizer._find_optimal_rebalance_scalar(
+        PoolSnapshot.from_records(pools), [UserPosition(**pos) for pos in active]
+    ))
+    assert action_fields(optimizer.analyze_rebalance_opportunity(pools, active, user_address="user0")) == expected
+
+def test_rationale_renders_on_access(optimizer):
+    pools, positions = next(
+        universe for universe, action in zip(UNIVERSES, scalar_actions(optimizer)) if action is not None
+    )
+    action = optimizer._find_optimal_rebalance(PoolSnapshot.from_records(pools), [UserPosition(**pos) for pos in positions])
+    
+    assert action.rationale.startswith("Moving from ")
+    assert action.to_dict()["rationale"] == action.rationale
+    assert "rationale" not in repr(action)
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from block_cache import BlockHeadTracker, BlockReadCache
+
+class FakeRpc:
+    """
+    Chain at a settable block; eth_call answers "<block>:<calldata>" after a delay
+    """
+    def __init__(self, block=100, delay=0.02):
+        self.block = block
+        self.delay = delay
+        self.eth_calls = []
+        self.fail = False
+    
+    async def call(self, method, params=None):
+        assert method == "eth_blockNumber"
+        return hex(self.block)
+    
+    async def eth_call(self, to, data, block="latest"):
+        self.eth_calls.append((to, data, block))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("rpc down")
+        number = self.block if block == "latest" else int(block, 16)
+        return f"{number}:{data}"
+
+def make_cache(rpc, max_age_seconds=5.0):
+    tracker = BlockHeadTracker(rpc, max_age_seconds=max_age_seconds)
+    return tracker, BlockReadCache(rpc, tracker)
+
+def test_reads_within_a_block_share_one_call():
+    rpc = FakeRpc()
+    tracker, cache = make_cache(rpc)
+    
+    async def main():
+        await tracker.poll()
+        concurrent = await asyncio.gather(*(cache.eth_call("0xPool", "0x01") for _ in range(10)))
+        repeat = await cache.eth_call("0xpool", "0x01")  # Address case does not matter
+        other = await cache.eth_call("0xpool", "0x02")
+        return concurrent, repeat, other
+    
+    concurrent, repeat, other = asyncio.run(main())
+    
+    assert concurrent == ["100:0x01"] * 10 and repeat == "100:0x01" and other == "100:0x02"
+    assert rpc.eth_calls == [("0xPool", "0x01", hex(100)), ("0xpool", "0x02", hex(100))]
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (2, 9, 1)
+
+def test_new_block_invalidates_entries():
+    rpc = FakeRpc()
+    tracker, cache = make_cache(rpc)
+    
+    async def main():
+        await tracker.poll()
+        before = await cache.eth_call("0xpool", "0x01")
+        await cache.eth_call("0xpool", "0x01")
+        
+        rpc.block = 103
+        await tracker.poll()
+        after = await cache.eth_call("0xpool", "0x01")
+        return before, after
+    
+    before, after = asyncio.run(main())
+    
+    assert (before, after) == ("100:0x01", "103:0x01")
+    assert [call[2] for call in rpc.eth_calls] == [hex(100), hex(103)]
+    assert [(block["block"], block["reads"]) for block in cache.block_stats()] == [(103, 1), (100, 2)]
+    assert cache.stats()["retired_blocks"] == 1
+    assert tracker.stats()["skipped_blocks"] == 2
+
+def test_call_in_flight_across_a_new_block_is_not_reused():
+    rpc = FakeRpc(delay=0.05)
+    tracker, cache = make_cache(rpc)
+    
+    async def main():
+        await tracker.poll()
+        old = asyncio.ensure_future(cache.eth_call("0xpool", "0x01"))
+        await asyncio.sleep(0.01)
+        
+        rpc.block = 101
+        await tracker.poll()
+        new = await cache.eth_call("0xpool", "0x01")
+        again = await cache.eth_call("0xpool", "0x01")
+        return await old, new, again
+    
+    old, new, again = asyncio.run(main())
+    
+    # The old block's answer neither joins nor pollutes the new block
+    assert (old, new, again) == ("100:0x01", "101:0x01", "101:0x01")
+    assert len(rpc.eth_calls) == 2
+
+def test_lagging_node_does_not_move_head_back():
+    rpc = FakeRpc()
+    tracker, cache = make_cache(rpc)
+    
+    async def main():
+        await tracker.poll()
+        await cache.eth_call("0xpool", "0x01")
+        rpc.block = 99
+        await tracker.poll()
+        return await cache.eth_call("0xpool", "0x01")
+    
+    assert asyncio.run(main()) == "100:0x01"
+    assert tracker.head == 100 and len(rpc.eth_calls) == 1
+
+def test_unconfirmed_head_reads_uncached_at_latest():
+    rpc = FakeRpc(delay=0)
+    tracker, cache = make_cache(rpc, max_age_seconds=0.01)
+    
+    async def main():
+        unknown = await cache.eth_call("0xpool", "0x01")  # No poll yet
+        await tracker.poll()
+        await asyncio.sleep(0.02)  # Tracker stalled
+        stale = await cache.eth_call("0xpool", "0x01")
+        return unknown, stale
+    
+    asyncio.run(main())
+    
+    assert [call[2] for call in rpc.eth_calls] == ["latest", "latest"]
+    assert cache.stats()["uncached"] == 2 and cache.stats()["misses"] == 0
+
+def test_failed_calls_are_not_cached():
+    rpc = FakeRpc(delay=0)
+    tracker, cache = make_cache(rpc)
+    
+    async def main():
+        await tracker.poll()
+        rpc.fail = True
+        with pytest.raises(ConnectionError):
+            await cache.eth_call("0xpool", "0x01")
+        rpc.fail = False
+        return await cache.eth_call("0xpool", "0x01")
+    
+    assert asyncio.run(main()) == "100:0x01"
+    assert len(rpc.eth_calls) == 2
@@ -0,0 +1,58 @@
+import pytest
+
+from blockchain_client import MonadClient
+
+POOLS = [
+    "0x1111111111111111111111111111111111111111",
+    "0x2222222222222222222222222222222222222222",
+    "0x3333333333333333333333333333333333333333"
+]
+USERS = [
+    "0xaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+    "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb"
+]
+
+@pytest.fixture
+def client_env(monkeypatch):
+    monkeypatch.setenv("POOL_DATA_SOURCE", "multicall")
+    
+    def configure(url):
+        monkeypatch.setenv("MONAD_RPC_URL", url)
+        return MonadClient()
+    
+    return configure
+
+def test_codeless_pool_fails_alone(with_rpc_stub, client_env):
+    codeless, reverting, healthy = POOLS
+    
+    async def scenario(url, server):
+        client = client_env(url)
+        snapshot, table = await client.read_pool_universe(POOLS, USERS)
+        return client, snapshot, table
+    
+    client, snapshot, table = with_rpc_stub(scenario, codeless_pools=[codeless], failing_pools=[reverting])
+    
+    reports = {report.address: report for report in client.last_pool_fetch}
+    assert (reports[healthy].source, reports[healthy].error) == ("fetched", None)
+    assert (reports[codeless].source, reports[codeless].error) == ("missing", "undecodable return data")
+    assert (reports[reverting].source, reports[reverting].error) == ("missing", "call reverted")
+    
+    # Only the healthy pool's data and balances survive
+    assert list(snapshot.index) == [healthy]
+    assert set(table.pool_addresses) == {healthy}
+    assert len(table.pool_addresses) == len(USERS)
+
+def test_codeless_pool_keeps_last_known(with_rpc_stub, client_env):
+    codeless = POOLS[0]
+    
+    async def scenario(url, server):
+        client = client_env(url)
+        await client.read_pool_universe(POOLS)
+        server.codeless_pools = {codeless}
+        snapshot, _ = await client.read_pool_universe(POOLS)
+        return client, snapshot
+    
+    client, snapshot = with_rpc_stub(scenario)
+    
+    assert client.last_pool_fetch[0].source == "last_known"
+    assert codeless in snapshot.index and len(snapshot.index) == len(POOLS)
@@ -0,0 +1,46 @@
+import asyncio
+
+from ingest import CoalescingIngestQueue
+
+def run_queue(events, window_seconds=0.05):
+    """
+    Submit (pool, old, new, user) events into one window and return the handled updates
+    """
+    handled = []
+    
+    async def handler(update):
+        handled.append(update)
+    
+    async def main():
+        queue = CoalescingIngestQueue(handler, window_seconds=window_seconds, workers=2)
+        await queue.start()
+        for pool_address, old_apy, new_apy, user_address in events:
+            queue.submit(pool_address, old_apy, new_apy, "2026-01-01T00:00:00Z", user_address)
+        await asyncio.sleep(window_seconds * 4)
+        await queue.stop()
+        return queue.stats()
+    
+    return handled, asyncio.run(main())
+
+def test_same_pool_different_users_are_all_analyzed():
+    handled, stats = run_queue([
+        ("0xpool", 10.0, 11.0, "0xalice"),
+        ("0xpool", 11.0, 12.0, "0xbob"),
+        ("0xpool", 12.0, 13.0, "0xalice")
+    ])
+    
+    by_user = {update.user_address: update for update in handled}
+    assert sorted(by_user) == ["0xalice", "0xbob"]
+    assert len(handled) == 2
+    
+    # Alice's two events merged: first old_apy, last new_apy
+    assert (by_user["0xalice"].old_apy, by_user["0xalice"].new_apy, by_user["0xalice"].events) == (10.0, 13.0, 2)
+    assert (by_user["0xbob"].old_apy, by_user["0xbob"].new_apy, by_user["0xbob"].events) == (11.0, 12.0, 1)
+    assert stats["processed"] == 2 and stats["received"] == 3
+
+def test_events_for_one_pool_and_user_coalesce():
+    handled, stats = run_queue([("0xpool", 10.0, 10.0 + i, None) for i in range(20)])
+    
+    assert len(handled) == 1
+    assert handled[0].events == 20 and handled[0].new_apy == 29.0
+    assert stats["coalescing_ratio"] == 20
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from outbox import Outbox
+
+class FakeClient:
+    """
+    Records POSTed payloads; payloads whose "n" is in failing get an HTTP 503
+    """
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.posted = []
+    
+    async def post(self, url, json=None, **kwargs):
+        self.posted.append(json)
+        status = 503 if json["n"] in self.failing else 200
+        return SimpleNamespace(ok=status < 400, status=status)
+
+def log_records(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass  # Torn line
+    return records
+
+def test_enqueue_before_start_is_delivered_once(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    client = FakeClient()
+    
+    async def main():
+        outbox = Outbox(path, client, flush_interval=60)
+        outbox.enqueue("audit", "http://audit", {"n": 1})
+        outbox.enqueue("audit", "http://audit", {"n": 2})
+        await outbox.start()
+        depth = outbox.stats()["depth"]
+        while await outbox.flush():
+            pass
+        await outbox.stop()
+        return depth, outbox.stats()
+    
+    depth, stats = asyncio.run(main())
+    
+    assert depth == 2
+    assert client.posted == [{"n": 1}, {"n": 2}]
+    assert stats["delivered"] == 2 and stats["recovered"] == 0
+    assert log_records(path) == []
+
+def test_crash_replay_and_compact(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    
+    async def crash():
+        outbox = Outbox(path, FakeClient(failing={1}), flush_interval=60)
+        await outbox.start()
+        ids = [outbox.enqueue("audit", "http://audit", {"n": n}) for n in range(3)]
+        await outbox.flush()
+        # The process dies here: no stop(), so no compaction
+        outbox._log.close()
+        return ids
+    
+    ids = asyncio.run(crash())
+    with open(path, "a") as f:
+        f.write('{"op": "put", "entry": {"kind": "au')
+    assert [record["op"] for record in log_records(path)] == ["put"] * 3 + ["done"] * 2
+    
+    client = FakeClient()
+    
+    async def restart():
+        outbox = Outbox(path, client, flush_interval=60)
+        await outbox.start()
+        compacted, started = log_records(path), outbox.stats()
+        while await outbox.flush():
+            pass
+        await outbox.stop()
+        return compacted, started, outbox.stats()
+    
+    compacted, started, stopped = asyncio.run(restart())
+    
+    # Only the undelivered entry survives compaction, and it is sent once
+    assert [(record["op"], record["entry"]["id"]) for record in compacted] == [("put", ids[1])]
+    assert started["recovered"] == 1 and started["depth"] == 1
+    assert client.posted == [{"n": 1}]
+    assert stopped["delivered"] == 1 and stopped["depth"] == 0
+    assert log_records(path) == []
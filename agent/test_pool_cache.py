@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from pool_cache import PoolDataCache
+
+class FakeFetch:
+    """
+    Slow fetch returning {"address", "version"}; version counts calls per pool
+    """
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = {}
+        self.fail = False
+    
+    async def __call__(self, address):
+        self.calls[address] = self.calls.get(address, 0) + 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("rpc down")
+        return {"address": address, "version": self.calls[address]}
+
+def test_concurrent_misses_share_one_fetch():
+    fetch = FakeFetch()
+    cache = PoolDataCache(fetch)
+    
+    async def main():
+        return await asyncio.gather(*(cache.get("0xpool") for _ in range(10)), cache.get("0xother"))
+    
+    values = asyncio.run(main())
+    
+    assert fetch.calls == {"0xpool": 1, "0xother": 1}
+    assert [value["version"] for value in values] == [1] * 11
+    stats = cache.stats()
+    assert stats["misses"] == 11 and stats["coalesced"] == 9 and stats["refreshes"] == 2
+
+def test_cancelled_caller_does_not_cancel_shared_fetch():
+    fetch = FakeFetch()
+    cache = PoolDataCache(fetch)
+    
+    async def main():
+        impatient = asyncio.ensure_future(cache.get("0xpool"))
+        await asyncio.sleep(0)
+        patient = asyncio.ensure_future(cache.get("0xpool"))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+    
+    assert asyncio.run(main())["version"] == 1
+    assert fetch.calls == {"0xpool": 1}
+
+def test_stale_value_served_while_refreshing():
+    fetch = FakeFetch(delay=0.05)
+    cache = PoolDataCache(fetch, ttl_seconds=0.01, max_stale_seconds=10)
+    
+    async def main():
+        first = await cache.get("0xpool")
+        await asyncio.sleep(0.02)  # Expired, within max_stale
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        stale = await asyncio.gather(*(cache.get("0xpool") for _ in range(5)))
+        waited = loop.time() - started
+        
+        await asyncio.sleep(0.1)  # Background refresh lands
+        refreshed = cache.last_known("0xpool")
+        return first, stale, waited, refreshed
+    
+    first, stale, waited, refreshed = asyncio.run(main())
+    
+    assert first["version"] == 1
+    assert [value["version"] for value in stale] == [1] * 5
+    assert waited < fetch.delay  # Stale reads do not wait for the fetch
+    assert refreshed["version"] == 2
+    assert fetch.calls == {"0xpool": 2}  # The five stale reads started one refresh
+    stats = cache.stats()
+    assert (stats["misses"], stats["stale"], stats["hits"]) == (1, 5, 0)
+
+def test_failed_refresh_keeps_old_value():
+    fetch = FakeFetch(delay=0.01)
+    cache = PoolDataCache(fetch, ttl_seconds=0.01, max_stale_seconds=10)
+    
+    async def main():
+        await cache.get("0xpool")
+        await asyncio.sleep(0.02)
+        fetch.fail = True
+        stale = await cache.get("0xpool")
+        await asyncio.sleep(0.05)
+        return stale, await cache.get("0xpool")
+    
+    stale, after_failure = asyncio.run(main())
+    
+    assert stale["version"] == after_failure["version"] == 1
+    assert cache.stats()["refresh_failures"] >= 1
+
+def test_too_old_value_is_fetched_and_failures_raise():
+    fetch = FakeFetch(delay=0.01)
+    cache = PoolDataCache(fetch, ttl_seconds=0.01, max_stale_seconds=0.01)
+    
+    async def main():
+        await cache.get("0xpool")
+        await asyncio.sleep(0.03)  # Past ttl + max_stale: a miss
+        fresh = await cache.get("0xpool")
+        
+        await asyncio.sleep(0.03)
+        fetch.fail = True
+        with pytest.raises(ConnectionError):
+            await cache.get("0xpool")
+        return fresh
+    
+    assert asyncio.run(main())["version"] == 2
+    assert cache.stats()["misses"] == 3
@@ -0,0 +1,110 @@
+import random
+
+import numpy as np
+import pytest
+
+from ai_engine import YieldOptimizer
+from rebalance_planner import RebalancePlanner
+
+def random_lp(seed: int):
+    """
+    Edge arrays in the planner's layout: grouped by source, best target first
+    """
+    rng = np.random.default_rng(seed)
+    n_sources, n_targets = rng.integers(1, 5), rng.integers(3, 10)
+    source_apy = rng.uniform(1, 10, n_sources)
+    target_apy = rng.uniform(5, 30, n_targets)
+    
+    edge_source, edge_target, edge_gain = [], [], []
+    for source in range(n_sources):
+        targets = np.flatnonzero(target_apy > source_apy[source] + 0.5)
+        gain = (target_apy[targets] - source_apy[source]) / 100
+        order = np.argsort(-gain, kind='stable')
+        edge_source.extend([source] * len(targets))
+        edge_target.extend(targets[order].tolist())
+        edge_gain.extend(gain[order].tolist())
+    
+    source_limit = rng.uniform(100, 10000, n_sources)
+    source_units = rng.uniform(0.001, 0.1, n_sources)
+    capacity = rng.uniform(10, 5000, n_targets)
+    max_amount = float(rng.uniform(1, 500)) if rng.random() < 0.5 else None
+    return (
+        np.array(edge_source, dtype=np.int64), np.array(edge_target, dtype=np.int64), np.array(edge_gain),
+        source_limit, source_units, capacity, max_amount
+    )
+
+def random_universe(seed: int, pool_count: int = 15, position_count: int = 4):
+    rng = random.Random(seed)
+    pools = [
+        {
+            "address": f"0x{seed:04x}{i:036x}",
+            "name": f"POOL{i}",
+            "apy": round(rng.uniform(1, 30), 2),
+            "tvl": rng.uniform(1e5, 5e7),
+            "volume24h": rng.uniform(1e4, 1e6),
+            "risk_score": round(rng.uniform(0.05, 0.9), 2)
+        }
+        for i in range(pool_count)
+    ]
+    positions = [
+        {"pool_address": pool["address"], "balance": rng.uniform(0.1, 50), "value_usd": rng.uniform(1e3, 5e5)}
+        for pool in rng.sample(pools, position_count)
+    ]
+    return pools, positions
+
+@pytest.fixture
+def planner():
+    return RebalancePlanner(YieldOptimizer())
+
+def unpruned(edge_source, edge_capacity, active, total_flow):
+    return np.flatnonzero(active)
+
+def test_edge_prefix_keeps_lp_optimum(planner):
+    pruned_instances = 0
+    for seed in range(200):
+        edge_source, edge_target, edge_gain, source_limit, source_units, capacity, max_amount = random_lp(seed)
+        if not len(edge_source):
+            continue
+        
+        movable = float(source_limit.sum())
+        if max_amount is not None:
+            movable = min(movable, max_amount / float(source_units.min()))
+        active = np.ones(len(edge_source), dtype=bool)
+        edges = planner._edge_prefix(edge_source, capacity[edge_target], active, movable)
+        pruned_instances += len(edges) < len(edge_source)
+        
+        full = planner._solve(edge_source, edge_target, edge_gain, source_limit, source_units, capacity, max_amount)
+        pruned = planner._solve(
+            edge_source[edges], edge_target[edges], edge_gain[edges],
+            source_limit, source_units, capacity, max_amount
+        )
+        assert pruned @ edge_gain[edges] == pytest.approx(full @ edge_gain, rel=1e-7, abs=1e-9), seed
+    
+    # The comparison only means something if edges were actually dropped
+    assert pruned_instances > 20
+
+def test_plan_matches_unpruned_solve(planner, monkeypatch):
+    planner.optimizer.gas_cost_threshold = 0
+    universes = [random_universe(seed) for seed in range(100)]
+    pruned = [planner.plan(pools, positions) for pools, positions in universes]
+    
+    monkeypatch.setattr(RebalancePlanner, "_edge_prefix", staticmethod(unpruned))
+    full = [planner.plan(pools, positions) for pools, positions in universes]
+    
+    assert sum(bool(plan.moves) for plan in full) > 20
+    for pruned_plan, full_plan in zip(pruned, full):
+        assert pruned_plan.status == full_plan.status
+        assert pruned_plan.expected_gain == pytest.approx(full_plan.expected_gain, rel=1e-7, abs=1e-9)
+
+@pytest.mark.parametrize("gas_cost_threshold", [50, 500, 2000])
+def test_no_move_below_gas_threshold(planner, gas_cost_threshold):
+    planner.optimizer.gas_cost_threshold = gas_cost_threshold
+    plans = [planner.plan(*random_universe(seed)) for seed in range(100)]
+    
+    assert any(plan.moves for plan in plans)
+    # Some plans had moves below the threshold and were re-solved
+    assert any(plan.rounds > 1 for plan in plans)
+    for plan in plans:
+        for move in plan.moves:
+            assert move.expected_gain >= gas_cost_threshold
+        assert plan.status in ("optimal", "no_candidates")
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from abi import POOL_ABI, decode_output, encode_call
+from rpc_batch import JsonRpcBatcher, RpcError
+
+POOLS = [f"0x{idx:040x}" for idx in range(1, 41)]
+SUPPLY_CALL = encode_call(POOL_ABI, "totalSupply")
+
+async def read_supplies(batcher, pools):
+    results = await asyncio.gather(
+        *(batcher.eth_call(pool, SUPPLY_CALL) for pool in pools),
+        return_exceptions=True
+    )
+    return [
+        result if isinstance(result, Exception) else decode_output(POOL_ABI, "totalSupply", bytes.fromhex(result[2:]))[0]
+        for result in results
+    ]
+
+def test_concurrent_calls_share_one_request(with_rpc_stub):
+    async def scenario(url, server):
+        batcher = JsonRpcBatcher(url, window_seconds=0.01)
+        supplies = await read_supplies(batcher, POOLS[:20])
+        return supplies, batcher.stats(), server.http_requests
+    
+    supplies, stats, http_requests = with_rpc_stub(scenario)
+    
+    assert http_requests == 1
+    assert stats["batches"] == 1 and stats["calls"] == 20
+    assert all(isinstance(supply, int) and supply > 0 for supply in supplies)
+
+def test_out_of_order_responses_reach_their_callers(with_rpc_stub):
+    async def scenario(url, server):
+        ordered = await read_supplies(JsonRpcBatcher(url, window_seconds=0.01), POOLS)
+        server.shuffle_responses = True
+        shuffled = await read_supplies(JsonRpcBatcher(url, window_seconds=0.01), POOLS)
+        return ordered, shuffled
+    
+    ordered, shuffled = with_rpc_stub(scenario)
+    
+    # Each pool has its own supply, so a misrouted response would show up
+    assert len(set(ordered)) == len(POOLS)
+    assert shuffled == ordered
+
+def test_call_error_fails_only_that_call(with_rpc_stub):
+    reverting = POOLS[1]
+    
+    async def scenario(url, server):
+        batcher = JsonRpcBatcher(url, window_seconds=0.01)
+        supplies = await read_supplies(batcher, POOLS[:3])
+        unsupported = asyncio.ensure_future(batcher.call("eth_getLogs", [{}]))
+        block = await batcher.call("eth_blockNumber")
+        return supplies, unsupported, block, batcher.stats(), server.http_requests
+    
+    supplies, unsupported, block, stats, http_requests = with_rpc_stub(scenario, failing_pools=[reverting])
+    
+    assert isinstance(supplies[1], RpcError) and "reverted" in str(supplies[1])
+    assert supplies[1].code == -32000
+    assert isinstance(supplies[0], int) and isinstance(supplies[2], int)
+    
+    with pytest.raises(RpcError) as error:
+        unsupported.result()
+    assert error.value.code == -32601
+    assert int(block, 16) >= 1_000_000
+    
+    assert stats["errors"] == 2 and stats["failed_batches"] == 0
+    assert http_requests == 2
+
+def test_batches_split_at_max_size(with_rpc_stub):
+    async def scenario(url, server):
+        batcher = JsonRpcBatcher(url, window_seconds=0.01, max_batch_size=10)
+        supplies = await read_supplies(batcher, POOLS[:25])
+        return supplies, batcher.stats(), server
+    
+    supplies, stats, server = with_rpc_stub(scenario)
+    
+    assert server.http_requests == 3 and server.largest_batch == 10
+    assert stats["batches"] == 3 and stats["calls"] == 25
+    assert all(isinstance(supply, int) for supply in supplies)
@@ -69,12 +69,24 @@ interface AIRecommendation {
   execution_priority: number;
 }
 
+interface PendingApproval {
+  from_pool: string;
+  to_pool: string;
+  amount: number;
+  confidence: number;
+  rationale: string;
+  expected_apy_improvement: number;
+  risk_adjustment: number;
+  requested_at: number;
+}
+
 export function AdvancedDashboard() {
   const address = '0x742d35Cc6634C0532925a3b8D4C9db4C8b9b8b8b';
   const [pools, setPools] = useState<PoolData[]>([]);
   const [portfolio, setPortfolio] = useState<PortfolioSummary | null>(null);
   const [analytics, setAnalytics] = useState<MarketAnalytics | null>(null);
   const [recommendations, setRecommendations] = useState<AIRecommendation[]>([]);
+  const [approvals, setApprovals] = useState<Record<string, PendingApproval>>({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [selectedTimeframe, setSelectedTimeframe] = useState('24h');
@@ -139,6 +151,34 @@ export function AdvancedDashboard() {
     }
   }, [address]);
 
+  const setupRecommendationStream = useCallback(() => {
+    if (!address) return () => {};
+
+    // The agent pushes recommendations when they change (and on connect)
+    const stream = new EventSource(`http://localhost:3003/stream?userAddress=${address}`);
+    stream.addEventListener('recommendations', (event) => {
+      try {
+        const data = JSON.parse((event as MessageEvent).data);
+        setRecommendations(data.recommendations || []);
+      } catch (err) {
+        console.error('Recommendation stream parse error:', err);
+      }
+    });
+    // Low-confidence actions waiting on the user; a newer request for the same pools replaces the older one
+    stream.addEventListener('approval', (event) => {
+      try {
+        const approval: PendingApproval = JSON.parse((event as MessageEvent).data);
+        setApprovals(prev => ({ ...prev, [`${approval.from_pool}:${approval.to_pool}`]: approval }));
+      } catch (err) {
+        console.error('Approval stream parse error:', err);
+      }
+    });
+
+    return () => {
+      stream.close();
+    };
+  }, [address]);
+
   const setupWebSocket = useCallback(() => {
     // Try to establish real WebSocket connection
     try {
@@ -192,21 +232,22 @@ export function AdvancedDashboard() {
 
     loadData();
     const cleanup = setupWebSocket();
+    const closeStream = setupRecommendationStream();
 
-    // Set up periodic updates
+    // Set up periodic updates (recommendations arrive over the stream)
     const interval = setInterval(() => {
       fetchDashboardData();
-      fetchAIRecommendations();
     }, 30000); // Update every 30 seconds
 
     return () => {
       clearInterval(interval);
+      closeStream();
       if (cleanup) cleanup();
       if (wsRef.current) {
         wsRef.current.close();
       }
     };
-  }, [fetchDashboardData, fetchAIRecommendations, setupWebSocket]);
+  }, [fetchDashboardData, fetchAIRecommendations, setupWebSocket, setupRecommendationStream]);
 
   const formatCurrency = (value: number) => {
     return new Intl.NumberFormat('en-US', {
@@ -454,6 +495,55 @@ export function AdvancedDashboard() {
         </div>
       </div>
 
+      {/* Pending Approvals Panel */}
+      {Object.keys(approvals).length > 0 && (
+        <div className="glass p-6 rounded-xl border border-orange-500/30">
+          <h3 className="text-xl font-bold text-white mb-6">⚠️ Awaiting Your Approval</h3>
+          
+          <div className="space-y-4">
+            {Object.entries(approvals).map(([key, approval]) => (
+              <div key={key} className="bg-white/5 p-4 rounded-lg border border-orange-500/20">
+                <div className="flex items-center justify-between mb-3">
+                  <div>
+                    <div className="text-white font-medium">
+                      {approval.from_pool} → {approval.to_pool}
+                    </div>
+                    <div className="text-gray-400 text-sm">
+                      Amount: {Number(approval.amount).toFixed(3)} ETH · requested {new Date(approval.requested_at * 1000).toLocaleTimeString()}
+                    </div>
+                  </div>
+                  
+                  <div className="text-right">
+                    <div className="text-green-400 font-bold">
+                      +{approval.expected_apy_improvement.toFixed(2)}% APY
+                    </div>
+                    <div className="text-gray-400 text-sm">
+                      {Math.round(approval.confidence * 100)}% confidence
+                    </div>
+                  </div>
+                </div>
+                
+                <div className="flex items-center justify-between">
+                  <div className="text-gray-300 text-sm">
+                    {approval.rationale}
+                  </div>
+                  <button
+                    onClick={() => setApprovals(prev => {
+                      const next = { ...prev };
+                      delete next[key];
+                      return next;
+                    })}
+                    className="px-3 py-1 bg-gray-500/20 border border-gray-500/50 text-gray-400 rounded text-sm hover:bg-gray-500/30 transition-colors"
+                  >
+                    Dismiss
+                  </button>
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* AI Recommendations Panel */}
       {recommendations.length > 0 && (
         <div className="glass p-6 rounded-xl border border-yellow-500/30">